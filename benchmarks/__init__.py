@@ -0,0 +1,5 @@
+"""
+Throughput benchmarks for the logfile ingestion hot path
+
+Run from the root dir by `python -m benchmarks [--output results.json]`
+"""
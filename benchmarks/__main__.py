@@ -0,0 +1,120 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from pathlib import Path
+
+from benchmarks.corpora import CLIENT_FORMATS, read_corpus, render_corpus
+from benchmarks.suite import BENCHMARKS, compare_results, run_benchmark
+
+
+def get_commit() -> str | None:
+    """Return the commit hash of the checked out tree, if available"""
+    try:
+        return subprocess.run(
+            ("git", "rev-parse", "HEAD"),
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except OSError, subprocess.CalledProcessError:
+        return None
+
+
+def parse_corpus_argument(argument: str) -> tuple[str, Path]:
+    name, separator, path = argument.partition("=")
+    if not separator or not name or not path:
+        raise argparse.ArgumentTypeError(f"Expected NAME=PATH, got '{argument}'")
+    return name, Path(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks",
+        description="Measure the throughput of the logfile ingestion hot path",
+    )
+    parser.add_argument(
+        "--client",
+        action="append",
+        choices=tuple(CLIENT_FORMATS),
+        help="Client corpora to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--corpus",
+        action="append",
+        default=[],
+        type=parse_corpus_argument,
+        metavar="NAME=PATH",
+        help="Also benchmark a recorded logfile",
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="append",
+        choices=BENCHMARKS,
+        help="Benchmarks to run (default: all)",
+    )
+    parser.add_argument(
+        "--sessions", type=int, default=50, help="Games per generated corpus"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="Timed runs per benchmark"
+    )
+    parser.add_argument(
+        "--output", type=Path, help="Write the results as json to this path"
+    )
+    parser.add_argument(
+        "--compare", type=Path, help="Compare the throughput to a previous result"
+    )
+    args = parser.parse_args()
+
+    corpora = {
+        client: render_corpus(client, args.sessions)
+        for client in args.client or CLIENT_FORMATS
+    }
+    for name, path in args.corpus:
+        corpora[name] = read_corpus(path)
+
+    results = []
+    for benchmark in args.benchmark or BENCHMARKS:
+        for name, lines in corpora.items():
+            result = run_benchmark(benchmark, name, lines, repeat=args.repeat)
+            results.append(result)
+            print(
+                f"{benchmark:>18} {name:>12}: "
+                f"{result.lines_per_second:>12,.0f} lines/s "
+                f"{result.peak_alloc_bytes:>12,} B peak",
+                file=sys.stderr,
+            )
+
+    output = {
+        "metadata": {
+            "commit": get_commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "sessions": args.sessions,
+            "repeat": args.repeat,
+        },
+        "results": [result.to_dict() for result in results],
+    }
+
+    if args.output is None:
+        json.dump(output, sys.stdout, indent=2)
+        print()
+    else:
+        with args.output.open("w", encoding="utf8") as f:
+            json.dump(output, f, indent=2)
+
+    if args.compare is not None:
+        with args.compare.open("r", encoding="utf8") as f:
+            baseline = json.load(f)["results"]
+
+        print("\nThroughput compared to baseline:", file=sys.stderr)
+        for benchmark, name, ratio in compare_results(baseline, results):
+            print(f"{benchmark:>18} {name:>12}: {ratio:6.2f}x", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
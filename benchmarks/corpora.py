@@ -0,0 +1,190 @@
+"""
+Synthetic log corpora for every client format the overlay supports
+
+The lines of every corpus are generated from the same seeded session generator, so
+the clients only differ in their log prefixes. All usernames are PlayerN.
+Recorded logfiles can be benchmarked as well, see read_corpus.
+"""
+
+import random
+from collections.abc import Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Literal
+
+LineKind = Literal["chat", "info", "noise"]
+
+OWN_USERNAME = "Player0"
+OWN_UUID = "b8a9e3b1-5c5d-4e5b-9c2e-6f1d2a3b4c5d"
+
+
+@dataclass(frozen=True, slots=True)
+class ClientFormat:
+    """The prefixes a client writes before each kind of line. {time} is HH:MM:SS"""
+
+    chat: str
+    info: str
+    noise: str
+    setting_user: str = "Setting user: {username}"
+
+
+LAUNCHER_PREFIX = "[Info: 2024-01-27 {time}.417692543: GameCallbacks.cpp(162)] Game/"
+
+CLIENT_FORMATS: dict[str, ClientFormat] = {
+    "vanilla": ClientFormat(
+        chat="[{time}] [Client thread/INFO]: [CHAT] ",
+        info="[{time}] [Client thread/INFO]: ",
+        noise="[{time}] [Client thread/WARN]: ",
+    ),
+    "forge": ClientFormat(
+        chat=f"{LAUNCHER_PREFIX}net.minecraft.client.gui.GuiNewChat "
+        "(Client thread) Info [CHAT] ",
+        info=f"{LAUNCHER_PREFIX}net.minecraft.client.Minecraft (Client thread) Info ",
+        noise=f"{LAUNCHER_PREFIX}net.minecraft.client.Minecraft (Client thread) Warn ",
+    ),
+    "lunar": ClientFormat(
+        chat="[{time}] [Client thread/INFO]: [CHAT] ",
+        info="[{time}] [Client thread/INFO]: [LC] ",
+        noise="[{time}] [Client thread/WARN]: ",
+    ),
+    "fabric_1_20": ClientFormat(
+        chat="[{time}] [Render thread/INFO]: [CHAT] ",
+        info="[{time}] [Render thread/INFO]: ",
+        noise="[{time}] [Render thread/WARN]: ",
+    ),
+    "fabric_1_21": ClientFormat(
+        chat="[{time}] [Render thread/INFO]: [System] [CHAT] ",
+        info="[{time}] [Render thread/INFO]: ",
+        noise="[{time}] [Render thread/WARN]: ",
+    ),
+    "alpine": ClientFormat(
+        chat="[{time}] [Client thread/INFO] "
+        "[alpineclient.lIlllIllIIllIIIIIIIIIlllIIIIIIlIllIlIIIl/]: [CHAT] ",
+        info="[{time}] [Client thread/INFO] [Alpine Client/]: ",
+        noise="[{time}] [Client thread/WARN] [Alpine Client/]: ",
+        setting_user="Setting account (name={username}, uuid=" + OWN_UUID + ")",
+    ),
+    "netty": ClientFormat(
+        chat="[{time}] [Netty Client IO #7/INFO]: [CHAT] ",
+        info="[{time}] [Client thread/INFO]: ",
+        noise="[{time}] [Netty Client IO #7/WARN]: ",
+    ),
+    "astolfo": ClientFormat(
+        chat="[{time}] [Astolfo HTTP Bridge]: [CHAT] ",
+        info="[{time}] [Client thread/INFO]: ",
+        noise="[{time}] [Client thread/WARN]: ",
+    ),
+}
+
+NOISE_MESSAGES = (
+    "Unable to play unknown soundEvent: minecraft:note.hat",
+    "Received passengers for unknown entity",
+    "Skipping entity with id 1234",
+    "Couldn't find the texture for a player skin",
+)
+
+DEATH_MESSAGES = (
+    "{victim} was killed by {killer}.",
+    "{victim} was knocked into the void by {killer}.",
+    "{victim} was shot by {killer}.",
+    "{victim} fell into the void.",
+)
+
+CHAT_MESSAGES = ("gg", "wp", "lol", "rush mid", "who has iron", "ez")
+
+
+def session_lines(rng: random.Random, session: int) -> Iterator[tuple[LineKind, str]]:
+    """Yield the lines of a single party queueing for and playing a game"""
+    offset = 1 + session * 16
+    players = [f"Player{offset + i}" for i in range(15)]
+    party = players[:3]
+    others = players[3:]
+
+    def noise() -> tuple[LineKind, str]:
+        return "noise", rng.choice(NOISE_MESSAGES)
+
+    # The party is formed
+    yield "chat", f"You have joined [MVP++] {party[0]}'s party!"
+    yield "chat", f"You'll be partying with: [VIP] {party[1]}, {party[2]}"
+    yield "chat", "-----------------------------------------------------"
+    yield "chat", "Party Members (4)"
+    yield "chat", ""
+    yield "chat", f"Party Leader: [MVP++] {party[0]} ●"
+    yield "chat", f"Party Members: {OWN_USERNAME} ● [VIP] {party[1]} ● {party[2]} ●"
+    yield "chat", "-----------------------------------------------------"
+
+    # Queueing for a game
+    yield "chat", f"Sending you to mini{session}A!"
+    yield noise()
+    for count, player in enumerate(players, start=2):
+        yield "chat", f"{player} has joined ({count}/16)!"
+        if rng.random() < 0.3:
+            yield noise()
+    yield "chat", f"{others[-1]} has quit!"
+    yield "chat", f"{others[-1]} has joined (16/16)!"
+    yield "chat", f"ONLINE: {', '.join((OWN_USERNAME, *players))}"
+    for seconds in (20, 10, 5, 4, 3, 2, 1):
+        s = "" if seconds == 1 else "s"
+        yield "chat", f"The game starts in {seconds} second{s}!"
+
+    # Playing the game
+    yield "chat", "▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬"
+    yield "chat", "                                  Bed Wars"
+    yield "chat", ""
+    yield "chat", "     Protect your bed and destroy the enemy beds."
+    yield "chat", "▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬"
+    for _ in range(40):
+        victim, killer = rng.sample(players, 2)
+        yield "chat", rng.choice(DEATH_MESSAGES).format(victim=victim, killer=killer)
+        if rng.random() < 0.2:
+            yield "chat", f"[VIP] {killer}: {rng.choice(CHAT_MESSAGES)}"
+        if rng.random() < 0.2:
+            yield noise()
+    disconnected = others[0]
+    yield "chat", f"{disconnected} disconnected."
+    yield "chat", f"{disconnected} reconnected."
+    for victim in others:
+        killer = rng.choice(party)
+        yield "chat", f"{victim} was killed by {killer}. FINAL KILL!"
+        yield "chat", f"[MVP+] {victim}: {rng.choice(CHAT_MESSAGES)}"
+
+    # The game ends
+    yield "chat", "▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬"
+    yield "chat", "                                  Bed Wars"
+    yield "chat", f"                       Red - {party[0]}, {party[1]}, {party[2]}"
+    yield "chat", f"                    1st Killer - [MVP++] {party[0]} - 7"
+    yield "chat", "▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬▬"
+    yield "chat", f"[MVP++] {party[0]} has disbanded the party!"
+    yield noise()
+
+
+def render_corpus(client: str, sessions: int, *, seed: int = 0) -> list[str]:
+    """Render `sessions` sessions in the log format of `client`"""
+    client_format = CLIENT_FORMATS[client]
+    prefixes = {
+        "chat": client_format.chat,
+        "info": client_format.info,
+        "noise": client_format.noise,
+    }
+    rng = random.Random(seed)
+
+    def line_at(line_index: int, kind: LineKind, text: str) -> str:
+        # Advance the clock by one second every fourth line
+        seconds = 18 * 3600 + line_index // 4
+        time = f"{seconds // 3600:02}:{seconds // 60 % 60:02}:{seconds % 60:02}"
+        return prefixes[kind].format(time=time) + text + "\n"
+
+    lines = [
+        line_at(0, "info", client_format.setting_user.format(username=OWN_USERNAME))
+    ]
+    for session in range(sessions):
+        for kind, text in session_lines(rng, session):
+            lines.append(line_at(len(lines), kind, text))
+
+    return lines
+
+
+def read_corpus(path: Path) -> list[str]:
+    """Read a recorded logfile as a corpus"""
+    with path.open("r", encoding="utf8", errors="replace") as f:
+        return f.readlines()
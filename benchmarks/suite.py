@@ -0,0 +1,215 @@
+import io
+import time
+import tracemalloc
+from collections.abc import Callable, Mapping, Sequence
+from dataclasses import asdict, dataclass
+
+from prism.errors import PlayerNotFoundError
+from prism.overlay.controller import OverlayController
+from prism.overlay.events import Event
+from prism.overlay.file_utils import ReversedLineReader
+from prism.overlay.nick_database import NickDatabase
+from prism.overlay.parsing import parse_logline
+from prism.overlay.process_event import (
+    fast_forward_state,
+    fast_forward_state_reversed,
+    process_event,
+)
+from prism.overlay.settings import Settings, fill_missing_settings
+from prism.overlay.state import OverlayState
+from prism.player import (
+    MISSING_WINSTREAKS,
+    Account,
+    KnownPlayer,
+    Stats,
+    Tags,
+    Winstreaks,
+)
+
+BENCHMARKS = (
+    "parse_logline",
+    "process_event",
+    "fast_forward_state",
+    "fast_forward_state_reversed",
+)
+
+
+@dataclass(frozen=True, slots=True)
+class BenchmarkResult:
+    benchmark: str
+    corpus: str
+    lines: int  # Number of loglines in the corpus
+    events: int  # Number of events parsed from the corpus
+    seconds: float  # Fastest of the timed runs
+    lines_per_second: float
+    events_per_second: float
+    peak_alloc_bytes: int  # Peak memory allocated during a single run
+    retained_alloc_bytes: int  # Memory still allocated after a single run
+
+    def to_dict(self) -> dict[str, str | int | float]:
+        return asdict(self)
+
+
+class OfflineAccountProvider:
+    """Account provider for processing events without network access"""
+
+    def get_account_by_username(self, username: str, *, user_id: str) -> Account:
+        raise PlayerNotFoundError(f"Offline: {username}")
+
+
+class OfflineProvider:
+    """Provider with fixed stats, for processing events without network access"""
+
+    seconds_until_unblocked = 0.0
+
+    def get_player(self, uuid: str, *, user_id: str) -> KnownPlayer:
+        return KnownPlayer(
+            dataReceivedAtMs=0,
+            stats=Stats(
+                index=0,
+                fkdr=0,
+                kdr=0,
+                bblr=0,
+                wlr=0,
+                winstreak=None,
+                winstreak_accurate=False,
+                kills=0,
+                finals=0,
+                beds=0,
+                wins=0,
+            ),
+            stars=0,
+            username=uuid,
+            uuid=uuid,
+        )
+
+    def get_estimated_winstreaks_for_uuid(self, uuid: str) -> tuple[Winstreaks, bool]:
+        return MISSING_WINSTREAKS, False
+
+    def get_tags(self, uuid: str, *, user_id: str, urchin_api_key: str | None) -> Tags:
+        return Tags(sniping="none", cheating="none")
+
+
+def create_controller() -> OverlayController:
+    """Create a controller with fresh state that never touches the disk or network"""
+    settings_dict, _ = fill_missing_settings({}, 1)
+    controller = OverlayController(
+        state=OverlayState(),
+        settings=Settings.from_dict(
+            settings_dict, write_settings_file_utf8=io.StringIO
+        ),
+        nick_database=NickDatabase([{}]),
+        account_provider=OfflineAccountProvider(),
+        player_provider=OfflineProvider(),
+        winstreak_provider=OfflineProvider(),
+        tags_provider=OfflineProvider(),
+    )
+    controller.ready = True
+    return controller
+
+
+def parse_events(lines: Sequence[str]) -> list[Event]:
+    return [event for line in lines if (event := parse_logline(line)) is not None]
+
+
+def time_runs(run: Callable[[], None], *, repeat: int) -> float:
+    """Return the fastest time of `repeat` calls to `run`"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def measure_allocations(run: Callable[[], None]) -> tuple[int, int]:
+    """Return the peak and retained memory allocated by a call to `run`"""
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        run()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return peak - baseline, current - baseline
+
+
+def make_run(
+    benchmark: str, lines: Sequence[str], events: Sequence[Event]
+) -> Callable[[], None]:
+    """Return a function running `benchmark` once over the corpus"""
+    if benchmark == "parse_logline":
+
+        def run() -> None:
+            for line in lines:
+                parse_logline(line)
+
+    elif benchmark == "process_event":
+
+        def run() -> None:
+            controller = create_controller()
+            for event in events:
+                controller.state, _ = process_event(controller, event)
+
+    elif benchmark == "fast_forward_state":
+
+        def run() -> None:
+            fast_forward_state(create_controller(), lines)
+
+    elif benchmark == "fast_forward_state_reversed":
+        # The startup path, reading the logfile backwards from the end
+        data = "".join(lines).encode("utf8")
+
+        def run() -> None:
+            reader = ReversedLineReader(io.BytesIO(data), end=len(data))
+            fast_forward_state_reversed(create_controller(), reader)
+
+    else:
+        raise ValueError(f"Unknown benchmark {benchmark}")
+
+    return run
+
+
+def run_benchmark(
+    benchmark: str, corpus: str, lines: Sequence[str], *, repeat: int
+) -> BenchmarkResult:
+    events = parse_events(lines)
+    run = make_run(benchmark, lines, events)
+
+    seconds = time_runs(run, repeat=repeat)
+    peak_alloc_bytes, retained_alloc_bytes = measure_allocations(run)
+
+    return BenchmarkResult(
+        benchmark=benchmark,
+        corpus=corpus,
+        lines=len(lines),
+        events=len(events),
+        seconds=seconds,
+        lines_per_second=len(lines) / seconds if seconds > 0 else float("inf"),
+        events_per_second=len(events) / seconds if seconds > 0 else float("inf"),
+        peak_alloc_bytes=peak_alloc_bytes,
+        retained_alloc_bytes=retained_alloc_bytes,
+    )
+
+
+def compare_results(
+    baseline: Sequence[Mapping[str, object]], results: Sequence[BenchmarkResult]
+) -> list[tuple[str, str, float]]:
+    """Return the relative throughput of each result compared to the baseline"""
+    baseline_throughput = {
+        (str(result["benchmark"]), str(result["corpus"])): result["lines_per_second"]
+        for result in baseline
+    }
+
+    comparisons: list[tuple[str, str, float]] = []
+    for result in results:
+        old = baseline_throughput.get((result.benchmark, result.corpus), None)
+        if not isinstance(old, (int, float)) or old <= 0:
+            continue
+        comparisons.append(
+            (result.benchmark, result.corpus, result.lines_per_second / old)
+        )
+
+    return comparisons
@@ -8,13 +8,17 @@ import functools
 import logging
 import sys
 import time
+from collections.abc import Iterable, Sequence
 
 import truststore
 
 from prism.overlay.commandline import get_options
 from prism.overlay.directories import (
+    CACHE_DIR,
     CONFIG_DIR,
+    DEFAULT_PLAYER_STORE_PATH,
     DEFAULT_SETTINGS_PATH,
+    ensure_directory,
     must_ensure_directory,
 )
 from prism.overlay.logging import setup_logging
@@ -33,6 +37,15 @@ def main() -> None:  # pragma: nocover
     """Run the overlay"""
     options = get_options(default_settings_path=DEFAULT_SETTINGS_PATH)
 
+    if options.replay_path is not None:
+        from prism.overlay.replay import run_replay
+
+        # Replays don't touch the settings or the network, so they can run in
+        # parallel with the overlay
+        setup_logging(options.loglevel, log_prefix="replay_")
+        run_replay(options.replay_path, speed=options.replay_speed)
+        return
+
     ensure_not_parallel()
 
     if options.test:
@@ -75,6 +88,7 @@ def main() -> None:  # pragma: nocover
     from prism.flashlight.tags import FlashlightTagsProvider
     from prism.overlay.controller import OverlayController
     from prism.overlay.output.overlay.run_overlay import run_overlay
+    from prism.overlay.player_store import open_player_store
     from prism.overlay.process_loglines import (
         prompt_and_read_logfile,
     )
@@ -116,6 +130,13 @@ def main() -> None:  # pragma: nocover
         retry_limit=5, initial_timeout=2, session=session, auth=auth
     )
 
+    # Warm start from the players and uuids seen in the previous session
+    player_store = (
+        open_player_store(DEFAULT_PLAYER_STORE_PATH)
+        if not options.test and ensure_directory(CACHE_DIR)
+        else None
+    )
+
     controller = OverlayController(
         state=OverlayState(),
         settings=settings,
@@ -124,18 +145,23 @@ def main() -> None:  # pragma: nocover
         player_provider=player_provider,
         winstreak_provider=winstreak_provider,
         tags_provider=tags_provider,
+        player_store=player_store,
     )
 
     if options.test:
         from prism.overlay.testing import get_test_loglines
 
-        loglines = get_test_loglines(options)
+        logline_batches: Iterable[Sequence[str]] = (
+            [line] for line in get_test_loglines(options)
+        )
     else:
-        loglines = prompt_and_read_logfile(controller, options, settings)
+        logline_batches = prompt_and_read_logfile(controller, options, settings)
 
     controller.ready = True
 
-    run_overlay(controller, loglines, auth)
+    run_overlay(
+        controller, logline_batches, auth, metrics_interval=options.metrics_interval
+    )
 
 
 if __name__ == "__main__":  # pragma: nocover
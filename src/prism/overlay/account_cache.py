@@ -0,0 +1,69 @@
+import logging
+import threading
+from typing import TYPE_CHECKING
+
+from cachetools import TTLCache
+
+from prism.overlay.player_store import ACCOUNT_STORE_TTL_SECONDS
+
+if TYPE_CHECKING:  # pragma: no cover
+    from prism.overlay.player_store import PlayerStore
+
+logger = logging.getLogger(__name__)
+
+
+class AccountCache:
+    """Cache of the uuids of the usernames we have looked up"""
+
+    def __init__(self, store: "PlayerStore | None" = None) -> None:
+        # Usernames rarely change owner, so the uuids are cached for a long time
+        self._cache: TTLCache[str, str] = TTLCache(
+            maxsize=2048, ttl=ACCOUNT_STORE_TTL_SECONDS
+        )
+
+        # Optional persistent store, read through on misses
+        self._store = store
+
+        # TTLCache is not thread-safe so we use a mutex to synchronize threads
+        self._mutex = threading.Lock()
+
+    def get_uuid(self, username: str) -> str | None:
+        """Get the cached uuid of `username`"""
+        cache_key = username.lower()
+
+        with self._mutex:
+            uuid = self._cache.get(cache_key, None)
+
+        if uuid is not None or self._store is None:
+            return uuid
+
+        # Read without holding the mutex so other threads aren't blocked on disk
+        uuid = self._store.get_uuid(cache_key)
+        if uuid is not None:
+            logger.debug(f"Loaded stored uuid of {username}")
+            with self._mutex:
+                self._cache.setdefault(cache_key, uuid)
+
+        return uuid
+
+    def set_uuid(self, username: str, uuid: str) -> None:
+        """Cache the uuid of `username`"""
+        cache_key = username.lower()
+
+        with self._mutex:
+            if self._cache.get(cache_key, None) == uuid:
+                return
+            self._cache[cache_key] = uuid
+
+        if self._store is not None:
+            self._store.store_uuid(cache_key, uuid)
+
+    def uncache_uuid(self, username: str) -> None:
+        """Clear the cached uuid of `username`"""
+        cache_key = username.lower()
+
+        with self._mutex:
+            self._cache.pop(cache_key, None)
+
+        if self._store is not None:
+            self._store.remove_uuid(cache_key)
@@ -1,15 +1,33 @@
 import functools
 import logging
 import queue
-
-from prism.overlay.controller import ERROR_DURING_PROCESSING, OverlayController
+from collections.abc import Iterable
+from concurrent.futures import Future, wait
+from typing import TypeVar
+
+from prism.overlay.controller import (
+    ERROR_DURING_PROCESSING,
+    OverlayController,
+    ProcessingError,
+)
 from prism.overlay.get_stats import get_and_cache_stats
 from prism.overlay.settings import SettingsDict
-from prism.player import MISSING_WINSTREAKS, KnownPlayer, PendingPlayer, Player
+from prism.overlay.state import OverlayState
+from prism.overlay.stats_request_queue import RequestPriority
+from prism.player import (
+    MISSING_WINSTREAKS,
+    KnownPlayer,
+    PendingPlayer,
+    Player,
+    Tags,
+    Winstreaks,
+)
 from prism.uuid import compare_uuids
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 def set_nickname(
     *, username: str | None, nick: str, controller: OverlayController
@@ -103,55 +121,216 @@ def should_redraw(controller: OverlayController) -> bool:
     return redraw
 
 
+def is_stats_request_wanted(state: OverlayState, username: str) -> bool:
+    """Return True if we still want the stats of `username`"""
+    # NOTE: We always allow own_username to enable the discord RPC thread
+    #       to make requests to compute session stats
+    # NOTE: Party members are allowed so they can be prefetched
+    return (
+        username in state.lobby_players
+        or username in state.party_members
+        or username == state.own_username
+    )
+
+
+def drop_stats_request(controller: OverlayController, username: str) -> None:
+    """Uncache the pending stats of a request we won't make"""
+    # Uncache the pending stats so that if we see them again we will
+    # issue another request, instead of waiting for this one.
+    # Stale stats are still valid in the long term cache.
+    cached_player = controller.player_cache.get_cached_player(username)
+    controller.player_cache.uncache_player(
+        username,
+        short_term_only=isinstance(cached_player, KnownPlayer) and cached_player.stale,
+    )
+
+
+def drop_unwanted_stats_requests(
+    controller: OverlayController, state: OverlayState
+) -> None:
+    """Drop the waiting stats requests for players not wanted in `state`"""
+    dropped = controller.requested_stats_queue.drop(
+        lambda username: not is_stats_request_wanted(state, username)
+    )
+
+    if dropped:
+        logger.info(f"Dropped stats requests for {dropped}")
+
+    for username in dropped:
+        drop_stats_request(controller, username)
+
+
+def get_request_priority(
+    controller: OverlayController, username: str, refresh: bool
+) -> RequestPriority:
+    """Get the priority of the stats request, based on the current state"""
+    state = controller.state
+
+    if username == state.own_username:
+        return RequestPriority.OWN
+
+    if username in state.party_members:
+        if username in state.lobby_players:
+            return RequestPriority.TEAMMATE
+        return RequestPriority.PREFETCH
+
+    displayed_players = (
+        state.alive_players
+        if controller.settings.hide_dead_players
+        else state.lobby_players
+    )
+
+    # NOTE: Requests for players that left are dropped when handled, which is free
+    if refresh or (
+        username in state.lobby_players and username not in displayed_players
+    ):
+        return RequestPriority.REFRESH
+
+    return RequestPriority.ENEMY
+
+
+def handle_stats_request(controller: OverlayController, username: str) -> None:
+    """Get and cache the stats of a requested player, if they are still wanted"""
+    # Small optimization in case the player left or we switched lobbies
+    # between first seeing them and now getting to the request
+    if is_stats_request_wanted(controller.state, username):
+        get_and_cache_player(
+            username=username,
+            completed_queue=controller.completed_stats_queue,
+            controller=controller,
+        )
+    else:
+        logger.info(f"Skipping get_stats for {username} because they left")
+        drop_stats_request(controller, username)
+
+
 def get_and_cache_player(
     username: str, completed_queue: queue.Queue[str], controller: OverlayController
 ) -> None:
     """Get a username from the requests queue and cache their stats"""
-    player = get_and_cache_stats(username, controller)
+    executor = controller.enrichment_executor
+
+    # The tags and winstreaks only need the uuid, so we request them while
+    # getting the stats
+    tags_requests: dict[str, Future[Tags | ProcessingError]] = {}
+    winstreak_requests: dict[str, Future[tuple[Winstreaks, bool]]] = {}
+
+    # The winstreaks are only estimated when they are missing from the stats.
+    # Players usually keep hiding their winstreaks, so we only request them early
+    # when the previous stats of the player were missing them.
+    previous_player = controller.player_cache.get_cached_player(
+        username, long_term=True
+    )
+
+    def request_early(uuid: str) -> None:
+        if uuid not in tags_requests:
+            tags_requests[uuid] = executor.submit(controller.get_tags, uuid)
+
+        if (
+            isinstance(previous_player, KnownPlayer)
+            and previous_player.is_missing_winstreaks
+            and compare_uuids(uuid, previous_player.uuid)
+            and uuid not in winstreak_requests
+        ):
+            winstreak_requests[uuid] = executor.submit(
+                controller.get_estimated_winstreaks, uuid
+            )
+
+    def wait_for_requests() -> None:
+        # Keep the amount of requests in flight bounded by the amount of workers
+        wait(tags_requests.values())
+        wait(winstreak_requests.values())
+
+    try:
+        player = get_and_cache_stats(username, controller, on_uuid=request_early)
+    except BaseException:
+        wait_for_requests()
+        raise
 
     # Tell the main thread that we downloaded this user's stats
     completed_queue.put(username)
 
     logger.debug(f"Finished gettings stats for {username}")
 
-    # Get estimated winstreak if missing
-    if isinstance(player, KnownPlayer) and player.is_missing_winstreaks:
-        (
-            estimated_winstreaks,
-            winstreaks_accurate,
-        ) = controller.get_estimated_winstreaks(player.uuid)
-
-        if estimated_winstreaks is not MISSING_WINSTREAKS:
-            logger.debug(f"Got estimated winstreak for {username}")
-            for alias in player.aliases:
-                controller.player_cache.update_cached_player(
-                    alias,
-                    functools.partial(
-                        KnownPlayer.update_winstreaks,
-                        **estimated_winstreaks,
-                        winstreaks_accurate=winstreaks_accurate,
-                    ),
-                )
-
-            # Tell the main thread that we got the estimated winstreak
-            completed_queue.put(username)
-            logger.debug(f"Updated missing winstreak for {username}")
-
-    # Get tags
-    if isinstance(player, KnownPlayer):
-        tags = controller.get_tags(player.uuid)
+    if not isinstance(player, KnownPlayer):
+        wait_for_requests()
+        return
+
+    def find_request(requests: dict[str, Future[T]]) -> Future[T] | None:
+        return next(
+            (
+                request
+                for uuid, request in requests.items()
+                if compare_uuids(uuid, player.uuid)
+            ),
+            None,
+        )
+
+    def cache_tags(request: Future[Tags | ProcessingError]) -> None:
+        if request.exception() is not None:
+            # Raised when we get the result below
+            return
+
+        tags = request.result()
         if tags is ERROR_DURING_PROCESSING:
             logger.error(f"Error getting tags for {username}")
-        else:
-            for alias in player.aliases:
-                controller.player_cache.update_cached_player(
-                    alias,
-                    functools.partial(KnownPlayer.set_tags, tags=tags),
-                )
+            return
+
+        controller.player_cache.update_cached_player_by_uuid(
+            player.uuid, functools.partial(KnownPlayer.set_tags, tags=tags)
+        )
+
+        # Tell the main thread that we got the tags
+        completed_queue.put(username)
+        logger.debug(f"Set tags for {username}")
 
-            # Tell the main thread that we got the tags
-            completed_queue.put(username)
-            logger.debug(f"Set tags for {username}")
+    def cache_winstreaks(request: Future[tuple[Winstreaks, bool]]) -> None:
+        if request.exception() is not None:
+            # Raised when we get the result below
+            return
+
+        estimated_winstreaks, winstreaks_accurate = request.result()
+        if estimated_winstreaks is MISSING_WINSTREAKS:
+            return
+
+        logger.debug(f"Got estimated winstreak for {username}")
+        controller.player_cache.update_cached_player_by_uuid(
+            player.uuid,
+            functools.partial(
+                KnownPlayer.update_winstreaks,
+                **estimated_winstreaks,
+                winstreaks_accurate=winstreaks_accurate,
+            ),
+        )
+
+        # Tell the main thread that we got the estimated winstreak
+        completed_queue.put(username)
+        logger.debug(f"Updated missing winstreak for {username}")
+
+    tags_request = find_request(tags_requests)
+    if tags_request is None:
+        # The stats are for a uuid we have not requested the tags of
+        tags_request = tags_requests[player.uuid] = executor.submit(
+            controller.get_tags, player.uuid
+        )
+
+    # Cache the results as soon as we get them
+    tags_request.add_done_callback(cache_tags)
+
+    # Get estimated winstreak if missing
+    winstreak_request = None
+    if player.is_missing_winstreaks:
+        winstreak_request = find_request(winstreak_requests)
+        if winstreak_request is None:
+            winstreak_request = winstreak_requests[player.uuid] = executor.submit(
+                controller.get_estimated_winstreaks, player.uuid
+            )
+        winstreak_request.add_done_callback(cache_winstreaks)
+
+    wait_for_requests()
+    tags_request.result()
+    if winstreak_request is not None:
+        winstreak_request.result()
 
 
 def update_settings(new_settings: SettingsDict, controller: OverlayController) -> None:
@@ -261,11 +440,15 @@ def autodenick_teammate(controller: OverlayController) -> None:
         return
 
     # Use the cached stats to narrow missing_teammates and to find the unknown nick
+    # Use the long term cache, as the recency doesn't matter
+    # We just want to know if they're an unknown nick or not
+    cached_players = controller.player_cache.get_cached_players(
+        state.lobby_players, long_term=True
+    )
+
     unknown_nick: str | None = None
     for player in state.lobby_players:
-        # Use the long term cache, as the recency doesn't matter
-        # We just want to know if they're an unknown nick or not
-        stats = controller.player_cache.get_cached_player(player, long_term=True)
+        stats = cached_players.get(player, None)
 
         if stats is None:
             logger.info(f"Aborting autodenick due to {player}'s stats missing")
@@ -325,19 +508,75 @@ def bedwars_game_ended(controller: OverlayController) -> None:
 
 
 def get_cached_player_or_enqueue_request(
-    controller: OverlayController, username: str, long_term: bool = False
+    controller: OverlayController,
+    username: str,
+    long_term: bool = False,
+    allow_stale: bool = False,
 ) -> Player:
-    """Get the player from the cache, or enqueue a request if not cached"""
-    cached_stats, set_pending = (
+    """
+    Get the player from the cache, or enqueue a request if not cached
+
+    If `allow_stale` is True, a player who is only in the long term cache is
+    returned as stale, and a low priority refresh is enqueued.
+    """
+    cached_stats, needs_fetch = (
         controller.player_cache.get_cached_player_or_set_pending(
-            username, long_term=long_term
+            username, long_term=long_term, allow_stale=allow_stale
         )
     )
 
-    if set_pending:
-        # The cache did not have the player, and set them to pending
-        # Enqueue a request for the player
-        logger.debug(f"Enqueuing stats request for {username}")
-        controller.requested_stats_queue.put(username)
+    if needs_fetch:
+        if isinstance(cached_stats, KnownPlayer):
+            # The cache served stale stats - refresh them when we have the time
+            logger.debug(f"Enqueuing stats refresh for {username}")
+            controller.requested_stats_queue.put_refresh(username)
+        else:
+            # The cache did not have the player, and set them to pending
+            # Enqueue a request for the player
+            logger.debug(f"Enqueuing stats request for {username}")
+            controller.requested_stats_queue.put(username)
 
     return cached_stats
+
+
+def get_cached_players_or_enqueue_requests(
+    controller: OverlayController,
+    usernames: Iterable[str],
+    long_term: bool = False,
+    allow_stale: bool = False,
+) -> dict[str, Player]:
+    """
+    Get the players from the cache, and enqueue requests for the ones not cached
+
+    Like get_cached_player_or_enqueue_request, but for the whole lobby at once.
+    """
+    lookup = controller.player_cache.get_cached_players_or_set_pending(
+        usernames, long_term=long_term, allow_stale=allow_stale
+    )
+
+    if lookup.set_pending:
+        logger.debug(f"Enqueuing stats requests for {lookup.set_pending}")
+        controller.requested_stats_queue.put_many(lookup.set_pending)
+
+    if lookup.stale:
+        # The cache served stale stats - refresh them when we have the time
+        logger.debug(f"Enqueuing stats refreshes for {lookup.stale}")
+        controller.requested_stats_queue.put_many(lookup.stale, refresh=True)
+
+    return lookup.players
+
+
+def prefetch_players(controller: OverlayController, usernames: Iterable[str]) -> None:
+    """
+    Fetch the stats of the players in the background, before they join the lobby
+
+    The players are set to pending, and requested with low priority, unless they
+    are already in the long term cache.
+    """
+    lookup = controller.player_cache.get_cached_players_or_set_pending(
+        usernames, long_term=True
+    )
+
+    if lookup.set_pending:
+        logger.debug(f"Prefetching stats for {lookup.set_pending}")
+        controller.requested_stats_queue.put_many(lookup.set_pending, refresh=True)
@@ -13,6 +13,9 @@ class Options:
     loglevel: int
     test_ssl: bool
     test: bool
+    replay_path: Path | None
+    replay_speed: float
+    metrics_interval: float | None
 
 
 def resolve_path(p: str) -> Path:  # pragma: no cover
@@ -20,6 +23,13 @@ def resolve_path(p: str) -> Path:  # pragma: no cover
     return Path(p).resolve()
 
 
+def positive_float(s: str) -> float:
+    value = float(s)
+    if not value > 0:
+        raise argparse.ArgumentTypeError(f"{s} is not a positive number")
+    return value
+
+
 def get_options(
     default_settings_path: Path, args: Sequence[str] | None = None
 ) -> Options:
@@ -70,6 +80,27 @@ def get_options(
         action="store_true",
     )
 
+    parser.add_argument(
+        "--replay",
+        help="Replay a recorded logfile with stubbed stats and report the latency",
+        type=resolve_path,
+        default=None,
+    )
+
+    parser.add_argument(
+        "--speed",
+        help="How many times faster than real time to replay the logfile",
+        type=positive_float,
+        default=1.0,
+    )
+
+    parser.add_argument(
+        "--metrics-interval",
+        help="Log the cache and request metrics every this many seconds",
+        type=positive_float,
+        default=None,
+    )
+
     # Parse the args
     # Parses from sys.argv if args is None
     parsed = parser.parse_args(args=args)
@@ -80,6 +111,9 @@ def get_options(
     assert isinstance(parsed.verbose, int)
     assert isinstance(parsed.test_ssl, bool)
     assert isinstance(parsed.test, bool)
+    assert parsed.replay is None or isinstance(parsed.replay, Path)
+    assert isinstance(parsed.speed, float)
+    assert parsed.metrics_interval is None or isinstance(parsed.metrics_interval, float)
 
     if parsed.verbose <= 0:
         # Default loglevel to INFO
@@ -101,4 +135,7 @@ def get_options(
         loglevel=loglevel,
         test_ssl=parsed.test_ssl,
         test=parsed.test,
+        replay_path=parsed.replay,
+        replay_speed=parsed.speed,
+        metrics_interval=parsed.metrics_interval,
     )
@@ -1,16 +1,21 @@
 import logging
 import queue
 import threading
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
-from typing import TYPE_CHECKING, Protocol
+from typing import TYPE_CHECKING, Protocol, runtime_checkable
 
 from prism.errors import APIError, APIKeyError, APIThrottleError, PlayerNotFoundError
 from prism.flashlight.notices import FlashlightNotice
+from prism.overlay.metrics import LatencyRecorder, MetricsSnapshot
+from prism.overlay.stats_request_queue import StatsRequestQueue
 from prism.player import MISSING_WINSTREAKS, Account, KnownPlayer, Tags, Winstreaks
 from prism.ssl_errors import MissingLocalIssuerSSLError
 
 if TYPE_CHECKING:  # pragma: no cover
     from prism.overlay.nick_database import NickDatabase
+    from prism.overlay.player_store import PlayerStore
     from prism.overlay.settings import Settings
     from prism.overlay.state import OverlayState
 
@@ -45,6 +50,19 @@ class PlayerProvider(Protocol):
     def seconds_until_unblocked(self) -> float: ...
 
 
+# NOTE: Not implemented by any of the player providers yet, see player_batcher
+@runtime_checkable
+class BatchPlayerProvider(PlayerProvider, Protocol):
+    def get_players(
+        self,
+        uuids: Sequence[str],
+        *,
+        user_id: str,
+    ) -> Mapping[str, KnownPlayer]:
+        """Get the players by uuid. Players that are not found are left out"""
+        ...
+
+
 class WinstreakProvider(Protocol):
     def get_estimated_winstreaks_for_uuid(
         self,
@@ -78,7 +96,11 @@ class OverlayController:
         player_provider: PlayerProvider,
         winstreak_provider: WinstreakProvider,
         tags_provider: TagsProvider,
+        player_store: "PlayerStore | None" = None,
     ) -> None:
+        from prism.overlay.account_cache import AccountCache
+        from prism.overlay.behaviour import get_request_priority
+        from prism.overlay.player_batcher import PlayerBatcher
         from prism.overlay.player_cache import PlayerCache
 
         self.urchin_api_key_invalid = False
@@ -87,7 +109,8 @@ class OverlayController:
 
         self.ready = False
         self.wants_shown: bool | None = None
-        self.player_cache = PlayerCache()
+        self.player_cache = PlayerCache(store=player_store)
+        self.account_cache = AccountCache(store=player_store)
         self.state = state
         self.settings = settings
         self.nick_database = nick_database
@@ -96,10 +119,21 @@ class OverlayController:
         self.autowho_event = threading.Event()
 
         # Usernames we want the stats of
-        self.requested_stats_queue = queue.Queue[str]()
+        # Handed out by priority, based on the current state
+        self.requested_stats_queue = StatsRequestQueue(
+            get_priority=lambda username, refresh: get_request_priority(
+                self, username, refresh
+            )
+        )
         # Usernames we have newly downloaded the stats of
         self.completed_stats_queue = queue.Queue[str]()
 
+        # Sends the requests made alongside the playerdata request of a player
+        # Sized like the stats threads, so the amount of threads stays bounded
+        self.enrichment_executor = ThreadPoolExecutor(
+            max_workers=settings.stats_thread_count, thread_name_prefix="enrichment"
+        )
+
         # Updates to the current player's stats
         self.current_player_updates_queue = queue.Queue[KnownPlayer]()
 
@@ -110,11 +144,44 @@ class OverlayController:
         self._winstreak_provider = winstreak_provider
         self._tags_provider = tags_provider
 
+        # Collect the concurrent playerdata requests into batches, if supported
+        self._player_batcher: PlayerBatcher | None = None
+        if isinstance(player_provider, BatchPlayerProvider):
+            self._player_batcher = PlayerBatcher(
+                lambda uuids: player_provider.get_players(
+                    uuids, user_id=self.settings.user_id
+                )
+            )
+
+        # Latencies of the requests to each provider
+        self.latencies = LatencyRecorder()
+
+    @property
+    def seconds_until_unblocked(self) -> float:
+        """Return the number of seconds until the stats providers are unblocked"""
+        return max(
+            self._winstreak_provider.seconds_until_unblocked,
+            self._player_provider.seconds_until_unblocked,
+        )
+
+    def get_metrics(self) -> MetricsSnapshot:
+        """Get the metrics of the caches and the providers"""
+        return MetricsSnapshot(
+            cache=self.player_cache.get_metrics(),
+            latencies=self.latencies.snapshot(),
+        )
+
     def get_uuid(self, username: str) -> str | None | ProcessingError:
+        cached_uuid = self.account_cache.get_uuid(username)
+        if cached_uuid is not None:
+            logger.debug(f"Account cache hit {username}")
+            return cached_uuid
+
         try:
-            account = self._account_provider.get_account_by_username(
-                username, user_id=self.settings.user_id
-            )
+            with self.latencies.time("account"):
+                account = self._account_provider.get_account_by_username(
+                    username, user_id=self.settings.user_id
+                )
         except PlayerNotFoundError:
             self.missing_local_issuer_certificate = False
             return None
@@ -128,14 +195,19 @@ class OverlayController:
             return ERROR_DURING_PROCESSING
         else:
             self.missing_local_issuer_certificate = False
+            self.account_cache.set_uuid(username, account.uuid)
             return account.uuid
 
     def get_player(self, uuid: str) -> KnownPlayer | None | ProcessingError:
         try:
-            player = self._player_provider.get_player(
-                uuid=uuid,
-                user_id=self.settings.user_id,
-            )
+            with self.latencies.time("player"):
+                if self._player_batcher is not None:
+                    player = self._player_batcher.get_player(uuid)
+                else:
+                    player = self._player_provider.get_player(
+                        uuid=uuid,
+                        user_id=self.settings.user_id,
+                    )
         except PlayerNotFoundError as e:
             logger.debug(f"Player not found on Hypixel: {uuid=}", exc_info=e)
             return None
@@ -154,9 +226,10 @@ class OverlayController:
 
     def get_estimated_winstreaks(self, uuid: str) -> tuple[Winstreaks, bool]:
         try:
-            winstreaks, accurate = (
-                self._winstreak_provider.get_estimated_winstreaks_for_uuid(uuid)
-            )
+            with self.latencies.time("winstreak"):
+                winstreaks, accurate = (
+                    self._winstreak_provider.get_estimated_winstreaks_for_uuid(uuid)
+                )
         except APIError as e:
             logger.error(f"API error getting winstreaks for {uuid=}", exc_info=e)
             return MISSING_WINSTREAKS, False
@@ -170,11 +243,12 @@ class OverlayController:
         )
 
         try:
-            tags = self._tags_provider.get_tags(
-                uuid=uuid,
-                user_id=self.settings.user_id,
-                urchin_api_key=urchin_api_key,
-            )
+            with self.latencies.time("tags"):
+                tags = self._tags_provider.get_tags(
+                    uuid=uuid,
+                    user_id=self.settings.user_id,
+                    urchin_api_key=urchin_api_key,
+                )
         except APIKeyError as e:
             logger.warning(
                 f"Invalid Urchin API key getting tags for {uuid=}, "
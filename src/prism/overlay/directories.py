@@ -13,6 +13,8 @@ class PrismDirs:
     config_dir: Path
     settings_path: Path
     logfile_cache_path: Path
+    log_checkpoint_path: Path
+    player_store_path: Path
 
 
 def get_dirs() -> PrismDirs:
@@ -28,6 +30,8 @@ def get_dirs() -> PrismDirs:
         config_dir=config_dir,
         settings_path=config_dir / "settings.toml",
         logfile_cache_path=config_dir / "known_logfiles.toml",
+        log_checkpoint_path=cache_dir / "log_checkpoint.toml",
+        player_store_path=cache_dir / "players.sqlite",
     )
 
 
@@ -38,6 +42,8 @@ LOGDIR = dirs.log_dir
 CONFIG_DIR = dirs.config_dir
 DEFAULT_SETTINGS_PATH = dirs.settings_path
 DEFAULT_LOGFILE_CACHE_PATH = dirs.logfile_cache_path
+DEFAULT_LOG_CHECKPOINT_PATH = dirs.log_checkpoint_path
+DEFAULT_PLAYER_STORE_PATH = dirs.player_store_path
 
 logger = logging.getLogger(__name__)
 
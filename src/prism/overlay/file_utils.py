@@ -1,14 +1,164 @@
 import logging
 import os
 import time
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from dataclasses import dataclass
 from datetime import date, datetime
+from enum import Enum, auto, unique
 from pathlib import Path
-from typing import Literal, overload
+from typing import BinaryIO, Literal, Protocol, overload
 
 logger = logging.getLogger(__name__)
 
 
+@unique
+class FileEvent(Enum):
+    MODIFIED = auto()  # The file has been written to or truncated
+    REPLACED = auto()  # The file has been moved, deleted or (re)created
+
+
+class FileEventSource(Protocol):
+    # Watch the file at `path` (if it exists) and its parent directory
+    def watch(self, path: Path) -> None: ...
+
+    # Block until the watched file changes
+    def wait(self) -> frozenset[FileEvent]: ...
+
+
+@dataclass(slots=True)
+class FileProgress:
+    """How far into which file the lines yielded so far go"""
+
+    position: int = 0
+    ino: int = -1
+    path: Path | None = None
+
+
+def seek_to_last_position(f: BinaryIO, *, last_position: int, last_ino: int) -> int:
+    """
+    Seek to where we left off in the newly opened file. Return its inode
+
+    Seek to the start if the file has been truncated or replaced
+    """
+    new_ino = os.stat(f.fileno()).st_ino
+
+    f.seek(0, os.SEEK_END)
+    new_filesize = f.tell()
+
+    if last_position > new_filesize or (-1 != last_ino != new_ino):
+        # File has been truncated - assume it is new
+        # OR: File has been replaced
+        # Read it from the start
+        f.seek(0, os.SEEK_SET)
+    else:
+        # File is no smaller than at the last read, assume it is the same file
+        # and seek to where we left off
+        f.seek(last_position, os.SEEK_SET)
+
+    return new_ino
+
+
+class ChunkedLineReader:
+    """
+    Read the new lines of a binary file in large chunks
+
+    The bytes are collected in a reused buffer and split into lines without
+    decoding them. If `markers` is passed, only the lines containing one of the
+    markers are decoded and returned, the rest are skipped at the byte level.
+    An incomplete last line is kept in the buffer until its newline is written.
+    Lines are decoded as utf8 with errors replaced, and end with a single newline.
+    """
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        *,
+        markers: Sequence[bytes] | None = None,
+        chunk_size: int = 64 * 1024,
+    ):
+        assert chunk_size > 0
+
+        self._file = file
+        self._markers = markers
+        self._chunk_size = chunk_size
+        # Bytes that have been read, but not yet returned as part of a line
+        self._buffer = bytearray()
+
+    @property
+    def position(self) -> int:
+        """The position in the file right after the last complete line read"""
+        return self._file.tell() - len(self._buffer)
+
+    def _line_spans(self, end: int) -> Iterator[tuple[int, int]]:
+        """Yield (start, stop) of the lines in buffer[:end] that we want to decode"""
+        buffer = self._buffer
+
+        if self._markers is None:
+            start = 0
+            while start < end:
+                stop = buffer.find(b"\n", start, end) + 1
+                yield start, stop
+                start = stop
+            return
+
+        spans: set[tuple[int, int]] = set()
+        for marker in self._markers:
+            index = buffer.find(marker, 0, end)
+            while index != -1:
+                # NOTE: buffer[end - 1] is a newline, so the line always ends in range
+                start = buffer.rfind(b"\n", 0, index) + 1
+                stop = buffer.find(b"\n", index, end) + 1
+                spans.add((start, stop))
+                index = buffer.find(marker, stop, end)
+
+        yield from sorted(spans)
+
+    def read_lines(self) -> list[str] | None:
+        """
+        Read the next chunk of the file and return the new lines, oldest first
+
+        Return None if there was nothing new to read. Note that the returned list
+        may be empty even if the end of the file was not reached.
+        """
+        chunk = self._file.read(self._chunk_size)
+        if not chunk:
+            return None
+
+        self._buffer += chunk
+
+        # End of the last complete line in the buffer
+        end = self._buffer.rfind(b"\n") + 1
+        if end == 0:
+            return []
+
+        lines: list[str] = []
+        with memoryview(self._buffer) as view:
+            for start, stop in self._line_spans(end):
+                line = str(view[start:stop], "utf8", "replace")
+                if line.endswith("\r\n"):
+                    line = line[:-2] + "\n"
+                lines.append(line)
+
+        del self._buffer[:end]
+
+        return lines
+
+    def read_available_lines(self) -> list[str] | None:
+        """
+        Read until the end of the file and return the new lines, oldest first
+
+        Return None if there was nothing new to read.
+        """
+        lines = self.read_lines()
+        if lines is None:
+            return None
+
+        while (more_lines := self.read_lines()) is not None:
+            lines.extend(more_lines)
+
+        return lines
+
+
 @overload
 def watch_file_with_reopen(
     path: Path,
@@ -17,6 +167,7 @@ def watch_file_with_reopen(
     blocking: Literal[False],
     reopen_timeout: float = ...,
     poll_timeout: float = ...,
+    markers: Sequence[bytes] | None = ...,
 ) -> Iterable[str | None]:  # pragma: nocover
     ...
 
@@ -29,6 +180,7 @@ def watch_file_with_reopen(
     blocking: Literal[True],
     reopen_timeout: float = ...,
     poll_timeout: float = ...,
+    markers: Sequence[bytes] | None = ...,
 ) -> Iterable[str]:  # pragma: nocover
     ...
 
@@ -40,46 +192,68 @@ def watch_file_with_reopen(
     blocking: bool,
     reopen_timeout: float = 30,
     poll_timeout: float = 0.1,
+    markers: Sequence[bytes] | None = None,
 ) -> Iterable[str | None]:
     """
     Iterate over new lines in a file, reopen the file when stale
 
-    Seek to `start_at` on first open
+    Like `watch_file_batches_with_reopen`, but yields the lines one at a time
+    If `blocking is False the function will `yield None` for every failed read
+    """
+    for batch in watch_file_batches_with_reopen(
+        path,
+        start_at=start_at,
+        blocking=blocking,
+        reopen_timeout=reopen_timeout,
+        poll_timeout=poll_timeout,
+        markers=markers,
+    ):
+        if not batch:
+            yield None
+        yield from batch
+
+
+def watch_file_batches_with_reopen(
+    path: Path,
+    *,
+    start_at: int,
+    blocking: bool,
+    reopen_timeout: float = 30,
+    poll_timeout: float = 0.1,
+    markers: Sequence[bytes] | None = None,
+    progress: FileProgress | None = None,
+    start_ino: int = -1,
+) -> Iterable[list[str]]:
+    """
+    Iterate over batches of new lines in a file, reopen the file when stale
+
+    Every batch contains all the new lines that were available in the file at once
+    Seek to `start_at` on first open, unless the file is no longer `start_ino`
     Reopen file if more than `reopen_timeout` seconds have passed since last read
     Read again if more than `poll_timeout` seconds have passed since last read
     If `blocking` is True the function will poll until a new line is read
-    If `blocking is False the function will `yield None` for every failed read
+    If `blocking is False the function will yield an empty batch for every failed read
+    If `markers` is passed, only lines containing one of them are returned
+    If `progress` is passed, it is updated to the end of each batch before yielding
     """
 
     last_position = start_at
-    last_ino = -1
+    last_ino = start_ino
 
     while True:
-        with path.open("r", encoding="utf8", errors="replace") as f:
+        with path.open("rb") as f:
             date_openend = date.today()
             last_read = time.monotonic()
 
-            new_ino = os.stat(f.fileno()).st_ino
-
-            f.seek(0, os.SEEK_END)
-            new_filesize = f.tell()
-
-            if last_position > new_filesize or (-1 != last_ino != new_ino):
-                # File has been truncated - assume it is new
-                # OR: File has been replaced
-                # Read it from the start
-                f.seek(0, os.SEEK_SET)
-            else:
-                # File is no smaller than at the last read, assume it is the same file
-                # and seek to where we left off
-                f.seek(last_position, os.SEEK_SET)
-
-            last_ino = new_ino
+            last_ino = seek_to_last_position(
+                f, last_position=last_position, last_ino=last_ino
+            )
+            reader = ChunkedLineReader(f, markers=markers)
 
             while True:
-                line = f.readline()
-                last_position = f.tell()
-                if not line:
+                lines = reader.read_available_lines()
+                last_position = reader.position
+                if lines is None:
                     # No new lines -> wait
                     time_since_last_read = time.monotonic() - last_read
                     new_day = date.today() != date_openend
@@ -102,9 +276,266 @@ def watch_file_with_reopen(
                         break
 
                     if not blocking:
-                        yield None
+                        yield []
                     time.sleep(poll_timeout)
                     continue
 
                 last_read = time.monotonic()
-                yield line
+                if lines:
+                    if progress is not None:
+                        progress.position, progress.ino = last_position, last_ino
+                    yield lines
+
+
+def watch_files_batches(
+    start_at: Mapping[Path, int],
+    *,
+    reopen_timeout: float = 30,
+    poll_timeout: float = 0.1,
+    markers: Sequence[bytes] | None = None,
+    progress: Mapping[Path, FileProgress] | None = None,
+) -> Iterable[tuple[Path, list[str]]]:
+    """
+    Iterate over batches of new lines in any of several files, polling them in turn
+
+    Yields the path of the file each batch was read from along with the batch
+    Watch every file in `start_at`, seeking to the given position on first open
+    Sleep `poll_timeout` seconds when none of the files had any new lines
+    Files that can't be read, e.g. while being rotated, are retried from where we
+    left off, backing off from `poll_timeout` up to `reopen_timeout` seconds
+    If `markers` is passed, only lines containing one of them are returned
+    If `progress` is passed, the progress of each file is updated like in
+    `watch_file_batches_with_reopen`
+    """
+    # Where to resume each file from if its watcher fails
+    file_progress = {
+        path: FileProgress(position=position, path=path)
+        for path, position in start_at.items()
+    }
+
+    def watch(path: Path) -> Iterator[list[str]]:
+        return iter(
+            watch_file_batches_with_reopen(
+                path,
+                start_at=file_progress[path].position,
+                start_ino=file_progress[path].ino,
+                blocking=False,
+                reopen_timeout=reopen_timeout,
+                # We sleep here when none of the files have new lines
+                poll_timeout=0,
+                markers=markers,
+                progress=file_progress[path],
+            )
+        )
+
+    watchers = {path: watch(path) for path in start_at}
+    # The time to retry each failed file at, and the delay before that retry
+    retry_at: dict[Path, float] = {}
+    retry_delays: dict[Path, float] = {}
+
+    while True:
+        any_lines = False
+        for path in start_at:
+            watcher = watchers.get(path, None)
+            if watcher is None:
+                if time.monotonic() < retry_at[path]:
+                    continue
+                watcher = watchers[path] = watch(path)
+
+            try:
+                batch = next(watcher)
+            except OSError as e:
+                del watchers[path]
+
+                failing = path in retry_delays
+                delay = min(
+                    max(retry_delays.get(path, 0) * 2, poll_timeout), reopen_timeout
+                )
+                retry_delays[path] = delay
+                retry_at[path] = time.monotonic() + delay
+
+                if failing:
+                    logger.debug(f"Failed reading file '{path}'; retrying in {delay}s")
+                elif isinstance(e, FileNotFoundError):
+                    logger.info(f"File '{path}' not found; retrying in {delay}s")
+                else:
+                    logger.exception(
+                        f"Failed reading file '{path}'; retrying in {delay}s"
+                    )
+                continue
+
+            retry_delays.pop(path, None)
+
+            if batch:
+                any_lines = True
+                if progress is not None:
+                    progress[path].position = file_progress[path].position
+                    progress[path].ino = file_progress[path].ino
+                yield path, batch
+
+        if not any_lines:
+            time.sleep(poll_timeout)
+
+
+def watch_file_batches_with_events(
+    path: Path,
+    *,
+    start_at: int,
+    file_events: FileEventSource,
+    markers: Sequence[bytes] | None = None,
+    progress: FileProgress | None = None,
+) -> Iterable[list[str]]:
+    """
+    Iterate over batches of new lines in a file, blocking on file events between reads
+
+    Every batch contains all the new lines that were available in the file at once
+    Seek to `start_at` on first open
+    Reopen the file when it is replaced, and read from the start if it is truncated
+    Unlike `watch_file_batches_with_reopen` this never wakes up while the file is
+    unchanged
+    If `markers` is passed, only lines containing one of them are returned
+    If `progress` is passed, it is updated to the end of each batch before yielding
+    """
+
+    last_position = start_at
+    last_ino = -1
+
+    while True:
+        # Start watching before opening so we don't miss changes made in between
+        file_events.watch(path)
+
+        try:
+            f = path.open("rb")
+        except FileNotFoundError:
+            logger.info(f"File '{path}' does not exist; waiting for it to be created")
+            file_events.wait()
+            continue
+
+        with f:
+            last_ino = seek_to_last_position(
+                f, last_position=last_position, last_ino=last_ino
+            )
+
+            reader = ChunkedLineReader(f, markers=markers)
+
+            while True:
+                lines = reader.read_available_lines()
+                last_position = reader.position
+                if lines is not None:
+                    if lines:
+                        if progress is not None:
+                            progress.position, progress.ino = last_position, last_ino
+                        yield lines
+                    continue
+
+                # No new lines -> wait for the file to change
+                events = file_events.wait()
+
+                if FileEvent.REPLACED in events:
+                    logger.info(f"File '{path}' was replaced; reopening")
+                    break
+
+                if os.stat(f.fileno()).st_size < last_position:
+                    logger.info(f"File '{path}' was truncated; reopening")
+                    break
+
+
+class ReversedLineReader:
+    """
+    Read the lines of a binary file from the end towards the start
+
+    The file is read in blocks of `block_size` bytes, so only the part of the file
+    that is actually consumed is read from disk.
+    Lines are decoded as utf8 with errors replaced, and are yielded without the
+    trailing newline.
+    Iterating over the reader and calling `.filter` share the same position, so the
+    caller can switch to skipping uninteresting lines at any point.
+    """
+
+    def __init__(self, file: BinaryIO, *, end: int, block_size: int = 64 * 1024):
+        assert block_size > 0
+
+        self._file = file
+        self._block_size = block_size
+
+        # Start of the unread part of the file
+        self._position = end
+        # Set until the last block of the file has been read
+        self._at_end = True
+        # Set when the first line in the file has been returned
+        self._exhausted = end <= 0
+        # Bytes that have been read, but not yet split into lines
+        # This is the beginning of the line that ends right after our position
+        self._carry = b""
+        # Complete lines read from the current block, oldest first
+        self._lines: list[bytes] = []
+
+    def _read_block(self) -> bytes | None:
+        """Read the block before the current position. None at the start of file"""
+        if self._position <= 0:
+            return None
+
+        start = max(0, self._position - self._block_size)
+        self._file.seek(start)
+        block = self._file.read(self._position - start)
+        self._position = start
+
+        if self._at_end:
+            # A trailing newline terminates the last line, it does not start a new one
+            self._at_end = False
+            block = block.removesuffix(b"\n")
+
+        return block
+
+    def _next_line(self, markers: Sequence[bytes] | None) -> bytes | None:
+        """
+        Return the next line going backwards. None when the file is exhausted
+
+        If `markers` is passed, only lines containing one of the markers are
+        returned. Blocks without any of the markers are skipped without being
+        split into lines.
+        """
+        while True:
+            while self._lines:
+                line = self._lines.pop()
+                if markers is None or any(marker in line for marker in markers):
+                    return line
+
+            if self._exhausted:
+                return None
+
+            block = self._read_block()
+            if block is None:
+                # Start of file - the carry is the first line in the file
+                self._exhausted = True
+                line, self._carry = self._carry, b""
+                if markers is not None and not any(
+                    marker in line for marker in markers
+                ):
+                    return None
+                return line
+
+            data = block + self._carry
+            newline_index = data.find(b"\n")
+            if newline_index == -1:
+                # The entire block is part of a single line
+                self._carry = data
+                continue
+
+            # The first line may continue into the previous block
+            self._carry = data[:newline_index]
+            rest = data[newline_index + 1 :]
+            if markers is not None and not any(marker in rest for marker in markers):
+                continue
+
+            self._lines = rest.split(b"\n")
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over all lines, last line first"""
+        while (line := self._next_line(None)) is not None:
+            yield line.removesuffix(b"\r").decode("utf8", errors="replace")
+
+    def filter(self, markers: Sequence[bytes]) -> Iterator[str]:
+        """Iterate over the lines containing any of `markers`, last line first"""
+        while (line := self._next_line(markers)) is not None:
+            yield line.removesuffix(b"\r").decode("utf8", errors="replace")
@@ -0,0 +1,92 @@
+import logging
+from collections.abc import Iterable, Mapping, Sequence
+from pathlib import Path
+
+from prism.overlay.controller import OverlayController
+from prism.overlay.file_utils import (
+    FileProgress,
+    ReversedLineReader,
+    watch_files_batches,
+)
+from prism.overlay.parsing import LOGLINE_MARKERS
+from prism.overlay.process_event import fast_forward_state_reversed
+from prism.overlay.state import OverlayState
+
+logger = logging.getLogger(__name__)
+
+
+def switch_logfile(
+    controller: OverlayController, logfile_path: Path, progress: FileProgress
+) -> None:
+    """
+    Replace the state with the state at `progress` in the new logfile
+
+    NOTE: Caller must ensure exclusive write-access to controller.state
+    """
+    controller.state = OverlayState()
+
+    try:
+        with logfile_path.open("rb") as logfile:
+            fast_forward_state_reversed(
+                controller, ReversedLineReader(logfile, end=progress.position)
+            )
+    except OSError:
+        logger.exception(f"Failed reading logfile '{logfile_path}' when switching")
+
+    controller.redraw_event.set()
+
+
+def follow_active_logfile(
+    controller: OverlayController,
+    start_at: Mapping[Path, int],
+    *,
+    active: Path,
+    progress: FileProgress,
+    poll_timeout: float = 0.1,
+) -> Iterable[Sequence[str]]:
+    """
+    Watch all the logfiles and yield the batches of the one currently in use
+
+    The active logfile switches to whichever logfile gets new loglines, like a
+    `Setting user` line or chat messages. When switching, the state is rebuilt from
+    the end of the new logfile before its batch is yielded.
+    `progress` is updated to the end of each yielded batch in the active logfile.
+
+    The batches must be consumed by processing each batch completely before
+    requesting the next one.
+    """
+    file_progress = {
+        path: FileProgress(position=position, path=path)
+        for path, position in start_at.items()
+    }
+    # The progress of each file before its last batch
+    previous_progress = {
+        path: FileProgress(position=position, path=path)
+        for path, position in start_at.items()
+    }
+
+    for path, batch in watch_files_batches(
+        start_at,
+        poll_timeout=poll_timeout,
+        markers=LOGLINE_MARKERS,
+        progress=file_progress,
+    ):
+        current = file_progress[path]
+        previous = previous_progress[path]
+
+        if path != active:
+            logger.info(f"Switching to logfile '{path}'")
+            active = path
+
+            if previous.position > current.position or (
+                -1 != previous.ino != current.ino
+            ):
+                # The file was truncated or replaced -> the batch starts at the start
+                previous.position = 0
+            switch_logfile(controller, path, previous)
+
+        previous.position, previous.ino = current.position, current.ino
+        progress.position, progress.ino = current.position, current.ino
+        progress.path = path
+
+        yield batch
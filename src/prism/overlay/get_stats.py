@@ -1,4 +1,5 @@
 import logging
+from collections.abc import Callable
 from dataclasses import replace
 
 from prism.overlay.controller import ERROR_DURING_PROCESSING, OverlayController
@@ -28,9 +29,20 @@ def denick(nick: str, controller: OverlayController) -> str | None:
 
 
 def fetch_bedwars_stats(
-    username: str, controller: OverlayController
+    username: str,
+    controller: OverlayController,
+    on_uuid: Callable[[str], None] | None = None,
 ) -> KnownPlayer | NickedPlayer | UnknownPlayer:
-    """Fetches the bedwars stats for the given player"""
+    """
+    Fetches the bedwars stats for the given player
+
+    `on_uuid` is called with each uuid we get the stats of, before getting them.
+    """
+    nicked_player = controller.player_cache.get_cached_nicked_player(username)
+    if nicked_player is not None:
+        logger.debug(f"{username} was recently found to be nicked")
+        return nicked_player
+
     uuid = controller.get_uuid(username)
     if uuid is ERROR_DURING_PROCESSING:
         # Error while getting uuid -> unknown player
@@ -54,7 +66,11 @@ def fetch_bedwars_stats(
         # Could not find uuid or denick - assume nicked
         return NickedPlayer(nick=username)
 
-    player = controller.get_player(uuid)
+    if on_uuid is not None:
+        on_uuid(uuid)
+
+    # Reuse the stats if the player is cached, or being fetched, under another alias
+    player = controller.player_cache.fetch_player_by_uuid(uuid, controller.get_player)
     if player is ERROR_DURING_PROCESSING:
         logger.warning(
             f"Error while getting player for '{uuid}' - returning UnknownPlayer"
@@ -75,6 +91,8 @@ def fetch_bedwars_stats(
             f"Mismatching player name for {username=} {uuid=} {player.username=}. "
             "Assuming the player is nicked and attempting denick."
         )
+        # The username may have changed owner since we cached their uuid
+        controller.account_cache.uncache_uuid(username)
         player = None
 
     if not denicked and player is None:
@@ -87,7 +105,12 @@ def fetch_bedwars_stats(
             nick = username
             logger.debug(f"De-nicked {username} as {uuid} after hit from Mojang")
 
-            player = controller.get_player(uuid)
+            if on_uuid is not None:
+                on_uuid(uuid)
+
+            player = controller.player_cache.fetch_player_by_uuid(
+                uuid, controller.get_player
+            )
             if player is ERROR_DURING_PROCESSING:  # pragma: no cover
                 logger.warning(
                     f"Error while getting player for '{uuid}' - returning UnknownPlayer"
@@ -112,6 +135,7 @@ def fetch_bedwars_stats(
 def get_and_cache_stats(
     username: str,
     controller: OverlayController,
+    on_uuid: Callable[[str], None] | None = None,
 ) -> KnownPlayer | NickedPlayer | UnknownPlayer:
     """Get and cache the bedwars stats for the given player"""
     # NOTE: We store the genus before we make the request
@@ -120,7 +144,7 @@ def get_and_cache_stats(
     #       The stats instance will still be returned.
     cache_genus = controller.player_cache.current_genus
 
-    player = fetch_bedwars_stats(username, controller)
+    player = fetch_bedwars_stats(username, controller, on_uuid=on_uuid)
 
     if isinstance(player, KnownPlayer) and player.nick is not None:
         # If we look up by actual username, that means the user is not nicked
@@ -0,0 +1,226 @@
+import hashlib
+import logging
+import os
+import time
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+import toml
+
+from prism.overlay.controller import OverlayController
+from prism.overlay.file_utils import FileProgress, ReversedLineReader
+from prism.overlay.state import OverlayState
+
+logger = logging.getLogger(__name__)
+
+# Minimum number of seconds between writes of the checkpoint
+CHECKPOINT_INTERVAL = 10.0
+
+
+@dataclass(frozen=True, slots=True)
+class LogCheckpoint:
+    """
+    The overlay state after processing the logfile up to `position`
+
+    The file at `logfile_path` with inode `ino` is identified as the same file if
+    the last line before `position` still hashes to `last_line_hash`.
+    NOTE: state.last_game_start is not stored, as it is a monotonic timestamp
+    """
+
+    logfile_path: Path
+    ino: int
+    position: int
+    last_line_hash: str
+    state: OverlayState
+
+
+def hash_last_line(f: BinaryIO, position: int) -> str:
+    """Return a hash of the line ending at `position` in the file"""
+    last_line = next(iter(ReversedLineReader(f, end=position, block_size=4096)), "")
+    return hashlib.sha256(last_line.encode("utf8")).hexdigest()
+
+
+def state_to_dict(state: OverlayState) -> dict[str, object]:
+    """Serialize the persistent parts of the state"""
+    state_dict: dict[str, object] = {
+        "party_members": sorted(state.party_members),
+        "lobby_players": sorted(state.lobby_players),
+        "alive_players": sorted(state.alive_players),
+        "out_of_sync": state.out_of_sync,
+        "in_queue": state.in_queue,
+    }
+    if state.own_username is not None:
+        state_dict["own_username"] = state.own_username
+
+    return state_dict
+
+
+def _read_usernames(source: Mapping[str, object], key: str) -> frozenset[str]:
+    value = source.get(key, None)
+    if not isinstance(value, list) or not all(isinstance(el, str) for el in value):
+        raise ValueError(f"Invalid {key}: {value!r}")
+    return frozenset(value)
+
+
+def _read_bool(source: Mapping[str, object], key: str) -> bool:
+    value = source.get(key, None)
+    if not isinstance(value, bool):
+        raise ValueError(f"Invalid {key}: {value!r}")
+    return value
+
+
+def state_from_dict(source: Mapping[str, object]) -> OverlayState:
+    """Deserialize a state written by state_to_dict. Raise ValueError if invalid"""
+    own_username = source.get("own_username", None)
+    if own_username is not None and not isinstance(own_username, str):
+        raise ValueError(f"Invalid own_username: {own_username!r}")
+
+    return OverlayState(
+        party_members=_read_usernames(source, "party_members"),
+        lobby_players=_read_usernames(source, "lobby_players"),
+        alive_players=_read_usernames(source, "alive_players"),
+        out_of_sync=_read_bool(source, "out_of_sync"),
+        in_queue=_read_bool(source, "in_queue"),
+        own_username=own_username,
+    )
+
+
+def read_log_checkpoint(checkpoint_path: Path) -> LogCheckpoint | None:
+    """Read the stored checkpoint. Return None if it is missing or invalid"""
+    try:
+        source = toml.load(checkpoint_path)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        logger.exception("Failed loading log checkpoint")
+        return None
+
+    logfile_path = source.get("logfile_path", None)
+    ino = source.get("ino", None)
+    position = source.get("position", None)
+    last_line_hash = source.get("last_line_hash", None)
+    state_source = source.get("state", None)
+
+    if (
+        not isinstance(logfile_path, str)
+        or not isinstance(ino, int)
+        or not isinstance(position, int)
+        or position < 0
+        or not isinstance(last_line_hash, str)
+        or not isinstance(state_source, dict)
+    ):
+        logger.warning(f"Invalid log checkpoint {source}")
+        return None
+
+    try:
+        state = state_from_dict(state_source)
+    except ValueError:
+        logger.exception("Invalid state in log checkpoint")
+        return None
+
+    return LogCheckpoint(
+        logfile_path=Path(logfile_path),
+        ino=ino,
+        position=position,
+        last_line_hash=last_line_hash,
+        state=state,
+    )
+
+
+def write_log_checkpoint(checkpoint_path: Path, checkpoint: LogCheckpoint) -> None:
+    """Write the checkpoint, replacing the old one atomically"""
+    temp_path = checkpoint_path.with_name(f"{checkpoint_path.name}.tmp")
+    with temp_path.open("w", encoding="utf8") as f:
+        toml.dump(
+            {
+                "logfile_path": str(checkpoint.logfile_path),
+                "ino": checkpoint.ino,
+                "position": checkpoint.position,
+                "last_line_hash": checkpoint.last_line_hash,
+                "state": state_to_dict(checkpoint.state),
+            },
+            f,
+        )
+    os.replace(temp_path, checkpoint_path)
+
+
+def checkpoint_matches(
+    checkpoint: LogCheckpoint, logfile_path: Path, f: BinaryIO
+) -> bool:
+    """Return True if the checkpoint was made for the opened logfile"""
+    if checkpoint.logfile_path != logfile_path:
+        return False
+
+    if checkpoint.ino != os.stat(f.fileno()).st_ino:
+        return False
+
+    if checkpoint.position > f.seek(0, os.SEEK_END):
+        # The file has been truncated
+        return False
+
+    return hash_last_line(f, checkpoint.position) == checkpoint.last_line_hash
+
+
+def create_log_checkpoint(
+    logfile_path: Path, progress: FileProgress, state: OverlayState
+) -> LogCheckpoint | None:
+    """Create a checkpoint for the state at `progress`. None if the file changed"""
+    try:
+        with logfile_path.open("rb") as f:
+            if os.stat(f.fileno()).st_ino != progress.ino:
+                # The file has been replaced since we read it
+                return None
+            last_line_hash = hash_last_line(f, progress.position)
+    except OSError:
+        logger.exception(f"Failed reading logfile '{logfile_path}' for checkpoint")
+        return None
+
+    return LogCheckpoint(
+        logfile_path=logfile_path,
+        ino=progress.ino,
+        position=progress.position,
+        last_line_hash=last_line_hash,
+        state=state,
+    )
+
+
+def checkpoint_logline_batches(
+    logline_batches: Iterable[Sequence[str]],
+    controller: OverlayController,
+    *,
+    progress: FileProgress,
+    checkpoint_path: Path,
+    interval: float = CHECKPOINT_INTERVAL,
+) -> Iterable[Sequence[str]]:
+    """
+    Pass through the batches and periodically checkpoint the state
+
+    The batches must come from a watcher updating `progress`, and be consumed by
+    processing each batch completely before requesting the next one.
+    The checkpoint is made for the file at `progress.path`, which may change.
+    """
+    last_write = time.monotonic()
+    last_state = controller.state
+
+    for batch in logline_batches:
+        yield batch
+
+        # The previous batch has been processed, so the state is at `progress`
+        state = controller.state
+        now = time.monotonic()
+        if state is last_state or now - last_write < interval or progress.path is None:
+            continue
+
+        checkpoint = create_log_checkpoint(progress.path, progress, state)
+        if checkpoint is None:
+            continue
+
+        try:
+            write_log_checkpoint(checkpoint_path, checkpoint)
+        except OSError:
+            logger.exception("Failed writing log checkpoint")
+
+        last_write = now
+        last_state = state
@@ -0,0 +1,168 @@
+import bisect
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass, fields
+from typing import TypeVar
+
+from cachetools import TLRUCache
+
+# Upper bounds of the latency histogram buckets. The last bucket is unbounded
+LATENCY_BUCKET_BOUNDS_SECONDS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class CountingTLRUCache(TLRUCache[K, V, float]):
+    """TLRUCache that counts the entries evicted due to their size or age"""
+
+    def __init__(
+        self,
+        maxsize: float,
+        ttu: Callable[[K, V, float], float],
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        super().__init__(maxsize=maxsize, ttu=ttu, timer=timer)
+        self.evictions = 0
+
+    def expire(self, time: float | None = None) -> list[tuple[K, V]]:
+        expired = super().expire(time)
+        self.evictions += len(expired)
+        return expired
+
+    def popitem(self) -> tuple[K, V]:
+        # Only called by TLRUCache when the cache is full
+        item = super().popitem()
+        self.evictions += 1
+        return item
+
+
+class ThreadCounters:
+    """
+    Named counters that can be incremented from any thread without taking a lock
+
+    Each thread only increments its own Counter, and reading a count sums the
+    Counters of all the threads.
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._thread_counters: list[Counter[str]] = []
+
+    def increment(self, name: str) -> None:
+        counter: Counter[str] | None = getattr(self._local, "counter", None)
+        if counter is None:
+            counter = self._local.counter = Counter[str]()
+            self._thread_counters.append(counter)
+
+        counter[name] += 1
+
+    def __getitem__(self, name: str) -> int:
+        return sum(counter[name] for counter in self._thread_counters)
+
+
+@dataclass(frozen=True, slots=True)
+class CacheMetrics:
+    """Counters for the lookups in PlayerCache, and the size of each tier"""
+
+    hits: int
+    misses: int
+    stale_hits: int
+    pending_joins: int
+    nicked_hits: int
+    evictions: int
+    genus_rejected_writes: int
+    short_term_size: int
+    long_term_size: int
+    nicked_size: int
+
+
+@dataclass(frozen=True, slots=True)
+class LatencyHistogram:
+    """
+    Histogram of the latencies of the requests to a provider
+
+    bucket_counts[i] is the amount of requests that took at most
+    LATENCY_BUCKET_BOUNDS_SECONDS[i], and more than the previous bound.
+    The last bucket counts the requests slower than every bound.
+    """
+
+    bucket_counts: tuple[int, ...]
+    total_seconds: float
+
+    @property
+    def count(self) -> int:
+        return sum(self.bucket_counts)
+
+    @property
+    def mean_seconds(self) -> float | None:
+        return self.total_seconds / self.count if self.count else None
+
+
+@dataclass(frozen=True, slots=True)
+class MetricsSnapshot:
+    cache: CacheMetrics
+    latencies: Mapping[str, LatencyHistogram]
+
+
+class LatencyRecorder:
+    """Record the latencies of the requests to each provider"""
+
+    def __init__(self, get_time: Callable[[], float] = time.monotonic) -> None:
+        self._get_time = get_time
+        self._bucket_counts: dict[str, list[int]] = {}
+        self._total_seconds: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, provider: str, seconds: float) -> None:
+        bucket = bisect.bisect_left(LATENCY_BUCKET_BOUNDS_SECONDS, seconds)
+        with self._lock:
+            bucket_counts = self._bucket_counts.setdefault(
+                provider, [0] * (len(LATENCY_BUCKET_BOUNDS_SECONDS) + 1)
+            )
+            bucket_counts[bucket] += 1
+            self._total_seconds[provider] = (
+                self._total_seconds.get(provider, 0.0) + seconds
+            )
+
+    @contextmanager
+    def time(self, provider: str) -> Iterator[None]:
+        """Record the time taken by the block, also when it raises"""
+        start = self._get_time()
+        try:
+            yield
+        finally:
+            self.record(provider, self._get_time() - start)
+
+    def snapshot(self) -> dict[str, LatencyHistogram]:
+        with self._lock:
+            return {
+                provider: LatencyHistogram(
+                    bucket_counts=tuple(bucket_counts),
+                    total_seconds=self._total_seconds[provider],
+                )
+                for provider, bucket_counts in self._bucket_counts.items()
+            }
+
+
+def format_metrics(snapshot: MetricsSnapshot) -> str:
+    """Format the metrics as a single line for the log"""
+    cache_str = " ".join(
+        f"{field.name}={getattr(snapshot.cache, field.name)}"
+        for field in fields(snapshot.cache)
+    )
+
+    latency_strs = []
+    for provider, histogram in sorted(snapshot.latencies.items()):
+        mean_seconds = histogram.mean_seconds
+        mean_str = f"{mean_seconds * 1000:.0f}ms" if mean_seconds is not None else "-"
+        buckets_str = ",".join(map(str, histogram.bucket_counts))
+        latency_strs.append(
+            f"{provider}: count={histogram.count} mean={mean_str} "
+            f"buckets=[{buckets_str}]"
+        )
+
+    return f"Cache: {cache_str}. Latencies: {'; '.join(latency_strs) or '-'}"
@@ -545,7 +545,14 @@ def render_stats(
         winstreak_cell = kills_cell = finals_cell = beds_cell = wins_cell = cell
         sessiontime_cell = tags_cell = cell
 
-    username_cell = CellValue.monochrome(username_str, gui_color=GUIColor.WHITE)
+    username_cell = CellValue.monochrome(
+        username_str,
+        gui_color=(
+            GUI_COLORS[0]
+            if isinstance(player, KnownPlayer) and player.stale
+            else GUIColor.WHITE
+        ),
+    )
 
     return RenderedStats(
         username=username_cell,
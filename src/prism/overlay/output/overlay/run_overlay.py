@@ -1,10 +1,13 @@
 import logging
 import math
 import time
-from collections.abc import Iterable
+from collections.abc import Iterable, Sequence
 
 from prism.flashlight.auth.manager import AuthManager
-from prism.overlay.behaviour import get_cached_player_or_enqueue_request, should_redraw
+from prism.overlay.behaviour import (
+    get_cached_players_or_enqueue_requests,
+    should_redraw,
+)
 from prism.overlay.controller import OverlayController
 from prism.overlay.output.cells import InfoCellValue
 from prism.overlay.output.overlay.stats_overlay import StatsOverlay
@@ -40,13 +43,16 @@ def get_stat_list(controller: OverlayController) -> list[Player] | None:
     # Players who are present in the lobby twice - once nicked and once unnicked
     duplicate_nicked_usernames = []
 
+    # Use the short term cache in queue to refresh stats between games
+    # When we are not in queue (in game) use the long term cache, as we don't
+    # want to refetch all the stats when someone gets final killed
+    # Stats that expired from the short term cache are shown while refreshing
+    cached_players = get_cached_players_or_enqueue_requests(
+        controller, displayed_players, long_term=not state.in_queue, allow_stale=True
+    )
+
     for player in displayed_players:
-        # Use the short term cache in queue to refresh stats between games
-        # When we are not in queue (in game) use the long term cache, as we don't
-        # want to refetch all the stats when someone gets final killed
-        cached_stats = get_cached_player_or_enqueue_request(
-            controller, player, long_term=not state.in_queue
-        )
+        cached_stats = cached_players[player]
 
         if (
             isinstance(cached_stats, KnownPlayer)
@@ -88,11 +94,12 @@ def get_stat_list(controller: OverlayController) -> list[Player] | None:
 
 def run_overlay(
     controller: OverlayController,
-    loglines: Iterable[str],
+    logline_batches: Iterable[Sequence[str]],
     auth: AuthManager,
+    metrics_interval: float | None = None,
 ) -> None:  # pragma: nocover
     """Run the overlay"""
-    start_threads(controller, loglines, auth)
+    start_threads(controller, logline_batches, auth, metrics_interval)
 
     def get_new_data() -> tuple[bool, list[InfoCellValue], list[OverlayRowData] | None]:
         # Store a persistent view to the current state
@@ -153,10 +160,7 @@ def run_overlay(
                 )
             )
 
-        block_duration_seconds = max(
-            controller._winstreak_provider.seconds_until_unblocked,
-            controller._player_provider.seconds_until_unblocked,
-        )
+        block_duration_seconds = controller.seconds_until_unblocked
 
         if block_duration_seconds > 0:
             pause = math.ceil(block_duration_seconds)
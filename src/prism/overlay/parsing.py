@@ -1,6 +1,7 @@
 import logging
 import re
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
 from typing import Final
 
 from prism.overlay.events import (
@@ -61,10 +62,40 @@ CHAT_PREFIXES = (
     "[Astolfo HTTP Bridge]: [CHAT] ",
 )
 
-# This client likes to include a bunch of random characters in it's prefix
-ALPINE_CHAT_PREFIX_REGEX = re.compile(
-    r"\[Client thread\/INFO\] \[alpine ?client.*\]: \[CHAT\] ",
-    flags=re.IGNORECASE,
+# Matches any of the chat prefixes
+# Since the regex engine returns the leftmost match, we always find the first chat
+# prefix in the line. This prevents users being able to inject a payload by typing a
+# message starting with the log prefix.
+# NOTE: Every alternative starts with a literal character, which lets the regex engine
+#       skip ahead to the positions where a prefix can start.
+CHAT_PREFIX_REGEX = re.compile(
+    "|".join(
+        (
+            *map(re.escape, CHAT_PREFIXES),
+            # This client likes to include a bunch of random characters in it's prefix
+            # "[Client thread/INFO] [alpineclient.xxxxx/]: [CHAT] Player1 ...
+            # Only the casings of [CHAT] in LOGLINE_MARKERS get past the prefilter
+            r"\[(?i:Client thread/INFO\] \[alpine ?client.*?\]: )\[(?:CHAT|chat)\] ",
+            # "[Netty Client IO #7/INFO]: [CHAT] " (max 3 digits)
+            r"\[Netty Client IO #.{0,3}/INFO\]: \[CHAT\] ",
+        )
+    )
+)
+
+# Matches any of the client info prefixes
+# Some prefixes share a start, so we try the longest ones first
+CLIENT_INFO_PREFIX_REGEX = re.compile(
+    "|".join(map(re.escape, sorted(CLIENT_INFO_PREFIXES, key=len, reverse=True)))
+)
+
+
+# Byte strings present in every logline that `parse_logline` can produce an event for
+# Used to skip uninteresting lines before decoding them
+LOGLINE_MARKERS = (
+    b"[CHAT] ",  # All chat prefixes
+    b"[chat] ",  # Lowercase chat prefix on alpine
+    b"Setting user: ",
+    b"Setting account (name=",  # Alpine
 )
 
 
@@ -92,79 +123,20 @@ def remove_ranks(playerstring: str) -> str:
     return RANK_REGEX.sub("", playerstring)
 
 
-def get_lowest_index(source: str, *strings: str) -> str | None:
-    """
-    Return the substring that ends at the lowest index in source
-
-    If none of the strings are strings of source, return None.
-    """
-
-    # Store result intermediately to circumvent mypy bug
-    # https://github.com/python/mypy/issues/5874
-    result = min(
-        filter(lambda s: s in source, strings),
-        key=lambda s: source.index(s) + len(s),
-        default=None,
-    )
-
-    return result
-
-
-def get_highest_index(source: str, *strings: str) -> str | None:
-    """
-    Return the substring that ends at the highest index in source
-
-    If none of the strings are strings of source, return None.
-    """
-
-    # Store result intermediately to circumvent mypy bug
-    # https://github.com/python/mypy/issues/5874
-    result = max(
-        filter(lambda s: s in source, strings),
-        key=lambda s: source.index(s) + len(s),
-        default=None,
-    )
-
-    return result
-
-
 def parse_logline(logline: str) -> Event | None:
     """Parse a log line to detect players leaving or joining the lobby/party"""
 
-    # Get the lowest index of any of the chat prefixes to find the message
-    # This prevents users being able to inject a payload by typing a message
-    # starting with the log prefix
-    chat_prefix = get_lowest_index(logline, *CHAT_PREFIXES)
-    if chat_prefix is not None:
-        return parse_chat_message(strip_until(logline, until=chat_prefix))
-
-    # Special case for alpine
-    if "alpine" in logline.lower() and (
-        alpine_match := ALPINE_CHAT_PREFIX_REGEX.search(logline)
-    ):
-        # "[Client thread/INFO] [alpineclient.xxxxx/]: [CHAT] Player1 ...
-        return parse_chat_message(strip_until(logline, until=alpine_match.group()))
-
-    # Horrible special case
-    NETTY_CLIENT_FRAGMENT = "[Netty Client IO #"
-    NETTY_CHAT_FRAGMENT = "/INFO]: [CHAT] "
-    if (
-        (chat_index := logline.find(NETTY_CHAT_FRAGMENT)) != -1
-        and (client_index := logline.find(NETTY_CLIENT_FRAGMENT)) != -1
-        and client_index < chat_index
-        and chat_index - client_index - len(NETTY_CLIENT_FRAGMENT) <= 3  # Max 3 digits
-    ):
-        # "[Netty Client IO #7/INFO]: [CHAT] "
-        return parse_chat_message(
-            strip_until(logline, until=logline[: chat_index + len(NETTY_CHAT_FRAGMENT)])
-        )
+    # Chat lines make up the majority of the lines we parse, and are classified in a
+    # single search for the first chat prefix
+    chat_prefix_match = CHAT_PREFIX_REGEX.search(logline)
+    if chat_prefix_match is not None:
+        return parse_chat_message(logline[chat_prefix_match.end() :].rstrip())
 
     # Since we have assumed that we have filtered all chatlines, these lines are not
-    # user controlled, and we are safe to not use the lowest index.
-    # Instead we use the highest index as some prefixes share a prefix.
-    client_info_prefix = get_highest_index(logline, *CLIENT_INFO_PREFIXES)
-    if client_info_prefix is not None:
-        return parse_client_info(strip_until(logline, until=client_info_prefix))
+    # user controlled, and we are safe to use the first match.
+    client_info_prefix_match = CLIENT_INFO_PREFIX_REGEX.search(logline)
+    if client_info_prefix_match is not None:
+        return parse_client_info(logline[client_info_prefix_match.end() :].rstrip())
 
     return None
 
@@ -246,6 +218,139 @@ def remove_deduplication_suffix(message: str) -> str:
     return message
 
 
+ChatParser = Callable[[str], ChatEvent | None]
+
+
+@dataclass(frozen=True, slots=True)
+class ChatRule:
+    """
+    A rule in the chat grammar
+
+    `parse` is called on the messages where `matches` returns True.
+    The other fields are used by ChatRuleIndex to only check the rules that can match
+    a given message, and the rule is indexed by the first of them that is set.
+    For a message to match the rule it has to:
+        - start with one of `prefixes`, ignoring leading whitespace
+        - be equal to `exact` when stripped of punctuation and whitespace
+        - end with `suffix` when stripped of punctuation and whitespace
+        - contain `contains`
+    Rules without any of these are checked for every message.
+    """
+
+    matches: Callable[[str], bool]
+    parse: ChatParser
+    prefixes: tuple[str, ...] = ()
+    exact: str | None = None
+    suffix: str | None = None
+    contains: str | None = None
+
+
+def starts_with_rule(parse: ChatParser, *prefixes: str) -> ChatRule:
+    """Return a rule matching messages starting with any of `prefixes`"""
+    return ChatRule(
+        matches=lambda message: message.startswith(prefixes),
+        parse=parse,
+        prefixes=prefixes,
+    )
+
+
+def exact_rule(parse: ChatParser, text: str) -> ChatRule:
+    """Return a rule matching `text`, ignoring surrounding punctuation and whitespace"""
+    return ChatRule(
+        matches=lambda message: message.strip(PUNCTUATION_AND_WHITESPACE) == text,
+        parse=parse,
+        exact=text,
+    )
+
+
+def contains_rule(parse: ChatParser, substring: str) -> ChatRule:
+    """Return a rule matching messages containing `substring`"""
+    return ChatRule(
+        matches=lambda message: substring in message,
+        parse=parse,
+        contains=substring,
+    )
+
+
+class ChatRuleIndex:
+    """
+    Dispatcher for an ordered sequence of chat rules
+
+    Equivalent to calling `parse` for the first rule in `rules` that matches the
+    message, but only checks the rules that are indexed under the message.
+    """
+
+    def __init__(self, rules: Sequence[ChatRule]) -> None:
+        self.rules = tuple(rules)
+
+        self._by_first_word: dict[str, list[int]] = {}
+        self._by_exact: dict[str, list[int]] = {}
+        self._by_suffix: dict[str, list[int]] = {}
+        self._by_contains: dict[str, list[int]] = {}
+        self._always: list[int] = []
+
+        for rank, rule in enumerate(self.rules):
+            if rule.prefixes:
+                # NOTE: The prefixes must contain a complete first word
+                assert all(" " in prefix for prefix in rule.prefixes)
+                for first_word in {prefix.split(" ")[0] for prefix in rule.prefixes}:
+                    self._by_first_word.setdefault(first_word, []).append(rank)
+            elif rule.exact is not None:
+                self._by_exact.setdefault(rule.exact, []).append(rank)
+            elif rule.suffix is not None:
+                self._by_suffix.setdefault(rule.suffix, []).append(rank)
+            elif rule.contains is not None:
+                self._by_contains.setdefault(rule.contains, []).append(rank)
+            else:
+                self._always.append(rank)
+
+        self._prefixes = tuple(
+            prefix for rule in self.rules for prefix in rule.prefixes
+        )
+        self._suffixes = tuple(self._by_suffix)
+        self._contains_regex = re.compile(
+            "|".join(map(re.escape, self._by_contains)) or "(?!)"
+        )
+
+    def candidates(self, message: str) -> list[int]:
+        """Return the indices of the rules that can match the message, in order"""
+        ranks: list[int] = []
+
+        # Most messages don't start with any of the prefixes, so check all at once
+        lstripped = message.lstrip()
+        if lstripped.startswith(self._prefixes):
+            ranks = self._by_first_word[lstripped.split(" ", 1)[0]]
+
+        stripped = message.strip(PUNCTUATION_AND_WHITESPACE)
+        if stripped in self._by_exact:
+            ranks = ranks + self._by_exact[stripped]
+
+        if stripped.endswith(self._suffixes):
+            for suffix, suffix_ranks in self._by_suffix.items():
+                if stripped.endswith(suffix):
+                    ranks = ranks + suffix_ranks
+
+        # Most messages don't contain any of the substrings, so check all at once
+        if self._contains_regex.search(message):
+            for substring, substring_ranks in self._by_contains.items():
+                if substring in message:
+                    ranks = ranks + substring_ranks
+
+        if not ranks:
+            return self._always
+
+        return sorted(ranks + self._always)
+
+    def parse(self, message: str) -> ChatEvent | None:
+        """Parse the message with the first matching rule"""
+        for rank in self.candidates(message):
+            rule = self.rules[rank]
+            if rule.matches(message):
+                return rule.parse(message)
+
+        return None
+
+
 def parse_chat_message(message: str) -> ChatEvent | None:
     """
     Parse a chat message to detect players leaving or joining the lobby/party
@@ -256,400 +361,420 @@ def parse_chat_message(message: str) -> ChatEvent | None:
     Not like:
         '...client.gui.GuiNewChat (Client thread) Info [CHAT] Player joined your party!'
     """
-    # Lobby changes
-    WHO_PREFIX = "ONLINE: "
-
     # Use lazy printf-style formatting because this message is very common
     logger.debug("Chat message: '%s'", message)
 
     message = remove_colors(remove_deduplication_suffix(message))
 
-    if message.startswith(WHO_PREFIX):
-        # Info [CHAT] ONLINE: <username1>, <username2>, ..., <usernameN>
-        players = message.removeprefix(WHO_PREFIX).split(", ")
-        return LobbyListEvent(players)
+    return CHAT_RULE_INDEX.parse(message)
 
-    if message.startswith("You are now nicked as "):
-        # Info [CHAT] You are now nicked as AmazingNick!
-        logger.debug("Processing potential new nickname")
-        words = message.split(" ")
-        if not words_match(words[:-1], "You are now nicked as"):
-            return None
 
-        new_nickname = words[-1].strip(PUNCTUATION_AND_WHITESPACE)
+# Lobby changes
+WHO_PREFIX = "ONLINE: "
+
 
-        logger.debug(f"Parsing passed. New nickname: {new_nickname}")
-        return NewNicknameEvent(new_nickname)
+def parse_lobby_list(message: str) -> ChatEvent | None:
+    # Info [CHAT] ONLINE: <username1>, <username2>, ..., <usernameN>
+    players = message.removeprefix(WHO_PREFIX).split(", ")
+    return LobbyListEvent(players)
 
-    if message.startswith("Sending you to "):
-        logger.debug("Parsing passed. Swapping lobby")
-        return LobbySwapEvent()
 
+def parse_new_nickname(message: str) -> ChatEvent | None:
+    # Info [CHAT] You are now nicked as AmazingNick!
+    logger.debug("Processing potential new nickname")
+    words = message.split(" ")
+    if not words_match(words[:-1], "You are now nicked as"):
+        return None
+
+    new_nickname = words[-1].strip(PUNCTUATION_AND_WHITESPACE)
+
+    logger.debug(f"Parsing passed. New nickname: {new_nickname}")
+    return NewNicknameEvent(new_nickname)
+
+
+def parse_lobby_swap(message: str) -> ChatEvent | None:
+    logger.debug("Parsing passed. Swapping lobby")
+    return LobbySwapEvent()
+
+
+def parse_game_starting_soon(message: str) -> ChatEvent | None:
+    logger.debug("Processing potential game starting soon")
+    words = message.split(" ")
     if (
-        message.strip(PUNCTUATION_AND_WHITESPACE)
-        == "You were sent to a lobby because someone in your party left"
+        len(words) != 6
+        or words[-1].strip(PUNCTUATION_AND_WHITESPACE) not in {"second", "seconds"}
+        or not words[-2].isnumeric()
     ):
-        logger.debug("Parsing passed. Swapping lobby")
-        return LobbySwapEvent()
-
-    if message.startswith("The game starts in "):
-        logger.debug("Processing potential game starting soon")
-        words = message.split(" ")
-        if (
-            len(words) != 6
-            or words[-1].strip(PUNCTUATION_AND_WHITESPACE) not in {"second", "seconds"}
-            or not words[-2].isnumeric()
-        ):
-            logger.debug("Last two words invalid")
-            return None
+        logger.debug("Last two words invalid")
+        return None
+
+    seconds = int(words[-2])
 
-        seconds = int(words[-2])
+    logger.debug(f"Parsing passed. Game starting in {seconds} second(s)")
+    return BedwarsGameStartingSoonEvent(seconds=seconds)
 
-        logger.debug(f"Parsing passed. Game starting in {seconds} second(s)")
-        return BedwarsGameStartingSoonEvent(seconds=seconds)
 
+def parse_start_bedwars_game(message: str) -> ChatEvent | None:
     # NOTE: This also appears at the end of a game, but before endgameevent is sent
-    if message.strip().startswith("Bed Wars"):
-        is_bedwars_duel = message.strip().startswith("Bed Wars Duels")
+    is_bedwars_duel = message.strip().startswith("Bed Wars Duels")
 
-        logger.debug(f"Parsing passed. Starting game {is_bedwars_duel=}")
-        return StartBedwarsGameEvent(is_bedwars_duel=is_bedwars_duel)
+    logger.debug(f"Parsing passed. Starting game {is_bedwars_duel=}")
+    return StartBedwarsGameEvent(is_bedwars_duel=is_bedwars_duel)
 
-    if (
-        message.strip(PUNCTUATION_AND_WHITESPACE).endswith("FINAL KILL")
-        and message.count(" ") > 2
-    ):
-        # NOTE: This message starts with the dead player's name, so it's hard to
-        #       validate. We make a best effort to filter out false positives.
-        logger.debug("Processing potential final kill")
 
-        words = message.split(" ")
-        if len(words) >= 4 and words[1] == ">":
-            # [CHAT] Party > Player 1: inc please void FINAL KILL!
-            return None
+def parse_final_kill(message: str) -> ChatEvent | None:
+    # NOTE: This message starts with the dead player's name, so it's hard to
+    #       validate. We make a best effort to filter out false positives.
+    logger.debug("Processing potential final kill")
 
-        dead_player = words[0]
+    words = message.split(" ")
+    if len(words) >= 4 and words[1] == ">":
+        # [CHAT] Party > Player 1: inc please void FINAL KILL!
+        return None
 
-        if not valid_username(dead_player):
-            logger.debug(f"{dead_player=} invalid.")
-            return None
+    dead_player = words[0]
 
-        logger.debug("Parsing passed. Final kill")
-        return BedwarsFinalKillEvent(dead_player=dead_player, raw_message=message)
+    if not valid_username(dead_player):
+        logger.debug(f"{dead_player=} invalid.")
+        return None
 
-    if (
-        message.strip(PUNCTUATION_AND_WHITESPACE).endswith("disconnected")
-        and message.count(" ") == 1
-    ):
-        # [CHAT] Player1 disconnected.
-        logger.debug("Processing potential disconnect")
+    logger.debug("Parsing passed. Final kill")
+    return BedwarsFinalKillEvent(dead_player=dead_player, raw_message=message)
 
-        username = message.split(" ")[0]
 
-        if not valid_username(username):
-            logger.debug(f"{username=} invalid.")
-            return None
+def parse_disconnect(message: str) -> ChatEvent | None:
+    # [CHAT] Player1 disconnected.
+    logger.debug("Processing potential disconnect")
 
-        logger.debug(f"Parsing passed. {username} disconnected")
-        return BedwarsDisconnectEvent(username=username)
+    username = message.split(" ")[0]
 
-    if (
-        message.strip(PUNCTUATION_AND_WHITESPACE).endswith("reconnected")
-        and message.count(" ") == 1
-    ):
-        # [CHAT] Player1 reconnected.
-        logger.debug("Processing potential disconnect")
+    if not valid_username(username):
+        logger.debug(f"{username=} invalid.")
+        return None
 
-        username = message.split(" ")[0]
+    logger.debug(f"Parsing passed. {username} disconnected")
+    return BedwarsDisconnectEvent(username=username)
 
-        if not valid_username(username):
-            logger.debug(f"{username=} invalid.")
-            return None
 
-        logger.debug(f"Parsing passed. {username} reconnected")
-        return BedwarsReconnectEvent(username=username)
+def parse_reconnect(message: str) -> ChatEvent | None:
+    # [CHAT] Player1 reconnected.
+    logger.debug("Processing potential disconnect")
 
-    if message.strip().startswith("1st Killer"):
-        # Info [CHAT]                     1st Killer - [MVP+] Player1 - 7
-        logger.debug("Parsing passed. Ending game")
-        return EndBedwarsGameEvent()
+    username = message.split(" ")[0]
 
-    if " has joined (" in message:
-        # Info [CHAT] <username> has joined (<x>/<N>)!
-        # Someone joined the lobby -> Add them to the lobby
-        logger.debug("Processing potential lobby join message")
+    if not valid_username(username):
+        logger.debug(f"{username=} invalid.")
+        return None
 
-        words = message.split(" ")
-        if len(words) < 4:  # pragma: no cover
-            # The message can not be <username> has joined (<x>/<N>)!
-            logger.debug("Message is too short!")
-            return None
+    logger.debug(f"Parsing passed. {username} reconnected")
+    return BedwarsReconnectEvent(username=username)
 
-        if not words_match(words[1:3], "has joined"):
-            return None
 
-        username = words[0]
+def parse_end_bedwars_game(message: str) -> ChatEvent | None:
+    # Info [CHAT]                     1st Killer - [MVP+] Player1 - 7
+    logger.debug("Parsing passed. Ending game")
+    return EndBedwarsGameEvent()
 
-        lobby_fill_string = words[3]
-        if not re.fullmatch(r"\(\d+\/\d+\)\!", lobby_fill_string):
-            logger.debug(f"Fill string '{lobby_fill_string}' does not match '(x/N)!'")
-            return None
 
-        # Message is a join message
-        prefix, suffix = lobby_fill_string.split("/")
-        try:
-            player_count = int(prefix.strip("(" + PUNCTUATION_AND_WHITESPACE))
-            player_cap = int(suffix.strip(")" + PUNCTUATION_AND_WHITESPACE))
-        except ValueError:  # pragma: no coverage
-            logger.exception(
-                f"Failed parsing player count/-cap from {lobby_fill_string}"
-            )
-            return None
+LOBBY_FILL_REGEX = re.compile(r"\(\d+\/\d+\)\!")
 
-        logger.debug(f"Parsing passed. {username} joined ({player_count}/{player_cap})")
-        return LobbyJoinEvent(
-            username=username, player_count=player_count, player_cap=player_cap
-        )
 
-    if " has quit" in message:
-        # Info [CHAT] <username> has quit!
-        # Someone left the lobby -> Remove them from the lobby
-        logger.debug("Processing potential lobby leave message")
+def parse_lobby_join(message: str) -> ChatEvent | None:
+    # Info [CHAT] <username> has joined (<x>/<N>)!
+    # Someone joined the lobby -> Add them to the lobby
+    logger.debug("Processing potential lobby join message")
 
-        words = message.split(" ")
-        if len(words) < 3:  # pragma: no cover
-            # The message can not be <username> has quit!
-            logger.debug("Message is too short!")
-            return None
+    words = message.split(" ")
+    if len(words) < 4:  # pragma: no cover
+        # The message can not be <username> has joined (<x>/<N>)!
+        logger.debug("Message is too short!")
+        return None
 
-        if not words_match(words[1:3], "has quit!"):
-            return None
+    if not words_match(words[1:3], "has joined"):
+        return None
 
-        username = words[0]
+    username = words[0]
 
-        logger.debug(f"Parsing passed. {username} quit")
-        return LobbyLeaveEvent(username)
+    lobby_fill_string = words[3]
+    if not LOBBY_FILL_REGEX.fullmatch(lobby_fill_string):
+        logger.debug(f"Fill string '{lobby_fill_string}' does not match '(x/N)!'")
+        return None
 
-    # Party changes
-    if message.startswith("You left the party"):
-        # Info [CHAT] You left the party.
-        logger.debug("Parsing passed. You left the party")
-        return PartyDetachEvent()
+    # Message is a join message
+    prefix, suffix = lobby_fill_string.split("/")
+    try:
+        player_count = int(prefix.strip("(" + PUNCTUATION_AND_WHITESPACE))
+        player_cap = int(suffix.strip(")" + PUNCTUATION_AND_WHITESPACE))
+    except ValueError:  # pragma: no coverage
+        logger.exception(f"Failed parsing player count/-cap from {lobby_fill_string}")
+        return None
 
-    if message.startswith("You are not currently in a party"):
-        # Info [CHAT] You are not currently in a party.
-        logger.debug("Parsing passed. You are not in a party")
-        return PartyDetachEvent()
+    logger.debug(f"Parsing passed. {username} joined ({player_count}/{player_cap})")
+    return LobbyJoinEvent(
+        username=username, player_count=player_count, player_cap=player_cap
+    )
 
-    if (
-        message.strip(PUNCTUATION_AND_WHITESPACE)
-        == "The party was disbanded because all invites expired and the party was empty"
-    ):
-        # Info [CHAT] The party was disbanded because all invites expired
-        # and the party was empty
-        logger.debug("Parsing passed. Party disbanded")
-        return PartyDetachEvent()
-
-    if " has disbanded the party" in message:
-        # Info [CHAT] [MVP++] Player1 has disbanded the party!
-        logger.debug("Processing potential party disband message")
-        clean = remove_ranks(message)
-        words = clean.split(" ")
-
-        if len(words) < 5:  # pragma: no cover
-            # The message can not be <username> has disbanded the party!
-            logger.debug("Message is too short!")
-            return None
 
-        if not words_match(words[1:], "has disbanded the party!"):
-            return None
+def parse_lobby_leave(message: str) -> ChatEvent | None:
+    # Info [CHAT] <username> has quit!
+    # Someone left the lobby -> Remove them from the lobby
+    logger.debug("Processing potential lobby leave message")
 
-        logger.debug(f"Parsing passed. {words[0]} disbanded the party")
-        return PartyDetachEvent()
+    words = message.split(" ")
+    if len(words) < 3:  # pragma: no cover
+        # The message can not be <username> has quit!
+        logger.debug("Message is too short!")
+        return None
 
-    if message.startswith("You have been kicked from the party by "):
-        # Info [CHAT] You have been kicked from the party by [MVP+] <username>
-        logger.debug("Parsing passed. You were kicked")
-        return PartyDetachEvent()
+    if not words_match(words[1:3], "has quit!"):
+        return None
 
-    PARTY_YOU_JOIN_PREFIX = "You have joined "
-    if message.startswith(PARTY_YOU_JOIN_PREFIX):
-        # Info [CHAT] You have joined [MVP++] <username>'s party!
-        logger.debug("Processing potential party you join message")
+    username = words[0]
 
-        suffix = message.removeprefix(PARTY_YOU_JOIN_PREFIX)
+    logger.debug(f"Parsing passed. {username} quit")
+    return LobbyLeaveEvent(username)
 
-        try:
-            apostrophe_index = suffix.index("'")
-        except ValueError:
-            logging.debug(f"Could not find apostrophe in string '{message}'")
-            return None
 
-        ranked_player_string = suffix[:apostrophe_index]
-        username = remove_ranks(ranked_player_string)
+# Party changes
+def parse_you_left_party(message: str) -> ChatEvent | None:
+    # Info [CHAT] You left the party.
+    logger.debug("Parsing passed. You left the party")
+    return PartyDetachEvent()
 
-        logger.debug(f"Parsing passed. You joined {username}'s party")
-        return PartyAttachEvent(username)
 
-    PARTYING_WITH_PREFIX = "You'll be partying with: "
-    if message.startswith(PARTYING_WITH_PREFIX):
-        # Info [CHAT] You'll be partying with: Player2, [MVP++] Player3, [MVP+] Player4
-        logger.debug("Processing potential partying with message")
-        suffix = message.removeprefix(PARTYING_WITH_PREFIX)
+def parse_not_in_party(message: str) -> ChatEvent | None:
+    # Info [CHAT] You are not currently in a party.
+    logger.debug("Parsing passed. You are not in a party")
+    return PartyDetachEvent()
 
-        names = remove_ranks(suffix)
 
-        logger.debug(f"Parsing passed. Partying with {names}")
-        return PartyJoinEvent(names.split(", "))
+PARTY_EXPIRED_MESSAGE = (
+    "The party was disbanded because all invites expired and the party was empty"
+)
 
-    if " joined the party" in message:
-        # Info [CHAT] [VIP+] <username> joined the party.
-        logger.debug("Processing potential party they join message")
 
-        suffix = remove_ranks(message)
+def parse_party_expired(message: str) -> ChatEvent | None:
+    # Info [CHAT] The party was disbanded because all invites expired
+    # and the party was empty
+    logger.debug("Parsing passed. Party disbanded")
+    return PartyDetachEvent()
 
-        words = suffix.split(" ")
-        if len(words) < 4:  # pragma: no cover
-            # The message can not be <username> joined the party
-            logger.debug("Message is too short!")
-            return None
 
-        if not words_match(words[1:4], "joined the party."):
-            return None
+def parse_party_disband(message: str) -> ChatEvent | None:
+    # Info [CHAT] [MVP++] Player1 has disbanded the party!
+    logger.debug("Processing potential party disband message")
+    clean = remove_ranks(message)
+    words = clean.split(" ")
 
-        username = words[0]
+    if len(words) < 5:  # pragma: no cover
+        # The message can not be <username> has disbanded the party!
+        logger.debug("Message is too short!")
+        return None
 
-        logger.debug(f"Parsing passed. {username} joined the party")
-        return PartyJoinEvent([username])
+    if not words_match(words[1:], "has disbanded the party!"):
+        return None
 
-    if " has left the party" in message:
-        # Info [CHAT] [VIP+] <username> has left the party.
-        logger.debug("Processing potential party they leave message")
+    logger.debug(f"Parsing passed. {words[0]} disbanded the party")
+    return PartyDetachEvent()
 
-        suffix = remove_ranks(message)
 
-        words = suffix.split(" ")
-        if len(words) < 5:  # pragma: no cover
-            # The message can not be <username> has left the party.
-            logger.debug("Message is too short!")
-            return None
+def parse_you_kicked_from_party(message: str) -> ChatEvent | None:
+    # Info [CHAT] You have been kicked from the party by [MVP+] <username>
+    logger.debug("Parsing passed. You were kicked")
+    return PartyDetachEvent()
 
-        if not words_match(words[1:5], "has left the party."):
-            return None
 
-        username = words[0]
+PARTY_YOU_JOIN_PREFIX = "You have joined "
 
-        logger.debug(f"Parsing passed. {username} left the party")
-        return PartyLeaveEvent([username])
 
-    if " has been removed from the party" in message:
-        # Info [CHAT] [VIP+] <username> has been removed from the party.
-        logger.debug("Processing potential party they kicked message")
+def parse_party_you_join(message: str) -> ChatEvent | None:
+    # Info [CHAT] You have joined [MVP++] <username>'s party!
+    logger.debug("Processing potential party you join message")
 
-        suffix = remove_ranks(message)
+    suffix = message.removeprefix(PARTY_YOU_JOIN_PREFIX)
 
-        words = suffix.split(" ")
-        if len(words) < 7:  # pragma: no cover
-            # The message can not be <username> has been removed from the party.
-            logger.debug("Message is too short!")
-            return None
+    try:
+        apostrophe_index = suffix.index("'")
+    except ValueError:
+        logging.debug(f"Could not find apostrophe in string '{message}'")
+        return None
 
-        if not words_match(words[1:], "has been removed from the party."):
-            return None
+    ranked_player_string = suffix[:apostrophe_index]
+    username = remove_ranks(ranked_player_string)
 
-        username = words[0]
+    logger.debug(f"Parsing passed. You joined {username}'s party")
+    return PartyAttachEvent(username)
 
-        logger.debug(f"Parsing passed. {username} was kicked")
-        return PartyLeaveEvent([username])
 
-    if (
-        " was removed from the party because they disconnected" in message
-        or " was removed from your party because they disconnected" in message
-    ):
-        # [MVP+] Player1 was removed from the party because they disconnected"
-        logger.debug("Processing potential party they disconnected message")
-        cleaned = remove_ranks(message)
-        words = cleaned.split(" ")
-        if len(words) < 9:  # pragma: no cover
-            logger.debug("Message is too short!")
-            return None
+PARTYING_WITH_PREFIX = "You'll be partying with: "
 
-        if not words_match(
-            words[1:], "was removed from the party because they disconnected"
-        ) and not words_match(
-            words[1:], "was removed from your party because they disconnected."
-        ):
-            return None
 
-        username = words[0]
+def parse_partying_with(message: str) -> ChatEvent | None:
+    # Info [CHAT] You'll be partying with: Player2, [MVP++] Player3, [MVP+] Player4
+    logger.debug("Processing potential partying with message")
+    suffix = message.removeprefix(PARTYING_WITH_PREFIX)
 
-        logger.debug(f"Parsing passed. {username} was kicked for disconnecting")
-        return PartyLeaveEvent([username])
+    names = remove_ranks(suffix)
 
-    PARTY_KICK_OFFLINE_PREFIX = "Kicked "
-    if (
-        message.startswith(PARTY_KICK_OFFLINE_PREFIX)
-        and " because they were offline" in message
+    logger.debug(f"Parsing passed. Partying with {names}")
+    return PartyJoinEvent(names.split(", "))
+
+
+def parse_party_they_join(message: str) -> ChatEvent | None:
+    # Info [CHAT] [VIP+] <username> joined the party.
+    logger.debug("Processing potential party they join message")
+
+    suffix = remove_ranks(message)
+
+    words = suffix.split(" ")
+    if len(words) < 4:  # pragma: no cover
+        # The message can not be <username> joined the party
+        logger.debug("Message is too short!")
+        return None
+
+    if not words_match(words[1:4], "joined the party."):
+        return None
+
+    username = words[0]
+
+    logger.debug(f"Parsing passed. {username} joined the party")
+    return PartyJoinEvent([username])
+
+
+def parse_party_they_leave(message: str) -> ChatEvent | None:
+    # Info [CHAT] [VIP+] <username> has left the party.
+    logger.debug("Processing potential party they leave message")
+
+    suffix = remove_ranks(message)
+
+    words = suffix.split(" ")
+    if len(words) < 5:  # pragma: no cover
+        # The message can not be <username> has left the party.
+        logger.debug("Message is too short!")
+        return None
+
+    if not words_match(words[1:5], "has left the party."):
+        return None
+
+    username = words[0]
+
+    logger.debug(f"Parsing passed. {username} left the party")
+    return PartyLeaveEvent([username])
+
+
+def parse_party_they_kicked(message: str) -> ChatEvent | None:
+    # Info [CHAT] [VIP+] <username> has been removed from the party.
+    logger.debug("Processing potential party they kicked message")
+
+    suffix = remove_ranks(message)
+
+    words = suffix.split(" ")
+    if len(words) < 7:  # pragma: no cover
+        # The message can not be <username> has been removed from the party.
+        logger.debug("Message is too short!")
+        return None
+
+    if not words_match(words[1:], "has been removed from the party."):
+        return None
+
+    username = words[0]
+
+    logger.debug(f"Parsing passed. {username} was kicked")
+    return PartyLeaveEvent([username])
+
+
+def parse_party_they_disconnected(message: str) -> ChatEvent | None:
+    # [MVP+] Player1 was removed from the party because they disconnected"
+    logger.debug("Processing potential party they disconnected message")
+    cleaned = remove_ranks(message)
+    words = cleaned.split(" ")
+    if len(words) < 9:  # pragma: no cover
+        logger.debug("Message is too short!")
+        return None
+
+    if not words_match(
+        words[1:], "was removed from the party because they disconnected"
+    ) and not words_match(
+        words[1:], "was removed from your party because they disconnected."
     ):
-        logger.debug("Processing potential party kickoffline message")
-        # Info [CHAT] Kicked [VIP] <username1>, <username2> because they were offline.
-        suffix = message.removeprefix(PARTY_KICK_OFFLINE_PREFIX)
-        cleaned = remove_ranks(suffix)
-        words = cleaned.split(" ")
-        if len(words) < 5:  # pragma: no cover
-            logger.debug("Message is too short!")
-            return None
+        return None
 
-        if not words_match(words[-4:], "because they were offline."):
-            return None
+    username = words[0]
 
-        usernames = " ".join(words[:-4]).split(", ")
+    logger.debug(f"Parsing passed. {username} was kicked for disconnecting")
+    return PartyLeaveEvent([username])
 
-        logger.debug(f"Parsing passed. {', '.join(usernames)} were kickoffline'd")
-        return PartyLeaveEvent(usernames)
 
-    TRANSFER_PREFIX = "The party was transferred to "
-    if message.startswith(TRANSFER_PREFIX):
-        # Info [CHAT] ... transferred to [VIP] <someone> because [MVP++] <username> left
-        logger.debug("Processing potential party transfer leave message")
-        suffix = message.removeprefix(TRANSFER_PREFIX)
-        without_ranks = remove_ranks(suffix)
+PARTY_KICK_OFFLINE_PREFIX = "Kicked "
 
-        # should be <someone> because <username> left
-        words = without_ranks.split(" ")
-        if len(words) < 4:
-            logger.debug("Message is too short!")
-            return None
 
-        if not words_match(words[1::2], "because left"):
-            return None
+def parse_party_kick_offline(message: str) -> ChatEvent | None:
+    logger.debug("Processing potential party kickoffline message")
+    # Info [CHAT] Kicked [VIP] <username1>, <username2> because they were offline.
+    suffix = message.removeprefix(PARTY_KICK_OFFLINE_PREFIX)
+    cleaned = remove_ranks(suffix)
+    words = cleaned.split(" ")
+    if len(words) < 5:  # pragma: no cover
+        logger.debug("Message is too short!")
+        return None
+
+    if not words_match(words[-4:], "because they were offline."):
+        return None
 
-        username = words[2]
+    usernames = " ".join(words[:-4]).split(", ")
 
-        logger.debug(f"Parsing passed. {username} left")
-        return PartyLeaveEvent([username])
-    """
-    # noqa: W291
-    Info [CHAT] -----------------------------
-    Info [CHAT] Party Members (3)
-    Info [CHAT] 
-    Info [CHAT] Party Leader: [MVP++] <username> ●
-    Info [CHAT] 
-    Info [CHAT] Party Moderators: <username> ● 
-    Info [CHAT] Party Members: <username> ● [VIP+] <username> ● 
-    Info [CHAT] -----------------------------
-    """
+    logger.debug(f"Parsing passed. {', '.join(usernames)} were kickoffline'd")
+    return PartyLeaveEvent(usernames)
+
+
+TRANSFER_PREFIX = "The party was transferred to "
+
+
+def parse_party_transfer(message: str) -> ChatEvent | None:
+    # Info [CHAT] ... transferred to [VIP] <someone> because [MVP++] <username> left
+    logger.debug("Processing potential party transfer leave message")
+    suffix = message.removeprefix(TRANSFER_PREFIX)
+    without_ranks = remove_ranks(suffix)
+
+    # should be <someone> because <username> left
+    words = without_ranks.split(" ")
+    if len(words) < 4:
+        logger.debug("Message is too short!")
+        return None
+
+    if not words_match(words[1::2], "because left"):
+        return None
+
+    username = words[2]
+
+    logger.debug(f"Parsing passed. {username} left")
+    return PartyLeaveEvent([username])
 
-    if message.startswith("Party Members ("):
-        # Info [CHAT] Party Members (<n>)
-        # This is a response from /pl (/party list)
 
-        logger.debug("Parsing passed. Party list response incoming")
-        return PartyListIncomingEvent()
+# Info [CHAT] -----------------------------
+# Info [CHAT] Party Members (3)
+# Info [CHAT]
+# Info [CHAT] Party Leader: [MVP++] <username> ●
+# Info [CHAT]
+# Info [CHAT] Party Moderators: <username> ●
+# Info [CHAT] Party Members: <username> ● [VIP+] <username> ●
+# Info [CHAT] -----------------------------
 
-    roles: Final = ("leader", "moderators", "members")
 
-    for role in roles:
+def parse_party_list_incoming(message: str) -> ChatEvent | None:
+    # Info [CHAT] Party Members (<n>)
+    # This is a response from /pl (/party list)
+
+    logger.debug("Parsing passed. Party list response incoming")
+    return PartyListIncomingEvent()
+
+
+PARTY_ROLES: Final = ("leader", "moderators", "members")
+PARTY_ROLE_PREFIXES: Final = tuple(f"party {role}: ".title() for role in PARTY_ROLES)
+
+
+def parse_party_membership_list(message: str) -> ChatEvent | None:
+    for role in PARTY_ROLES:
         # Info [CHAT] Party <Role>: [MVP++] <username> ●
         prefix = f"party {role}: ".title()
         if message.startswith(prefix):
@@ -668,56 +793,147 @@ def parse_chat_message(message: str) -> ChatEvent | None:
 
             return PartyMembershipListEvent(usernames=players, role=role)
 
-    WHISPER_COMMAND_PREFIX = "Can't find a player by the name of '!"
-    if message.startswith(WHISPER_COMMAND_PREFIX):
-        logger.debug("Processing potential whisper command")
-        command = message.removeprefix(WHISPER_COMMAND_PREFIX)
-        if not command:
-            logger.debug("Whisper command too short")
-            return None
+    return None  # pragma: no cover  # Only called when one of the prefixes match
 
-        if command[-1] != "'":
-            logger.debug("Whisper command missing closing '")
-            return None
 
-        command = command[:-1]
+WHISPER_COMMAND_PREFIX = "Can't find a player by the name of '!"
 
-        if "=" in command:
-            arguments = command.split("=")
-            if len(arguments) != 2:
-                logger.debug("Whisper setnick command got too many arguments")
-                return None
-
-            nick, username = arguments
-
-            logger.debug(f"Parsing passed. Setting nick {nick=}->{username=}")
-            return WhisperCommandSetNickEvent(
-                nick=nick, username=username if username else None
-            )
 
+def parse_whisper_command(message: str) -> ChatEvent | None:
+    logger.debug("Processing potential whisper command")
+    command = message.removeprefix(WHISPER_COMMAND_PREFIX)
+    if not command:
+        logger.debug("Whisper command too short")
         return None
 
-    if ":" in message:
-        # Info [CHAT] §7Player1§7: gl to all
-        # NOTE: Colors have already been stripped at this point
-        logger.debug("Processing potential chat message")
-        colon_index = message.index(":")
-        username = remove_ranks(message[:colon_index])
+    if command[-1] != "'":
+        logger.debug("Whisper command missing closing '")
+        return None
 
-        if not valid_username(username):
-            logger.debug(f"Invalid username {username}")
-            return None
+    command = command[:-1]
 
-        if len(message) <= colon_index + 1 or message[colon_index + 1] != " ":
-            logger.debug("No space after colon")
+    if "=" in command:
+        arguments = command.split("=")
+        if len(arguments) != 2:
+            logger.debug("Whisper setnick command got too many arguments")
             return None
 
-        player_message = message[colon_index + 2 :]  # Skip the colon and space
+        nick, username = arguments
 
-        logger.debug(f"Parsing passed. '{username}' said '{player_message}'")
-        return ChatMessageEvent(
-            username=username,
-            message=player_message,
+        logger.debug(f"Parsing passed. Setting nick {nick=}->{username=}")
+        return WhisperCommandSetNickEvent(
+            nick=nick, username=username if username else None
         )
 
     return None
+
+
+def parse_player_chat_message(message: str) -> ChatEvent | None:
+    # Info [CHAT] §7Player1§7: gl to all
+    # NOTE: Colors have already been stripped at this point
+    logger.debug("Processing potential chat message")
+    colon_index = message.index(":")
+    username = remove_ranks(message[:colon_index])
+
+    if not valid_username(username):
+        logger.debug(f"Invalid username {username}")
+        return None
+
+    if len(message) <= colon_index + 1 or message[colon_index + 1] != " ":
+        logger.debug("No space after colon")
+        return None
+
+    player_message = message[colon_index + 2 :]  # Skip the colon and space
+
+    logger.debug(f"Parsing passed. '{username}' said '{player_message}'")
+    return ChatMessageEvent(
+        username=username,
+        message=player_message,
+    )
+
+
+# The chat grammar. The first rule matching the message is used to parse it
+CHAT_RULES: Final = (
+    starts_with_rule(parse_lobby_list, WHO_PREFIX),
+    starts_with_rule(parse_new_nickname, "You are now nicked as "),
+    starts_with_rule(parse_lobby_swap, "Sending you to "),
+    exact_rule(
+        parse_lobby_swap, "You were sent to a lobby because someone in your party left"
+    ),
+    starts_with_rule(parse_game_starting_soon, "The game starts in "),
+    ChatRule(
+        matches=lambda message: message.strip().startswith("Bed Wars"),
+        parse=parse_start_bedwars_game,
+        prefixes=("Bed Wars",),
+    ),
+    ChatRule(
+        matches=lambda message: (
+            message.strip(PUNCTUATION_AND_WHITESPACE).endswith("FINAL KILL")
+            and message.count(" ") > 2
+        ),
+        parse=parse_final_kill,
+        suffix="FINAL KILL",
+    ),
+    ChatRule(
+        matches=lambda message: (
+            message.strip(PUNCTUATION_AND_WHITESPACE).endswith("disconnected")
+            and message.count(" ") == 1
+        ),
+        parse=parse_disconnect,
+        suffix="disconnected",
+    ),
+    ChatRule(
+        matches=lambda message: (
+            message.strip(PUNCTUATION_AND_WHITESPACE).endswith("reconnected")
+            and message.count(" ") == 1
+        ),
+        parse=parse_reconnect,
+        suffix="reconnected",
+    ),
+    ChatRule(
+        matches=lambda message: message.strip().startswith("1st Killer"),
+        parse=parse_end_bedwars_game,
+        prefixes=("1st Killer",),
+    ),
+    contains_rule(parse_lobby_join, " has joined ("),
+    contains_rule(parse_lobby_leave, " has quit"),
+    starts_with_rule(parse_you_left_party, "You left the party"),
+    starts_with_rule(parse_not_in_party, "You are not currently in a party"),
+    exact_rule(parse_party_expired, PARTY_EXPIRED_MESSAGE),
+    contains_rule(parse_party_disband, " has disbanded the party"),
+    starts_with_rule(
+        parse_you_kicked_from_party, "You have been kicked from the party by "
+    ),
+    starts_with_rule(parse_party_you_join, PARTY_YOU_JOIN_PREFIX),
+    starts_with_rule(parse_partying_with, PARTYING_WITH_PREFIX),
+    contains_rule(parse_party_they_join, " joined the party"),
+    contains_rule(parse_party_they_leave, " has left the party"),
+    contains_rule(parse_party_they_kicked, " has been removed from the party"),
+    ChatRule(
+        matches=lambda message: (
+            " was removed from the party because they disconnected" in message
+            or " was removed from your party because they disconnected" in message
+        ),
+        parse=parse_party_they_disconnected,
+        # Common to both the messages above
+        contains=" party because they disconnected",
+    ),
+    ChatRule(
+        matches=lambda message: (
+            message.startswith(PARTY_KICK_OFFLINE_PREFIX)
+            and " because they were offline" in message
+        ),
+        parse=parse_party_kick_offline,
+        prefixes=(PARTY_KICK_OFFLINE_PREFIX,),
+    ),
+    starts_with_rule(parse_party_transfer, TRANSFER_PREFIX),
+    starts_with_rule(parse_party_list_incoming, "Party Members ("),
+    starts_with_rule(parse_party_membership_list, *PARTY_ROLE_PREFIXES),
+    starts_with_rule(parse_whisper_command, WHISPER_COMMAND_PREFIX),
+    ChatRule(
+        matches=lambda message: ":" in message,
+        parse=parse_player_chat_message,
+    ),
+)
+
+CHAT_RULE_INDEX: Final = ChatRuleIndex(CHAT_RULES)
@@ -0,0 +1,123 @@
+import ctypes
+import errno
+import logging
+import os
+import select
+import struct
+from pathlib import Path
+
+from prism.overlay.file_utils import FileEvent
+
+logger = logging.getLogger(__name__)
+
+# Constants from <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_CLOEXEC = 0o2000000
+
+FILE_MASK = IN_MODIFY | IN_MOVE_SELF | IN_DELETE_SELF
+DIRECTORY_MASK = IN_CREATE | IN_MOVED_TO
+
+# struct inotify_event { int wd; uint32_t mask; uint32_t cookie; uint32_t len; }
+EVENT_HEADER = struct.Struct("iIII")
+
+READ_SIZE = 64 * 1024
+
+_libc = ctypes.CDLL(None, use_errno=True)
+
+
+def _check_call(result: int) -> int:
+    """Raise an OSError if the libc call failed"""
+    if result < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    return result
+
+
+class InotifyFileEvents:
+    """Source of FileEvents for a single file using the Linux inotify API"""
+
+    def __init__(self) -> None:
+        self._fd = _check_call(_libc.inotify_init1(IN_CLOEXEC))
+        self._file_wd: int | None = None
+        self._directory_wd: int | None = None
+        self._name: bytes | None = None
+
+    def _add_watch(self, path: Path, mask: int) -> int:
+        return _check_call(
+            _libc.inotify_add_watch(self._fd, os.fsencode(path), ctypes.c_uint32(mask))
+        )
+
+    def _remove_watches(self) -> None:
+        for wd in (self._file_wd, self._directory_wd):
+            if wd is not None:
+                # Fails with EINVAL if the watch was already removed by the kernel
+                _libc.inotify_rm_watch(self._fd, wd)
+
+        self._file_wd = self._directory_wd = None
+
+    def watch(self, path: Path) -> None:
+        """Watch the file at `path` (if it exists) and its parent directory"""
+        self._remove_watches()
+
+        self._name = os.fsencode(path.name)
+        self._directory_wd = self._add_watch(path.parent, DIRECTORY_MASK)
+
+        try:
+            self._file_wd = self._add_watch(path, FILE_MASK)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            # The creation of the file will be reported by the directory watch
+            logger.debug(f"Could not watch missing file '{path}'")
+
+    def _translate(self, wd: int, mask: int, name: bytes) -> FileEvent | None:
+        """Translate an inotify event to a FileEvent for the watched file"""
+        if mask & IN_Q_OVERFLOW:
+            # Events were dropped - assume the worst
+            return FileEvent.REPLACED
+
+        if wd == self._file_wd:
+            if mask & (IN_MOVE_SELF | IN_DELETE_SELF | IN_IGNORED):
+                return FileEvent.REPLACED
+            if mask & IN_MODIFY:
+                return FileEvent.MODIFIED
+        elif wd == self._directory_wd:
+            if mask & IN_IGNORED:
+                # The directory itself is gone
+                return FileEvent.REPLACED
+            if mask & DIRECTORY_MASK and name == self._name:
+                return FileEvent.REPLACED
+
+        # Event for an old watch or another file in the directory
+        return None
+
+    def wait(self) -> frozenset[FileEvent]:
+        """Block until the watched file changes"""
+        while True:
+            select.select([self._fd], [], [])
+            data = os.read(self._fd, READ_SIZE)
+
+            events = set[FileEvent]()
+            offset = 0
+            while offset < len(data):
+                wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset : offset + length].rstrip(b"\0")
+                offset += length
+
+                event = self._translate(wd, mask, name)
+                if event is not None:
+                    events.add(event)
+
+            if events:
+                return frozenset(events)
+
+    def close(self) -> None:
+        """Close the inotify instance"""
+        os.close(self._fd)
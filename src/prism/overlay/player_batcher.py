@@ -0,0 +1,85 @@
+"""
+Batching of concurrent playerdata requests for providers with a batch endpoint
+
+NOTE: None of the player providers implement BatchPlayerProvider yet, so this is
+      not used. StrangePlayerProvider gets each player by uuid on its own.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Mapping, Sequence
+from concurrent.futures import Future
+from itertools import batched
+
+from prism.errors import PlayerNotFoundError
+from prism.player import KnownPlayer
+
+logger = logging.getLogger(__name__)
+
+# Time to wait for more requests before sending a batch
+BATCH_DELAY_SECONDS = 0.01
+
+MAX_BATCH_SIZE = 16
+
+
+class PlayerBatcher:
+    """
+    Collect concurrent requests for playerdata and get them in batch requests
+
+    The first request in a batch waits for `delay_seconds`, and then sends the
+    requests made in the meantime. Every request waits for its result.
+    """
+
+    def __init__(
+        self,
+        get_players: Callable[[Sequence[str]], Mapping[str, KnownPlayer]],
+        *,
+        delay_seconds: float = BATCH_DELAY_SECONDS,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._get_players = get_players
+        self._delay_seconds = delay_seconds
+        self._max_batch_size = max_batch_size
+        self._sleep = sleep
+
+        # Requests waiting to be sent in the next batch
+        self._pending: dict[str, Future[KnownPlayer | None]] = {}
+        self._lock = threading.Lock()
+
+    def get_player(self, uuid: str) -> KnownPlayer:
+        """Get the player with the next batch, like PlayerProvider.get_player"""
+        with self._lock:
+            # The first request of the batch sends it
+            send_batch = not self._pending
+
+            future = self._pending.get(uuid, None)
+            if future is None:
+                future = self._pending[uuid] = Future()
+
+        if send_batch:
+            self._sleep(self._delay_seconds)
+            self._send_pending()
+
+        player = future.result()
+        if player is None:
+            raise PlayerNotFoundError(f"Could not find a user with {uuid=}")
+
+        return player
+
+    def _send_pending(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for uuids in batched(pending, self._max_batch_size):
+            logger.debug(f"Getting playerdata for a batch of {len(uuids)}")
+            try:
+                players = self._get_players(uuids)
+            except Exception as e:
+                # Raise the error in every request in the batch
+                for uuid in uuids:
+                    pending[uuid].set_exception(e)
+            else:
+                for uuid in uuids:
+                    pending[uuid].set_result(players.get(uuid, None))
@@ -1,62 +1,404 @@
 import logging
 import threading
-from collections.abc import Callable
-from typing import Literal
-
-from cachetools import TTLCache
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, Literal, TypeGuard, TypeVar, cast
 
+from prism.overlay.metrics import CacheMetrics, CountingTLRUCache, ThreadCounters
 from prism.player import KnownPlayer, NickedPlayer, PendingPlayer, Player, UnknownPlayer
 
+if TYPE_CHECKING:  # pragma: no cover
+    from prism.overlay.player_store import PlayerStore
+
 logger = logging.getLogger(__name__)
 
+FetchResult = TypeVar("FetchResult")
+CachedValue = TypeVar("CachedValue")
+
+# Players that can't have played since their stats were received are cached for
+# longer, and players in an active session are refreshed sooner
+STABLE_TTL_FACTOR = 4.0
+ACTIVE_TTL_FACTOR = 0.5
+
+# Players with old stats are still cached for at least this long
+MIN_TTL_SECONDS = 60.0
+
+# Base ttl of the long term cache, before adjusting for the activity of the player
+LONG_TERM_TTL_SECONDS = 60 * 60
+
+
+def uuid_index_key(uuid: str) -> str:
+    """Normalize the uuid so dashed and undashed uuids are the same key"""
+    return uuid.replace("-", "")
+
+
+def activity_ttl_factor(player: KnownPlayer) -> float:
+    """
+    Get how much longer or shorter than the base ttl to cache the player for
+
+    Players that are offline, or hide their online status, keep their stats for
+    longer, while players in an active session are refreshed sooner.
+    """
+    if player.sessiontime_seconds is not None:
+        return ACTIVE_TTL_FACTOR
+
+    if (
+        player.lastLoginMs is not None
+        and player.lastLogoutMs is not None
+        and player.lastLogoutMs > player.lastLoginMs
+    ):
+        return STABLE_TTL_FACTOR
+
+    return 1.0
+
+
+def adaptive_ttl_seconds(player: Player, ttl_seconds: float, now_ms: int) -> float:
+    """
+    Get how long to cache the player for, given the base ttl of the cache
+
+    The base ttl is adjusted by the activity of the player, see activity_ttl_factor.
+    The time since the stats were received counts towards the ttl.
+    """
+    if not isinstance(player, KnownPlayer) or player.stale:
+        return ttl_seconds
+
+    ttl_seconds *= activity_ttl_factor(player)
+
+    age_seconds = max(now_ms - player.dataReceivedAtMs, 0) / 1000
+    return max(ttl_seconds - age_seconds, min(MIN_TTL_SECONDS, ttl_seconds))
+
+
+class SnapshotTTLCache(CountingTLRUCache[str, CachedValue]):
+    """
+    TTL cache that can also be read with `peek` without holding the lock
+
+    Entries are cached for `ttl` seconds, or for `get_ttl(value, ttl)` seconds
+    when given.
+    Every write is mirrored to a plain dict of the entries and their expiry time.
+    Getting an item from a dict is atomic, so reading it needs no lock, while the
+    cache itself must still only be accessed while holding the lock.
+    """
+
+    def __init__(
+        self,
+        maxsize: float,
+        ttl: float,
+        timer: Callable[[], float] = time.monotonic,
+        get_ttl: Callable[[CachedValue, float], float] | None = None,
+    ) -> None:
+        super().__init__(maxsize=maxsize, ttu=self._time_to_use, timer=timer)
+        self._ttl_seconds = ttl
+        self._get_ttl = get_ttl
+        self._get_time = timer
+        self._entries: dict[str, tuple[CachedValue, float]] = {}
+
+    def _entry_ttl_seconds(self, value: CachedValue) -> float:
+        if self._get_ttl is None:
+            return self._ttl_seconds
+        return self._get_ttl(value, self._ttl_seconds)
+
+    def _time_to_use(self, key: str, value: CachedValue, now: float) -> float:
+        return now + self._entry_ttl_seconds(value)
+
+    def peek(self, key: str) -> CachedValue | None:
+        """Get the entry without holding the lock"""
+        entry = self._entries.get(key, None)
+        if entry is None:
+            return None
+
+        value, expires = entry
+        return value if self._get_time() < expires else None
+
+    def __setitem__(self, key: str, value: CachedValue) -> None:
+        super().__setitem__(key, value)
+        self._entries[key] = (
+            value,
+            self._get_time() + self._entry_ttl_seconds(value),
+        )
+
+    def __delitem__(self, key: str) -> None:
+        try:
+            super().__delitem__(key)
+        finally:
+            self._entries.pop(key, None)
+
+    def expire(self, time: float | None = None) -> list[tuple[str, CachedValue]]:
+        expired = super().expire(time)
+        for key, _ in expired:
+            self._entries.pop(key, None)
+        return expired
+
+    def clear(self) -> None:
+        super().clear()
+        self._entries.clear()
+
+
+@dataclass(frozen=True, slots=True)
+class BulkLookup:
+    """The result of looking up several players at once"""
+
+    # The cached player of each username
+    players: dict[str, Player]
+    # Usernames that were set to pending, and need to be fetched
+    set_pending: tuple[str, ...]
+    # Usernames that were served stale stats, and need to be refreshed
+    stale: tuple[str, ...]
+
 
 class PlayerCache:
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        store: "PlayerStore | None" = None,
+        get_time_ns: Callable[[], int] = time.time_ns,
+    ) -> None:
         # Cache genus. Cached entries from old genera are discarded.
         self.current_genus = 0
 
+        # Used to compute the age of the stats of the cached players
+        self._get_time_ns = get_time_ns
+
         # Entries cached for 10mins, so they expire if they are not cleared by game end
-        self._cache: TTLCache[str, Player] = TTLCache(maxsize=512, ttl=10 * 60)
+        # The ttl of each player is adjusted by their activity, see adaptive_ttl_seconds
+        self._cache = SnapshotTTLCache[Player](
+            maxsize=512, ttl=10 * 60, get_ttl=self._get_player_ttl
+        )
 
         # Optional long term cache accessed with kwarg long_term=True
         # Can be used to prevent refetching during a game (while stats don't change)
-        self._long_term_cache: TTLCache[str, Player] = TTLCache(
-            maxsize=512, ttl=60 * 60
+        self._long_term_cache = SnapshotTTLCache[Player](
+            maxsize=512, ttl=LONG_TERM_TTL_SECONDS, get_ttl=self._get_player_ttl
         )
 
+        # Usernames found to be nicked, kept across games so we don't look them up
+        # again. Cleared along with the other caches when the username is uncached,
+        # e.g. when the nick is denicked.
+        self._nicked_cache = SnapshotTTLCache[NickedPlayer](maxsize=256, ttl=30 * 60)
+
+        # Optional persistent store for known players
+        # Read through to fill the long term cache, written to with every update
+        self._store = store
+
+        # Cache keys of the known players with each uuid, across both caches
+        # May contain stale keys, which are pruned when the uuid is looked up
+        self._uuid_index: dict[str, set[str]] = {}
+
+        # Fetches of the playerdata for a uuid currently in progress
+        self._fetches: dict[str, Future[object]] = {}
+
+        # Counters for the metrics, named after the fields of CacheMetrics
+        # Updated without a lock, as they are also updated by lock-free reads
+        self._counts = ThreadCounters()
+
         # TTLCache is not thread-safe so we use a mutex to synchronize threads
+        # Reads that hit the cache peek at the entries instead, so that the UI
+        # thread isn't blocked by the stats threads writing to the cache
         self._mutex = threading.Lock()
 
+    def _get_player_ttl(self, player: Player, ttl_seconds: float) -> float:
+        return adaptive_ttl_seconds(
+            player, ttl_seconds, now_ms=self._get_time_ns() // 1_000_000
+        )
+
+    def _count(self, name: str) -> None:
+        self._counts.increment(name)
+
+    def _count_hit(self, username: str, player: Player) -> None:
+        logger.debug(f"Cache hit {username}")
+        self._count("hits")
+        if isinstance(player, PendingPlayer):
+            self._count("pending_joins")
+
+    def _peek(self, cache_key: str, long_term: bool) -> Player | None:
+        """Get the cached player without holding the mutex"""
+        return (
+            self._long_term_cache.peek(cache_key)
+            if long_term
+            else self._cache.peek(cache_key)
+        )
+
+    def _index_player(self, cache_key: str, player: Player) -> None:
+        """Add the cache key to the uuid index. Caller must hold the mutex"""
+        if isinstance(player, KnownPlayer):
+            self._uuid_index.setdefault(uuid_index_key(player.uuid), set()).add(
+                cache_key
+            )
+
+    def _cache_keys_for_uuid(self, uuid: str) -> list[str]:
+        """
+        Return the keys of the short term entries with the uuid, sorted
+
+        Prunes the keys that no longer hold the uuid in either cache.
+        Caller must hold the mutex.
+        """
+        index_key = uuid_index_key(uuid)
+        cache_keys = self._uuid_index.get(index_key, None)
+        if cache_keys is None:
+            return []
+
+        def has_uuid(player: Player | None) -> TypeGuard[KnownPlayer]:
+            return isinstance(player, KnownPlayer) and (
+                uuid_index_key(player.uuid) == index_key
+            )
+
+        short_term_keys: list[str] = []
+        for cache_key in sorted(cache_keys):
+            short_term_player = self._cache.get(cache_key, None)
+            if has_uuid(short_term_player):
+                # Stale entries are being refetched, and must not be shared
+                if not short_term_player.stale:
+                    short_term_keys.append(cache_key)
+            elif not has_uuid(self._long_term_cache.get(cache_key, None)):
+                cache_keys.discard(cache_key)
+
+        if not cache_keys:
+            del self._uuid_index[index_key]
+
+        return short_term_keys
+
+    def _load_stored_player(self, cache_key: str) -> None:
+        """Load the player from the store into the long term cache if missing"""
+        if self._store is None or self._long_term_cache.peek(cache_key) is not None:
+            return
+
+        genus = self.current_genus
+
+        # Read without holding the mutex so other threads aren't blocked on disk
+        player = self._store.get_player(cache_key)
+        if player is None:
+            return
+
+        with self._mutex:
+            if genus == self.current_genus and cache_key not in self._long_term_cache:
+                logger.debug(f"Loaded stored player {cache_key}")
+                self._long_term_cache[cache_key] = player
+                self._index_player(cache_key, player)
+
     def get_cached_player_or_set_pending(
-        self, username: str, *, long_term: bool = False
-    ) -> tuple[Player, Literal[False]] | tuple[PendingPlayer, Literal[True]]:
+        self, username: str, *, long_term: bool = False, allow_stale: bool = False
+    ) -> (
+        tuple[Player, Literal[False]]
+        | tuple[PendingPlayer, Literal[True]]
+        | tuple[KnownPlayer, Literal[True]]
+    ):
         """
         Get the cached player, or set them to pending if not cached
 
-        Returns a tuple of (player, was_set_pending)
+        If `allow_stale` is True, a short term miss is served by the long term cache
+        when it holds the player. The player is then marked as stale until the
+        refetch completes.
+
+        Returns a tuple of (player, needs_fetch)
         """
         cache_key = username.lower()
 
+        cached_player = self._peek(cache_key, long_term)
+        if cached_player is not None:
+            self._count_hit(username, cached_player)
+            return cached_player, False
+
+        if long_term or allow_stale:
+            self._load_stored_player(cache_key)
+
         with self._mutex:
-            cached_player = (
-                self._cache.get(cache_key, None)
-                if not long_term
-                else self._long_term_cache.get(cache_key, None)
+            return self._get_or_set_pending(
+                username, long_term=long_term, allow_stale=allow_stale
             )
-            if cached_player is not None:
-                logger.debug(f"Cache hit {username}")
-                return cached_player, False
 
-            logger.debug(f"Cache miss {username} -> setting to pending")
+    def _get_or_set_pending(
+        self, username: str, *, long_term: bool, allow_stale: bool
+    ) -> (
+        tuple[Player, Literal[False]]
+        | tuple[PendingPlayer, Literal[True]]
+        | tuple[KnownPlayer, Literal[True]]
+    ):
+        """Get the cached player, or set them to pending. Caller must hold the mutex"""
+        cache_key = username.lower()
+
+        cached_player = (
+            self._cache.get(cache_key, None)
+            if not long_term
+            else self._long_term_cache.get(cache_key, None)
+        )
+        if cached_player is not None:
+            self._count_hit(username, cached_player)
+            return cached_player, False
+
+        if allow_stale:
+            long_term_player = self._long_term_cache.get(cache_key, None)
+            if isinstance(long_term_player, KnownPlayer):
+                logger.debug(f"Stale cache hit {username} -> revalidating")
+                self._count("stale_hits")
+                stale_player = replace(long_term_player, stale=True)
+                # Only the short term cache is marked, so the long term cache
+                # and the store keep the player as it was received
+                self._cache[cache_key] = stale_player
+                return stale_player, True
+
+        logger.debug(f"Cache miss {username} -> setting to pending")
+        self._count("misses")
+
+        pending_player = PendingPlayer(username)
+
+        if cache_key in self._cache:  # pragma: no coverage  # unreachable
+            logger.error(f"Player {username} set to pending, but already exists")
+
+        self._cache[cache_key] = self._long_term_cache[cache_key] = pending_player
+
+        return pending_player, True
+
+    def get_cached_players_or_set_pending(
+        self,
+        usernames: Iterable[str],
+        *,
+        long_term: bool = False,
+        allow_stale: bool = False,
+    ) -> BulkLookup:
+        """
+        Get the cached players, setting the ones not cached to pending
+
+        Cache hits are read without the mutex. The misses are then looked up while
+        holding the mutex once, so they are set to pending in a consistent view
+        of the cache.
+        See get_cached_player_or_set_pending.
+        """
+        usernames = tuple(usernames)
+
+        hits: dict[str, Player] = {}
+        misses: list[str] = []
+        for username in usernames:
+            cached_player = self._peek(username.lower(), long_term)
+            if cached_player is not None:
+                self._count_hit(username, cached_player)
+                hits[username] = cached_player
+            else:
+                misses.append(username)
 
-            pending_player = PendingPlayer(username)
+        set_pending: list[str] = []
+        stale: list[str] = []
 
-            if cache_key in self._cache:  # pragma: no coverage  # unreachable
-                logger.error(f"Player {username} set to pending, but already exists")
+        if misses:
+            if long_term or allow_stale:
+                for username in misses:
+                    self._load_stored_player(username.lower())
 
-            self._cache[cache_key] = self._long_term_cache[cache_key] = pending_player
+            with self._mutex:
+                for username in misses:
+                    player, needs_fetch = self._get_or_set_pending(
+                        username, long_term=long_term, allow_stale=allow_stale
+                    )
+                    hits[username] = player
+                    if needs_fetch:
+                        (
+                            stale if isinstance(player, KnownPlayer) else set_pending
+                        ).append(username)
 
-            return pending_player, True
+        return BulkLookup(
+            players={username: hits[username] for username in usernames},
+            set_pending=tuple(set_pending),
+            stale=tuple(stale),
+        )
 
     def set_cached_player(
         self,
@@ -72,21 +414,66 @@ class PlayerCache:
                     f"Tried to store stats for {username} with old genus. Ignoring. "
                     f"{genus=}!={self.current_genus=}, {player=}"
                 )
+                self._count("genus_rejected_writes")
                 return
 
             self._cache[cache_key] = self._long_term_cache[cache_key] = player
+            self._index_player(cache_key, player)
+
+            if isinstance(player, NickedPlayer):
+                # Writing back a player from the nicked cache must not extend its ttl
+                if cache_key not in self._nicked_cache:
+                    self._nicked_cache[cache_key] = player
+            else:
+                self._nicked_cache.pop(cache_key, None)
+
+        if self._store is not None and isinstance(player, KnownPlayer):
+            self._store.store_player(cache_key, player)
 
     def get_cached_player(
         self, username: str, *, long_term: bool = False
     ) -> Player | None:
         cache_key = username.lower()
 
+        if long_term:
+            self._load_stored_player(cache_key)
+
+        return self._peek(cache_key, long_term)
+
+    def get_cached_players(
+        self, usernames: Iterable[str], *, long_term: bool = False
+    ) -> dict[str, Player]:
+        """
+        Get the cached players, while holding the mutex once
+
+        Players that are not cached are not included.
+        """
+        usernames = tuple(usernames)
+
+        if long_term:
+            for username in usernames:
+                self._load_stored_player(username.lower())
+
         with self._mutex:
-            return (
-                self._cache.get(cache_key, None)
-                if not long_term
-                else self._long_term_cache.get(cache_key, None)
-            )
+            cache = self._long_term_cache if long_term else self._cache
+            players = {
+                username: cache.get(username.lower(), None) for username in usernames
+            }
+
+        return {
+            username: player
+            for username, player in players.items()
+            if player is not None
+        }
+
+    def get_cached_nicked_player(self, username: str) -> NickedPlayer | None:
+        """Get the player if they were recently found to be nicked"""
+        cache_key = username.lower()
+
+        nicked_player = self._nicked_cache.peek(cache_key)
+        if nicked_player is not None:
+            self._count("nicked_hits")
+        return nicked_player
 
     def update_cached_player(
         self, username: str, update: Callable[[KnownPlayer], KnownPlayer]
@@ -96,20 +483,131 @@ class PlayerCache:
 
         with self._mutex:
             player = self._cache.get(cache_key, None)
-            if isinstance(player, KnownPlayer):
-                self._cache[cache_key] = self._long_term_cache[cache_key] = update(
-                    player
-                )
-            else:
+            if not isinstance(player, KnownPlayer):
                 logger.warning(f"Player {username} not found during update")
+                return
+
+            updated_player = update(player)
+            self._cache[cache_key] = self._long_term_cache[cache_key] = updated_player
+            self._index_player(cache_key, updated_player)
+
+        if self._store is not None:
+            self._store.store_player(cache_key, updated_player)
+
+    def get_cached_player_by_uuid(self, uuid: str) -> KnownPlayer | None:
+        """
+        Get the short term cached player with the uuid under any of their aliases
+
+        The returned player has no nick, as it is not known which alias is wanted
+        """
+        with self._mutex:
+            cache_keys = self._cache_keys_for_uuid(uuid)
+            if not cache_keys:
+                return None
+
+            player = self._cache[cache_keys[0]]
+            assert isinstance(player, KnownPlayer)
+            self._count("hits")
+            return replace(player, nick=None)
 
-    def uncache_player(self, username: str) -> None:
+    def fetch_player_by_uuid(
+        self, uuid: str, fetch: Callable[[str], FetchResult]
+    ) -> KnownPlayer | FetchResult:
+        """
+        Get the short term cached player with the uuid, or fetch them
+
+        If the player is already being fetched by another thread, wait for and
+        return the result of that fetch instead of fetching them again.
+        """
+        index_key = uuid_index_key(uuid)
+
+        with self._mutex:
+            fetch_future = self._fetches.get(index_key, None)
+            owns_fetch = fetch_future is None
+            if fetch_future is None:
+                fetch_future = self._fetches[index_key] = Future()
+            else:
+                self._count("pending_joins")
+
+        if not owns_fetch:
+            logger.debug(f"Joining fetch in progress for {uuid}")
+            # The fetch in progress was started by a call with the same type of fetch
+            return cast("KnownPlayer | FetchResult", fetch_future.result())
+
+        try:
+            cached_player = self.get_cached_player_by_uuid(uuid)
+            if cached_player is not None:
+                logger.debug(f"Cache hit by uuid {uuid}")
+                result: KnownPlayer | FetchResult = cached_player
+            else:
+                result = fetch(uuid)
+        except BaseException as e:
+            fetch_future.set_exception(e)
+            raise
+        else:
+            fetch_future.set_result(result)
+            return result
+        finally:
+            with self._mutex:
+                del self._fetches[index_key]
+
+    def update_cached_player_by_uuid(
+        self, uuid: str, update: Callable[[KnownPlayer], KnownPlayer]
+    ) -> None:
+        """Update the cache for the player with the uuid under all of their aliases"""
+        updated_players: list[tuple[str, KnownPlayer]] = []
+
+        with self._mutex:
+            for cache_key in self._cache_keys_for_uuid(uuid):
+                player = self._cache[cache_key]
+                assert isinstance(player, KnownPlayer)
+                updated_player = update(player)
+                self._cache[cache_key] = self._long_term_cache[cache_key] = (
+                    updated_player
+                )
+                updated_players.append((cache_key, updated_player))
+
+        if not updated_players:
+            logger.warning(f"Player with {uuid=} not found during update")
+
+        if self._store is not None:
+            for cache_key, updated_player in updated_players:
+                self._store.store_player(cache_key, updated_player)
+
+    def uncache_player(self, username: str, *, short_term_only: bool = False) -> None:
         """Clear the cache entry for `username`"""
         cache_key = username.lower()
 
         with self._mutex:
             self._cache.pop(cache_key, None)
-            self._long_term_cache.pop(cache_key, None)
+            if not short_term_only:
+                self._long_term_cache.pop(cache_key, None)
+                self._nicked_cache.pop(cache_key, None)
+
+        if self._store is not None and not short_term_only:
+            self._store.remove_player(cache_key)
+
+    def get_metrics(self) -> CacheMetrics:
+        """Get the lookup counters since startup, and the current size of each tier"""
+        caches = (self._cache, self._long_term_cache, self._nicked_cache)
+
+        with self._mutex:
+            # Drop the expired entries so they are counted as evicted, and not sized
+            for cache in caches:
+                cache.expire()
+
+            return CacheMetrics(
+                hits=self._counts["hits"],
+                misses=self._counts["misses"],
+                stale_hits=self._counts["stale_hits"],
+                pending_joins=self._counts["pending_joins"],
+                nicked_hits=self._counts["nicked_hits"],
+                evictions=sum(cache.evictions for cache in caches),
+                genus_rejected_writes=self._counts["genus_rejected_writes"],
+                short_term_size=len(self._cache),
+                long_term_size=len(self._long_term_cache),
+                nicked_size=len(self._nicked_cache),
+            )
 
     def clear_cache(self, *, short_term_only: bool = False) -> None:
         """Clear the entire player cache"""
@@ -118,3 +616,8 @@ class PlayerCache:
             self._cache.clear()
             if not short_term_only:
                 self._long_term_cache.clear()
+                self._nicked_cache.clear()
+                self._uuid_index.clear()
+
+        if self._store is not None and not short_term_only:
+            self._store.clear()
@@ -0,0 +1,286 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import asdict
+from pathlib import Path
+
+from prism.overlay.player_cache import (
+    LONG_TERM_TTL_SECONDS,
+    STABLE_TTL_FACTOR,
+    activity_ttl_factor,
+)
+from prism.player import KnownPlayer, Stats, Tags
+
+logger = logging.getLogger(__name__)
+
+# Base ttl of the stored players. Like in the long term PlayerCache, the ttl of each
+# player is adjusted by their activity, see activity_ttl_factor
+PLAYER_STORE_TTL_SECONDS = LONG_TERM_TTL_SECONDS
+
+# Stored uuids older than this are not used. Usernames rarely change owner
+ACCOUNT_STORE_TTL_SECONDS = 7 * 24 * 60 * 60
+
+# Bump when the serialization of KnownPlayer changes. Old stores are discarded
+PLAYER_STORE_VERSION = 1
+
+
+def player_to_json(player: KnownPlayer) -> str:
+    return json.dumps(asdict(player), separators=(",", ":"))
+
+
+def player_from_json(source: str) -> KnownPlayer:
+    """Deserialize a player written by player_to_json. Raise ValueError if invalid"""
+    try:
+        player_dict = json.loads(source)
+        stats = Stats(**player_dict.pop("stats"))
+        tags_dict = player_dict.pop("tags")
+        tags = Tags(**tags_dict) if tags_dict is not None else None
+        return KnownPlayer(stats=stats, tags=tags, **player_dict)
+    except (AttributeError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid stored player {source!r}") from e
+
+
+class PlayerStore:
+    """
+    SQLite database of the players we have gotten the stats of, keyed by username
+
+    Also stores the uuids of the usernames we have looked up.
+
+    Reads happen on the calling thread, while writes are queued and performed by
+    `write_pending`, so that callers are never blocked by disk writes.
+    If a separate `read_connection` is passed, the database is put in WAL mode and
+    reads use that connection, so they are not blocked by a write being committed.
+    Each connection is shared between threads and protected by its own lock.
+    """
+
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        *,
+        read_connection: sqlite3.Connection | None = None,
+        ttl_seconds: float = PLAYER_STORE_TTL_SECONDS,
+        account_ttl_seconds: float = ACCOUNT_STORE_TTL_SECONDS,
+        get_time_ns: Callable[[], int] = time.time_ns,
+    ) -> None:
+        self._connection = connection
+        self._ttl_ms = int(ttl_seconds * 1000)
+        self._account_ttl_ms = int(account_ttl_seconds * 1000)
+        self._get_time_ns = get_time_ns
+        self._lock = threading.Lock()
+
+        if read_connection is not None:
+            # Readers see the last commit while a write is in progress
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._read_connection = read_connection
+            self._read_lock = threading.Lock()
+        else:
+            self._read_connection = connection
+            self._read_lock = self._lock
+
+        # Protects the sets of stored usernames, which are read before the database
+        self._usernames_lock = threading.Lock()
+
+        # Pending writes as SQL statements with their parameters
+        self._writes = queue.Queue[tuple[str, tuple[str | int, ...]]]()
+
+        with self._lock, self._connection:
+            if (
+                self._connection.execute("PRAGMA user_version").fetchone()[0]
+                != PLAYER_STORE_VERSION
+            ):
+                self._connection.execute("DROP TABLE IF EXISTS players")
+                self._connection.execute(f"PRAGMA user_version={PLAYER_STORE_VERSION}")
+
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS players ("
+                "username TEXT PRIMARY KEY, "
+                "data_received_at_ms INTEGER NOT NULL, "
+                "player TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "DELETE FROM players WHERE data_received_at_ms < ?",
+                (self._oldest_valid_ms(),),
+            )
+
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS accounts ("
+                "username TEXT PRIMARY KEY, "
+                "stored_at_ms INTEGER NOT NULL, "
+                "uuid TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "DELETE FROM accounts WHERE stored_at_ms < ?",
+                (self._oldest_valid_account_ms(),),
+            )
+
+            # Usernames that may be stored, so misses can skip the database
+            self._usernames = {
+                username
+                for (username,) in self._connection.execute(
+                    "SELECT username FROM players"
+                )
+            }
+            self._account_usernames = {
+                username
+                for (username,) in self._connection.execute(
+                    "SELECT username FROM accounts"
+                )
+            }
+
+    def _now_ms(self) -> int:
+        return self._get_time_ns() // 1_000_000
+
+    def _oldest_valid_ms(self) -> int:
+        """Players received before this are too old to use, whatever their activity"""
+        return self._now_ms() - int(self._ttl_ms * STABLE_TTL_FACTOR)
+
+    def _is_expired(self, player: KnownPlayer) -> bool:
+        age_ms = self._now_ms() - player.dataReceivedAtMs
+        return age_ms > self._ttl_ms * activity_ttl_factor(player)
+
+    def _oldest_valid_account_ms(self) -> int:
+        return self._now_ms() - self._account_ttl_ms
+
+    def get_player(self, username: str) -> KnownPlayer | None:
+        """Return the stored player, if any was stored recently enough"""
+        cache_key = username.lower()
+
+        with self._usernames_lock:
+            if cache_key not in self._usernames:
+                return None
+
+        try:
+            with self._read_lock:
+                row = self._read_connection.execute(
+                    "SELECT player FROM players "
+                    "WHERE username = ? AND data_received_at_ms >= ?",
+                    (cache_key, self._oldest_valid_ms()),
+                ).fetchone()
+        except sqlite3.Error:
+            logger.exception(f"Failed reading stored player {username}")
+            return None
+
+        if row is None:
+            return None
+
+        try:
+            player = player_from_json(row[0])
+        except ValueError:
+            logger.exception(f"Failed loading stored player {username}")
+            return None
+
+        return player if not self._is_expired(player) else None
+
+    def store_player(self, username: str, player: KnownPlayer) -> None:
+        """Queue storing the player under `username`"""
+        cache_key = username.lower()
+        with self._usernames_lock:
+            self._usernames.add(cache_key)
+        self._writes.put(
+            (
+                "INSERT OR REPLACE INTO players "
+                "(username, data_received_at_ms, player) VALUES (?, ?, ?)",
+                (cache_key, player.dataReceivedAtMs, player_to_json(player)),
+            )
+        )
+
+    def remove_player(self, username: str) -> None:
+        """Queue removing the player stored under `username`"""
+        cache_key = username.lower()
+        with self._usernames_lock:
+            self._usernames.discard(cache_key)
+        self._writes.put(("DELETE FROM players WHERE username = ?", (cache_key,)))
+
+    def clear(self) -> None:
+        """Queue removing all stored players. Stored uuids are kept"""
+        with self._usernames_lock:
+            self._usernames.clear()
+        self._writes.put(("DELETE FROM players", ()))
+
+    def get_uuid(self, username: str) -> str | None:
+        """Return the stored uuid of `username`, if stored recently enough"""
+        cache_key = username.lower()
+
+        with self._usernames_lock:
+            if cache_key not in self._account_usernames:
+                return None
+
+        try:
+            with self._read_lock:
+                row = self._read_connection.execute(
+                    "SELECT uuid FROM accounts "
+                    "WHERE username = ? AND stored_at_ms >= ?",
+                    (cache_key, self._oldest_valid_account_ms()),
+                ).fetchone()
+        except sqlite3.Error:
+            logger.exception(f"Failed reading stored uuid of {username}")
+            return None
+
+        return row[0] if row is not None else None
+
+    def store_uuid(self, username: str, uuid: str) -> None:
+        """Queue storing the uuid of `username`"""
+        cache_key = username.lower()
+        with self._usernames_lock:
+            self._account_usernames.add(cache_key)
+        self._writes.put(
+            (
+                "INSERT OR REPLACE INTO accounts "
+                "(username, stored_at_ms, uuid) VALUES (?, ?, ?)",
+                (cache_key, self._now_ms(), uuid),
+            )
+        )
+
+    def remove_uuid(self, username: str) -> None:
+        """Queue removing the stored uuid of `username`"""
+        cache_key = username.lower()
+        with self._usernames_lock:
+            self._account_usernames.discard(cache_key)
+        self._writes.put(("DELETE FROM accounts WHERE username = ?", (cache_key,)))
+
+    def write_pending(self, *, block: bool = False) -> None:
+        """
+        Perform the queued writes in a single transaction
+
+        If `block` is True, wait for at least one write to be queued
+        """
+        writes = [self._writes.get()] if block else []
+        while True:
+            try:
+                writes.append(self._writes.get_nowait())
+            except queue.Empty:
+                break
+
+        if not writes:
+            return
+
+        try:
+            with self._lock, self._connection:
+                for statement, parameters in writes:
+                    self._connection.execute(statement, parameters)
+        except sqlite3.Error:
+            logger.exception(f"Failed writing {len(writes)} stored entries")
+
+    def run_writer(self) -> None:  # pragma: nocover
+        """Perform the queued writes as they come in"""
+        while True:
+            self.write_pending(block=True)
+
+
+def open_player_store(path: Path) -> PlayerStore | None:  # pragma: nocover
+    """Open the store at `path` and start writing to it in the background"""
+    try:
+        connection = sqlite3.connect(path, check_same_thread=False)
+        read_connection = sqlite3.connect(path, check_same_thread=False)
+        player_store = PlayerStore(connection, read_connection=read_connection)
+    except sqlite3.Error:
+        logger.exception(f"Failed opening player store at '{path}'")
+        return None
+
+    threading.Thread(target=player_store.run_writer, daemon=True).start()
+
+    return player_store
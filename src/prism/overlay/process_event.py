@@ -1,22 +1,33 @@
 import logging
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator, Sequence
 from dataclasses import replace
 
-from prism.overlay.behaviour import bedwars_game_ended, set_nickname
+from prism.overlay.behaviour import (
+    bedwars_game_ended,
+    drop_unwanted_stats_requests,
+    prefetch_players,
+    set_nickname,
+)
 from prism.overlay.controller import OverlayController
 from prism.overlay.events import Event, EventType
-from prism.overlay.parsing import parse_logline
+from prism.overlay.file_utils import ReversedLineReader
+from prism.overlay.parsing import LOGLINE_MARKERS, parse_logline
 from prism.overlay.state import OverlayState
 
 logger = logging.getLogger(__name__)
 
 
 def process_event(
-    controller: OverlayController, event: Event
+    controller: OverlayController, event: Event, state: OverlayState | None = None
 ) -> tuple[OverlayState, bool]:
-    """Return an updated OverlayState, and a boolean flag redraw"""
-    # Store a persistent view to the current state
-    state = controller.state
+    """
+    Return an updated OverlayState, and a boolean flag redraw
+
+    The event is applied to `state` if passed, otherwise to controller.state
+    """
+    if state is None:
+        # Store a persistent view to the current state
+        state = controller.state
 
     if event.event_type is EventType.INITIALIZE_AS:
         # Initializing means the player restarted/switched accounts -> clear the state
@@ -59,11 +70,15 @@ def process_event(
         # Reset the users preference for showing the overlay
         controller.wants_shown = None
 
-        return (
-            state.clear_lobby().set_out_of_sync(False).leave_queue().leave_game(),
-            True,
+        new_state = (
+            state.clear_lobby().set_out_of_sync(False).leave_queue().leave_game()
         )
 
+        # The requests for the players in the old lobby are no longer needed
+        drop_unwanted_stats_requests(controller, new_state)
+
+        return new_state, True
+
     if event.event_type is EventType.LOBBY_LIST:
         # Results from /who -> override lobby_players
         logger.info(
@@ -265,19 +280,183 @@ def fast_forward_state(controller: OverlayController, loglines: Iterable[str]) -
     logger.info("Done fast forwarding state")
 
 
-def process_loglines(loglines: Iterable[str], controller: OverlayController) -> None:
+# Events that reset the lobby, queue and game state
+LOBBY_RESET_EVENT_TYPES = frozenset({EventType.LOBBY_SWAP})
+
+# Events that reset the party
+PARTY_RESET_EVENT_TYPES = frozenset(
+    {
+        EventType.PARTY_ATTACH,
+        EventType.PARTY_DETACH,
+        EventType.PARTY_LIST_INCOMING,
+    }
+)
+
+# Events that change the party
+PARTY_EVENT_TYPES = PARTY_RESET_EVENT_TYPES | {
+    EventType.PARTY_JOIN,
+    EventType.PARTY_LEAVE,
+    EventType.PARTY_ROLE_LIST,
+}
+
+# Events that still have an effect when they happened before the last resets
+PERSISTENT_EVENT_TYPES = frozenset(
+    {
+        EventType.INITIALIZE_AS,
+        EventType.NEW_NICKNAME,
+        EventType.WHISPER_COMMAND_SET_NICK,
+    }
+)
+
+# Substrings present in all the loglines that can produce a party event
+PARTY_EVENT_MARKERS = (
+    b"You left the party",
+    b"You are not currently in a party",
+    b"The party was disbanded because all invites expired",
+    b" has disbanded the party",
+    b"You have been kicked from the party by ",
+    b"You have joined ",
+    b"You'll be partying with: ",
+    b" joined the party",
+    b" has left the party",
+    b" has been removed from the party",
+    b" party because they disconnected",
+    b" because they were offline",
+    b"The party was transferred to ",
+    b"Party Members (",
+    b"Party Leader: ",
+    b"Party Moderators: ",
+    b"Party Members: ",
+)
+
+# Substrings present in all the loglines that can produce a persistent event
+PERSISTENT_EVENT_MARKERS = (
+    b"Setting user: ",
+    b"Setting account (name=",
+    b"You are now nicked as ",
+    b"Can't find a player by the name of '!",
+)
+
+
+def read_events_reversed(
+    reader: ReversedLineReader,
+    markers: Sequence[bytes],
+    event_types: frozenset[EventType] | None = None,
+) -> Iterator[Event]:
+    """Yield the events from the lines containing any of `markers`, last first"""
+    for line in reader.filter(markers):
+        event = parse_logline(line)
+
+        if event is None:
+            continue
+
+        if event_types is None or event.event_type in event_types:
+            yield event
+
+
+def fast_forward_state_reversed(
+    controller: OverlayController, reader: ReversedLineReader
+) -> None:
     """
-    Update state and set the redraw event
+    Process the state changes for the end of the logfile without outputting anything
+
+    Reads the logfile backwards until the last reset of the lobby. Before that point
+    only the party, username and nicknames matter, so only the lines that can change
+    those are parsed until the last reset of the party. Before that, only the
+    username and nicknames are searched for, up to the last InitializeAsEvent.
+    The collected events are then processed in order like in `fast_forward_state`.
 
     NOTE: Caller must ensure exclusive write-access to controller.state
     """
-    for line in loglines:
-        event = parse_logline(line)
+    logger.info("Fast forwarding state from the end of the logfile")
 
-        if event is None:
-            continue
+    events: list[Event] = []
+    initialized = party_reset = False
+
+    # Everything after the last reset of the lobby has an effect
+    for event in read_events_reversed(reader, LOGLINE_MARKERS):
+        events.append(event)
+
+        # Initializing clears the entire state
+        initialized = event.event_type is EventType.INITIALIZE_AS
+        party_reset = party_reset or event.event_type in PARTY_RESET_EVENT_TYPES
+
+        if initialized or event.event_type in LOBBY_RESET_EVENT_TYPES:
+            break
+
+    # Before that, only the changes to the party and the persistent events do
+    if not initialized and not party_reset:
+        for event in read_events_reversed(
+            reader,
+            PARTY_EVENT_MARKERS + PERSISTENT_EVENT_MARKERS,
+            PARTY_EVENT_TYPES | PERSISTENT_EVENT_TYPES,
+        ):
+            events.append(event)
 
+            initialized = event.event_type is EventType.INITIALIZE_AS
+
+            if initialized or event.event_type in PARTY_RESET_EVENT_TYPES:
+                break
+
+    # Before the last reset of the party, only the persistent events do
+    if not initialized:
+        for event in read_events_reversed(
+            reader, PERSISTENT_EVENT_MARKERS, PERSISTENT_EVENT_TYPES
+        ):
+            events.append(event)
+
+            if event.event_type is EventType.INITIALIZE_AS:
+                break
+
+    logger.info(f"Processing {len(events)} events from the end of the logfile")
+    for event in reversed(events):
         controller.state, redraw = process_event(controller, event)
+    logger.info("Done fast forwarding state")
+
+
+def process_loglines(loglines: Iterable[str], controller: OverlayController) -> None:
+    """
+    Update state and set the redraw event for each line
+
+    NOTE: Caller must ensure exclusive write-access to controller.state
+    """
+    process_logline_batches(([line] for line in loglines), controller)
+
+
+def process_logline_batches(
+    batches: Iterable[Sequence[str]], controller: OverlayController
+) -> None:
+    """
+    Update state and set the redraw event once for each batch of lines
+
+    The events in a batch are applied to a local state, which is only published to
+    controller.state when the entire batch has been processed. This way a burst of
+    lines (like many players joining at once) only causes a single redraw.
+
+    Players that joined the party are prefetched once the state is published, so
+    their stats are cached before they show up in the lobby.
+
+    NOTE: Caller must ensure exclusive write-access to controller.state
+    """
+    for batch in batches:
+        state = controller.state
+        redraw = False
+
+        for line in batch:
+            event = parse_logline(line)
+
+            if event is None:
+                continue
+
+            state, event_redraw = process_event(controller, event, state)
+            redraw = redraw or event_redraw
+
+        if state is not controller.state:
+            new_party_members = state.party_members - controller.state.party_members
+            controller.state = state
+
+            if new_party_members:
+                prefetch_players(controller, sorted(new_party_members))
 
         if redraw:
             # Tell the main thread we need a redraw
@@ -1,30 +1,164 @@
-from collections.abc import Iterable
+import logging
+import os
+import sys
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+from typing import BinaryIO
 
 from prism.overlay.commandline import Options
 from prism.overlay.controller import OverlayController
-from prism.overlay.directories import DEFAULT_LOGFILE_CACHE_PATH
-from prism.overlay.file_utils import watch_file_with_reopen
-from prism.overlay.process_event import fast_forward_state
+from prism.overlay.directories import (
+    DEFAULT_LOG_CHECKPOINT_PATH,
+    DEFAULT_LOGFILE_CACHE_PATH,
+)
+from prism.overlay.file_utils import (
+    ChunkedLineReader,
+    FileProgress,
+    ReversedLineReader,
+    watch_file_batches_with_events,
+    watch_file_batches_with_reopen,
+)
+from prism.overlay.follow_logfile import follow_active_logfile
+from prism.overlay.log_checkpoint import (
+    checkpoint_logline_batches,
+    checkpoint_matches,
+    read_log_checkpoint,
+)
+from prism.overlay.parsing import LOGLINE_MARKERS
+from prism.overlay.process_event import fast_forward_state, fast_forward_state_reversed
 from prism.overlay.settings import Settings
 from prism.overlay.user_interaction.get_logfile import prompt_for_logfile_path
+from prism.overlay.user_interaction.logfile_utils import get_logfiles_to_follow
+
+logger = logging.getLogger(__name__)
 
 CLEAR_BETWEEN_DRAWS = True
 
 
+def watch_logfile(
+    logfile_path: Path, start_at: int, progress: FileProgress
+) -> Iterable[Sequence[str]]:  # pragma: nocover
+    """
+    Watch the logfile using file events if supported, otherwise by polling
+
+    Yields batches of the lines that were available at once
+    """
+    if sys.platform == "linux":
+        from prism.overlay.platform.linux import InotifyFileEvents
+
+        try:
+            file_events = InotifyFileEvents()
+            # Make sure we are able to add the watches (limited by the kernel)
+            file_events.watch(logfile_path)
+        except OSError:
+            logger.exception("Failed setting up inotify. Falling back to polling.")
+        else:
+            logger.info("Watching the logfile with inotify")
+            return watch_file_batches_with_events(
+                logfile_path,
+                start_at=start_at,
+                file_events=file_events,
+                markers=LOGLINE_MARKERS,
+                progress=progress,
+            )
+
+    return watch_file_batches_with_reopen(
+        logfile_path,
+        start_at=start_at,
+        blocking=True,
+        markers=LOGLINE_MARKERS,
+        progress=progress,
+    )
+
+
+def restore_log_checkpoint(
+    controller: OverlayController, logfile_path: Path, logfile: BinaryIO
+) -> int | None:  # pragma: nocover
+    """
+    Restore the state from the stored checkpoint and process the rest of the file
+
+    Return the position processed up to, or None if the checkpoint can't be used
+    """
+    checkpoint = read_log_checkpoint(DEFAULT_LOG_CHECKPOINT_PATH)
+    if checkpoint is None or not checkpoint_matches(checkpoint, logfile_path, logfile):
+        return None
+
+    logger.info(f"Restoring state from log checkpoint at {checkpoint.position}")
+    controller.state = checkpoint.state
+
+    # Process the lines written since the checkpoint
+    logfile.seek(checkpoint.position)
+    reader = ChunkedLineReader(logfile, markers=LOGLINE_MARKERS)
+    fast_forward_state(controller, reader.read_available_lines() or ())
+
+    return reader.position
+
+
+def fast_forward_logfile(
+    controller: OverlayController, logfile_path: Path
+) -> int:  # pragma: nocover
+    """Restore the state at the end of the logfile and return the end position"""
+    with logfile_path.open("rb") as logfile:
+        start_at = restore_log_checkpoint(controller, logfile_path, logfile)
+        if start_at is None:
+            # Process the end of the logfile to get current player as well as
+            # potential current party/lobby
+            start_at = logfile.seek(0, os.SEEK_END)
+            fast_forward_state_reversed(
+                controller, ReversedLineReader(logfile, end=start_at)
+            )
+
+    return start_at
+
+
+def follow_logfiles(
+    controller: OverlayController, logfile_paths: Sequence[Path]
+) -> Iterable[Sequence[str]]:  # pragma: nocover
+    """Follow whichever logfile is in use, starting with the first one"""
+    active = logfile_paths[0]
+    logger.info(
+        f"{len(logfile_paths)} logfiles may be in use. Watching all of them, "
+        f"starting with '{active}'"
+    )
+
+    start_at = {active: fast_forward_logfile(controller, active)}
+    for logfile_path in logfile_paths[1:]:
+        try:
+            start_at[logfile_path] = logfile_path.stat().st_size
+        except OSError:
+            logger.exception(f"Failed reading logfile '{logfile_path}'; skipping it")
+
+    progress = FileProgress(position=start_at[active], path=active)
+    return checkpoint_logline_batches(
+        follow_active_logfile(controller, start_at, active=active, progress=progress),
+        controller,
+        progress=progress,
+        checkpoint_path=DEFAULT_LOG_CHECKPOINT_PATH,
+    )
+
+
 def prompt_and_read_logfile(
     controller: OverlayController, options: Options, settings: Settings
-) -> Iterable[str]:  # pragma: nocover
+) -> Iterable[Sequence[str]]:  # pragma: nocover
     if options.logfile_path is None:
+        if settings.autoselect_logfile:
+            # Follow the logfiles instead of prompting when several are in use
+            logfile_paths = get_logfiles_to_follow(DEFAULT_LOGFILE_CACHE_PATH)
+            if logfile_paths:
+                return follow_logfiles(controller, logfile_paths)
+
         logfile_path = prompt_for_logfile_path(
             DEFAULT_LOGFILE_CACHE_PATH, settings.autoselect_logfile
         )
     else:
         logfile_path = options.logfile_path
 
-    with logfile_path.open("r", encoding="utf8", errors="replace") as logfile:
-        # Process the entire logfile to get current player as well as potential
-        # current party/lobby
-        fast_forward_state(controller, logfile.readlines())
-        final_position = logfile.tell()
+    start_at = fast_forward_logfile(controller, logfile_path)
 
-    return watch_file_with_reopen(logfile_path, start_at=final_position, blocking=True)
+    progress = FileProgress(position=start_at, path=logfile_path)
+    return checkpoint_logline_batches(
+        watch_logfile(logfile_path, start_at=start_at, progress=progress),
+        controller,
+        progress=progress,
+        checkpoint_path=DEFAULT_LOG_CHECKPOINT_PATH,
+    )
@@ -0,0 +1,343 @@
+"""Replay recorded logfiles through the overlay pipeline and measure the latency"""
+
+import io
+import logging
+import re
+import statistics
+import threading
+import time
+import uuid
+from collections.abc import Callable, Iterable, Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+
+from prism.overlay.controller import OverlayController
+from prism.overlay.nick_database import NickDatabase
+from prism.overlay.placeholder import PlaceholderWinstreakProvider
+from prism.overlay.settings import Settings, fill_missing_settings
+from prism.overlay.state import OverlayState
+from prism.player import Account, KnownPlayer, Player, Stats, Tags
+
+logger = logging.getLogger(__name__)
+
+# Matches the poll interval of the overlay window
+REPLAY_POLL_INTERVAL = 0.1
+
+# HH:MM:SS with optional fractional seconds, as written by every supported client
+TIMESTAMP_REGEX = re.compile(r"(\d{2}):(\d{2}):(\d{2})(?:\.(\d{1,9}))?")
+
+# The timestamp is always near the start of the line, before any chat message
+TIMESTAMP_SEARCH_LENGTH = 48
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def parse_log_timestamp(line: str) -> float | None:
+    """Return the timestamp of the line in seconds since midnight"""
+    match = TIMESTAMP_REGEX.search(line, 0, TIMESTAMP_SEARCH_LENGTH)
+    if match is None:
+        return None
+
+    hours, minutes, seconds, fraction = match.groups()
+    timestamp = int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+    if fraction is not None:
+        timestamp += int(fraction) / 10 ** len(fraction)
+
+    return timestamp
+
+
+def group_by_timestamp(
+    lines: Iterable[str],
+) -> Iterator[tuple[float | None, list[str]]]:
+    """
+    Group consecutive lines written at the same time
+
+    The times are made monotonic across midnight. Lines without a timestamp are
+    grouped with the previous line. Leading lines without a timestamp get None.
+    """
+    group_time: float | None = None
+    group: list[str] = []
+    day_offset = 0.0
+
+    for line in lines:
+        timestamp = parse_log_timestamp(line)
+        if timestamp is not None:
+            timestamp += day_offset
+            if group_time is not None and timestamp < group_time - SECONDS_PER_DAY / 2:
+                # The clock wrapped around midnight
+                day_offset += SECONDS_PER_DAY
+                timestamp += SECONDS_PER_DAY
+
+        if timestamp is not None and timestamp != group_time:
+            if group:
+                yield group_time, group
+            group_time, group = timestamp, []
+
+        group.append(line)
+
+    if group:
+        yield group_time, group
+
+
+@dataclass(frozen=True, slots=True)
+class LatencySummary:
+    count: int
+    mean: float
+    p50: float
+    p90: float
+    p99: float
+    max: float
+
+    @classmethod
+    def from_latencies(cls, latencies: Sequence[float]) -> "LatencySummary | None":
+        if not latencies:
+            return None
+
+        if len(latencies) == 1:
+            percentiles = [latencies[0]] * 99
+        else:
+            percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+
+        return cls(
+            count=len(latencies),
+            mean=statistics.fmean(latencies),
+            p50=percentiles[49],
+            p90=percentiles[89],
+            p99=percentiles[98],
+            max=max(latencies),
+        )
+
+    def format(self) -> str:
+        return (
+            f"n={self.count} mean={self.mean * 1000:.1f}ms "
+            f"p50={self.p50 * 1000:.1f}ms p90={self.p90 * 1000:.1f}ms "
+            f"p99={self.p99 * 1000:.1f}ms max={self.max * 1000:.1f}ms"
+        )
+
+
+class ReplayRecorder:
+    """
+    Match the redraws of the overlay to the loglines that caused them
+
+    Loglines are replayed in batches of lines with the same timestamp. The state
+    latency is measured from when a batch is emitted until the first redraw after
+    it requested one. The stats latency is measured from when a player is first
+    displayed until their stats are displayed.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        # Time each batch was emitted
+        self._emitted: list[float] = []
+        # Index of the batch currently being processed
+        self._processing: int | None = None
+        # Batches that have requested a redraw which hasn't happened yet
+        self._pending: list[int] = []
+        # Time of the batch that caused each displayed player to be shown
+        self._first_shown: dict[str, float] = {}
+        # Displayed players whose stats have been shown
+        self._stats_shown: set[str] = set()
+
+        self.state_latencies: list[float] = []
+        self.stats_latencies: list[float] = []
+        self.done = False
+
+    @property
+    def batches(self) -> int:
+        return len(self._emitted)
+
+    def batch_emitted(self, now: float) -> None:
+        with self._lock:
+            self._processing = len(self._emitted)
+            self._emitted.append(now)
+
+    def batch_processed(self) -> None:
+        with self._lock:
+            self._processing = None
+
+    def redraw_requested(self) -> None:
+        with self._lock:
+            if self._processing is None:
+                return
+            if not self._pending or self._pending[-1] != self._processing:
+                self._pending.append(self._processing)
+
+    def redrawn(self, players: Sequence[Player], now: float) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, []
+            emitted = [self._emitted[batch] for batch in pending]
+
+            self.state_latencies.extend(now - emit_time for emit_time in emitted)
+
+            # Attribute new players to the earliest batch since the last redraw
+            shown_at = min(emitted, default=now)
+            usernames = {player.username for player in players}
+            for username in self._first_shown.keys() - usernames:
+                # Measure the stats latency again if the player comes back later
+                del self._first_shown[username]
+                self._stats_shown.discard(username)
+
+            for player in players:
+                first_shown = self._first_shown.setdefault(player.username, shown_at)
+                if (
+                    isinstance(player, KnownPlayer)
+                    and player.username not in self._stats_shown
+                ):
+                    self._stats_shown.add(player.username)
+                    self.stats_latencies.append(now - first_shown)
+
+    def report(self) -> str:
+        lines = [f"Replayed {self.batches} batches of loglines"]
+        for name, latencies in (
+            ("logline -> redraw", self.state_latencies),
+            ("player -> stats shown", self.stats_latencies),
+        ):
+            summary = LatencySummary.from_latencies(latencies)
+            lines.append(
+                f"{name}: {summary.format() if summary is not None else 'no samples'}"
+            )
+
+        return "\n".join(lines)
+
+
+class RecordingEvent(threading.Event):
+    """Redraw event that lets the recorder know which batch requested the redraw"""
+
+    def __init__(self, recorder: ReplayRecorder) -> None:
+        super().__init__()
+        self._recorder = recorder
+
+    def set(self) -> None:
+        self._recorder.redraw_requested()
+        super().set()
+
+
+def replay_batches(
+    groups: Iterable[tuple[float | None, list[str]]],
+    *,
+    speed: float,
+    recorder: ReplayRecorder,
+    clock: Callable[[], float] = time.monotonic,
+    sleep: Callable[[float], None] = time.sleep,
+) -> Iterable[list[str]]:
+    """
+    Yield the batches at their original timing, compressed by `speed`
+
+    The batches must be consumed by processing each batch completely before
+    requesting the next one.
+    """
+    start = clock()
+    first_time: float | None = None
+
+    for group_time, lines in groups:
+        if group_time is not None:
+            if first_time is None:
+                first_time = group_time
+
+            delay = start + (group_time - first_time) / speed - clock()
+            if delay > 0:
+                sleep(delay)
+
+        recorder.batch_emitted(clock())
+        yield lines
+        recorder.batch_processed()
+
+    recorder.done = True
+
+
+class StubStatsProvider:
+    """Account, player and tags provider that answers without network access"""
+
+    def __init__(self, response_delay: float = 0.0) -> None:
+        self._response_delay = response_delay
+        self._usernames: dict[str, str] = {}
+
+    @property
+    def seconds_until_unblocked(self) -> float:
+        return 0
+
+    def get_account_by_username(self, username: str, *, user_id: str) -> Account:
+        account_uuid = str(uuid.uuid5(uuid.NAMESPACE_OID, username.lower()))
+        self._usernames[account_uuid] = username
+        return Account(uuid=account_uuid, username=username)
+
+    def get_player(self, uuid: str, *, user_id: str) -> KnownPlayer:
+        time.sleep(self._response_delay)
+        return KnownPlayer(
+            dataReceivedAtMs=time.time_ns() // 1_000_000,
+            stats=Stats(
+                index=0,
+                fkdr=0,
+                kdr=0,
+                bblr=0,
+                wlr=0,
+                winstreak=None,
+                winstreak_accurate=False,
+                kills=0,
+                finals=0,
+                beds=0,
+                wins=0,
+            ),
+            stars=0,
+            username=self._usernames.get(uuid, uuid),
+            uuid=uuid,
+        )
+
+    def get_tags(self, uuid: str, *, user_id: str, urchin_api_key: str | None) -> Tags:
+        return Tags(sniping="none", cheating="none")
+
+
+def create_replay_controller(recorder: ReplayRecorder) -> OverlayController:
+    """Create a controller with stubbed providers and settings kept in memory"""
+    settings_dict, _ = fill_missing_settings({}, 4)
+    provider = StubStatsProvider()
+    controller = OverlayController(
+        state=OverlayState(),
+        settings=Settings.from_dict(
+            settings_dict, write_settings_file_utf8=io.StringIO
+        ),
+        nick_database=NickDatabase([{}]),
+        account_provider=provider,
+        player_provider=provider,
+        winstreak_provider=PlaceholderWinstreakProvider(),
+        tags_provider=provider,
+    )
+    controller.redraw_event = RecordingEvent(recorder)
+    controller.ready = True
+    return controller
+
+
+def run_replay(logfile_path: Path, *, speed: float) -> None:  # pragma: nocover
+    """Replay the logfile through the state and stats threads and print a report"""
+    from prism.overlay.output.overlay.run_overlay import get_stat_list
+    from prism.overlay.threading import GetStatsThread, UpdateStateThread
+
+    recorder = ReplayRecorder()
+    controller = create_replay_controller(recorder)
+
+    with logfile_path.open("r", encoding="utf8", errors="replace") as logfile:
+        UpdateStateThread(
+            controller=controller,
+            logline_batches=replay_batches(
+                group_by_timestamp(logfile), speed=speed, recorder=recorder
+            ),
+        ).start()
+        for i in range(controller.settings.stats_thread_count):
+            GetStatsThread(controller=controller).start()
+
+        logger.info(f"Replaying {logfile_path} at {speed}x speed")
+
+        while True:
+            players = get_stat_list(controller)
+            if players is not None:
+                recorder.redrawn(players, time.monotonic())
+            elif (
+                recorder.done
+                and controller.requested_stats_queue.unfinished_tasks == 0
+                and controller.completed_stats_queue.empty()
+            ):
+                break
+
+            time.sleep(REPLAY_POLL_INTERVAL)
+
+    print(recorder.report())
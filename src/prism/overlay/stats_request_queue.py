@@ -0,0 +1,114 @@
+import heapq
+import itertools
+import queue
+import threading
+from collections.abc import Callable, Sequence
+from enum import IntEnum
+from operator import itemgetter
+
+
+class RequestPriority(IntEnum):
+    """The classes of stats requests, in the order they are handed out"""
+
+    # Players shown in the lobby, outside of your party
+    ENEMY = 0
+    # Party members in the lobby
+    TEAMMATE = 1
+    # Yourself, e.g. for the session stats
+    OWN = 2
+    # Players shown with stale stats, or not shown at all
+    REFRESH = 3
+    # Party members that are not in the lobby yet
+    PREFETCH = 4
+
+
+def default_priority(username: str, refresh: bool) -> RequestPriority:
+    return RequestPriority.REFRESH if refresh else RequestPriority.ENEMY
+
+
+class StatsRequestQueue(queue.Queue[str]):
+    """
+    Queue of usernames to get the stats of, handed out by priority
+
+    The priority of each request is computed with `get_priority(username, refresh)`
+    when it is enqueued, and computed again when it reaches the front of the queue.
+    Requests that have become less urgent in the meantime are moved back, so they
+    follow changes to the lobby. Requests with the same priority are handed out in
+    FIFO order.
+    By default, refreshes of players whose stale stats are already shown are only
+    handed out when no regular requests are waiting.
+    """
+
+    def __init__(
+        self,
+        get_priority: Callable[[str, bool], RequestPriority] = default_priority,
+    ) -> None:
+        self._get_priority = get_priority
+        # Whether the requests put by the current thread are refreshes
+        self._putting = threading.local()
+        super().__init__()
+
+    def _init(self, maxsize: int) -> None:
+        # Heap of the priority, insertion order, username, and whether the
+        # request is a refresh
+        self.requests: list[tuple[RequestPriority, int, str, bool]] = []
+        # Insertion order of the dropped requests still in the heap
+        self.dropped: set[int] = set()
+        self.insertions = itertools.count()
+
+    def _qsize(self) -> int:
+        return len(self.requests) - len(self.dropped)
+
+    def _put(self, item: str) -> None:
+        refresh = getattr(self._putting, "refresh", False)
+        heapq.heappush(
+            self.requests,
+            (self._get_priority(item, refresh), next(self.insertions), item, refresh),
+        )
+
+    def _get(self) -> str:
+        while True:
+            priority, order, username, refresh = heapq.heappop(self.requests)
+
+            if order in self.dropped:
+                self.dropped.remove(order)
+                continue
+
+            current_priority = self._get_priority(username, refresh)
+            if current_priority > priority:
+                heapq.heappush(
+                    self.requests, (current_priority, order, username, refresh)
+                )
+                continue
+
+            return username
+
+    def put_refresh(self, username: str) -> None:
+        """Enqueue a low priority refresh of the stats of `username`"""
+        self.put_many((username,), refresh=True)
+
+    def put_many(self, usernames: Sequence[str], *, refresh: bool = False) -> None:
+        """Enqueue several requests at once, optionally as refreshes"""
+        self._putting.refresh = refresh
+        try:
+            for username in usernames:
+                self.put(username)
+        finally:
+            self._putting.refresh = False
+
+    def drop(self, should_drop: Callable[[str], bool]) -> list[str]:
+        """Remove the waiting requests matching `should_drop` and return them"""
+        with self.mutex:
+            dropped_requests = [
+                (order, username)
+                for _, order, username, _ in sorted(self.requests, key=itemgetter(1))
+                if order not in self.dropped and should_drop(username)
+            ]
+            # The dropped requests are skipped when they reach the front
+            self.dropped.update(order for order, _ in dropped_requests)
+
+        # The dropped requests will never be handled
+        for _ in dropped_requests:
+            self.task_done()
+
+        return [username for _, username in dropped_requests]
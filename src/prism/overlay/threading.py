@@ -2,15 +2,16 @@ import logging
 import sys
 import threading
 import time
-from collections.abc import Iterable
+from collections.abc import Iterable, Sequence
 
 from prism.flashlight.auth.manager import AuthManager
 from prism.flashlight.notices import IncludeVersionUpdates, get_flashlight_notices
-from prism.overlay.behaviour import get_and_cache_player
+from prism.overlay.behaviour import handle_stats_request
 from prism.overlay.controller import OverlayController
 from prism.overlay.current_player import CurrentPlayerThread
 from prism.overlay.keybinds import AlphanumericKey
-from prism.overlay.process_event import process_loglines
+from prism.overlay.metrics import format_metrics
+from prism.overlay.process_event import process_logline_batches
 from prism.overlay.rich_presence import RPCThread
 
 logger = logging.getLogger(__name__)
@@ -25,15 +26,17 @@ NOTICE_RETRY_DELAY_SECONDS = 30.0
 class UpdateStateThread(threading.Thread):  # pragma: nocover
     """Thread that reads from the logfile and updates the state"""
 
-    def __init__(self, controller: OverlayController, loglines: Iterable[str]) -> None:
+    def __init__(
+        self, controller: OverlayController, logline_batches: Iterable[Sequence[str]]
+    ) -> None:
         super().__init__(daemon=True)  # Don't block the process from exiting
         self.controller = controller
-        self.loglines = loglines
+        self.logline_batches = logline_batches
 
     def run(self) -> None:
-        """Read self.loglines and update self.controller"""
+        """Read self.logline_batches and update self.controller"""
         try:
-            process_loglines(self.loglines, self.controller)
+            process_logline_batches(self.logline_batches, self.controller)
         except Exception:
             logger.exception(
                 "Exception caught in state update thread. Exiting the overlay."
@@ -57,24 +60,7 @@ class GetStatsThread(threading.Thread):  # pragma: nocover
         try:
             while True:
                 username = self.controller.requested_stats_queue.get()
-
-                # Small optimization in case the player left or we switched lobbies
-                # between first seeing them and now getting to the request
-                # NOTE: We always allow own_username to enable the discord RPC thread
-                #       to make requests to compute session stats
-                state = self.controller.state
-                if username in state.lobby_players or username == state.own_username:
-                    get_and_cache_player(
-                        username=username,
-                        completed_queue=self.controller.completed_stats_queue,
-                        controller=self.controller,
-                    )
-                else:
-                    logger.info(f"Skipping get_stats for {username} because they left")
-                    # Uncache the pending stats so that if we see them again we will
-                    # issue another request, instead of waiting for this one.
-                    self.controller.player_cache.uncache_player(username)
-
+                handle_stats_request(self.controller, username)
                 self.controller.requested_stats_queue.task_done()
         except Exception:
             logger.exception("Exception caught in stats thread. Exiting.")
@@ -128,6 +114,24 @@ class NoticeCheckerThread(threading.Thread):  # pragma: nocover
         )
 
 
+class MetricsLoggerThread(threading.Thread):  # pragma: nocover
+    """Thread that periodically logs the cache and request metrics"""
+
+    def __init__(self, controller: OverlayController, interval: float) -> None:
+        super().__init__(daemon=True)  # Don't block the process from exiting
+        self.controller = controller
+        self.interval = interval
+
+    def run(self) -> None:
+        """Log the metrics every self.interval seconds"""
+        try:
+            while True:
+                time.sleep(self.interval)
+                logger.info(f"Metrics: {format_metrics(self.controller.get_metrics())}")
+        except Exception:
+            logger.exception("Exception caught in metrics logger thread. Exiting.")
+
+
 class AutoWhoThread(threading.Thread):  # pragma: nocover
     """Thread that types /who on request, unless cancelled"""
 
@@ -186,12 +190,15 @@ class AutoWhoThread(threading.Thread):  # pragma: nocover
 
 
 def start_threads(
-    controller: OverlayController, loglines: Iterable[str], auth: AuthManager
+    controller: OverlayController,
+    logline_batches: Iterable[Sequence[str]],
+    auth: AuthManager,
+    metrics_interval: float | None = None,
 ) -> None:  # pragma: nocover
     """Spawn threads that perform the state updates and stats downloading"""
 
     # Spawn thread for updating state
-    UpdateStateThread(controller=controller, loglines=loglines).start()
+    UpdateStateThread(controller=controller, logline_batches=logline_batches).start()
 
     # Spawn threads for downloading stats
     for i in range(controller.settings.stats_thread_count):
@@ -203,6 +210,9 @@ def start_threads(
 
     AutoWhoThread(controller=controller).start()
 
+    if metrics_interval is not None:
+        MetricsLoggerThread(controller=controller, interval=metrics_interval).start()
+
     # Spawn thread to check for flashlight information
     NoticeCheckerThread(
         controller=controller,
@@ -414,6 +414,37 @@ def write_logfile_cache(logfile_cache_path: Path, cache: LogfileCache) -> None:
         )
 
 
+def get_logfiles_to_follow(logfile_cache_path: Path) -> tuple[Path, ...]:
+    """
+    Return the recent logfiles, most recently used first, if several are recent
+
+    Return an empty tuple if the user has to be prompted instead, because at most
+    one logfile is recent or because the user has never selected a logfile.
+    """
+    cache, _ = read_logfile_cache(logfile_cache_path)
+    if cache.last_used_index is None:
+        return ()
+
+    new_logfiles = set(suggest_logfiles()) - set(cache.known_logfiles)
+    recent_logfiles = [
+        active_logfile
+        for active_logfile in create_active_logfiles(
+            cache.known_logfiles + tuple(new_logfiles)
+        )
+        if active_logfile.recent
+    ]
+
+    if len(recent_logfiles) < 2:
+        return ()
+
+    return tuple(
+        active_logfile.path
+        for active_logfile in sorted(
+            recent_logfiles, key=lambda active_logfile: active_logfile.age_seconds
+        )
+    )
+
+
 def get_logfile(
     update_cache: Callable[[tuple[ActiveLogfile, ...], int | None], LogfileCache],
     logfile_cache_path: Path,
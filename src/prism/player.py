@@ -80,6 +80,9 @@ class KnownPlayer:
 
     tags: Tags | None = field(default=None)
 
+    # Served from the long term cache while the stats are being refetched
+    stale: bool = field(default=False)
+
     @property
     def stats_unknown(self) -> bool:
         return False
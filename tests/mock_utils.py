@@ -5,7 +5,7 @@ from collections.abc import Iterable, Sequence
 from dataclasses import dataclass
 from pathlib import PurePath
 from types import TracebackType
-from typing import Any, Self, TextIO
+from typing import Any, BinaryIO, Self
 
 real_fspath = os.fspath
 real_stat = os.stat
@@ -97,8 +97,8 @@ class Line:
     content: str | None  # The line of text (no \n) or None to clear the file
 
 
-class MockedFile(TextIO):
-    """Class mocking an opened file"""
+class MockedFile(BinaryIO):
+    """Class mocking a file opened in binary mode"""
 
     def __init__(self, lines: Sequence[Line], mocked_time: MockedTime) -> None:
         assert all(
@@ -108,8 +108,8 @@ class MockedFile(TextIO):
         self.mocked_time = mocked_time
         self.lines = lines
 
-        self.contents: list[str] = []
-        self.content_index = 0
+        self.contents = b""
+        self.position = 0
 
     def __enter__(self) -> Self:
         """Enable context manager functionality"""
@@ -132,7 +132,7 @@ class MockedFile(TextIO):
 
         NOTE: Unread lines on file clear will be lost, like with a real file
         """
-        self.contents.clear()
+        contents: list[bytes] = []
 
         for line in self.lines:
             if line.time > self.mocked_time.time.monotonic():
@@ -140,52 +140,47 @@ class MockedFile(TextIO):
                 break
 
             if line.content is None:
-                self.contents.clear()
+                contents.clear()
             else:
-                self.contents.append(f"{line.content}\n")
+                contents.append(f"{line.content}\n".encode("utf8"))
 
-    def read(self, size: int = -1) -> str:
-        """Mocked read"""
-        assert size < 0, "Read with size not supported"
+        self.contents = b"".join(contents)
 
+    def read(self, size: int = -1) -> bytes:
+        """Mocked read"""
         self._set_contents()
 
-        if self.content_index >= len(self.contents):
-            return ""
-
-        output = ""
-        while (new_line := self.readline()) != "":
-            output += new_line
+        end = len(self.contents) if size < 0 else self.position + size
+        output = self.contents[self.position : end]
+        self.position += len(output)
 
         return output
 
-    def readline(self, size: int = -1) -> str:
+    def readline(self, size: int = -1) -> bytes:
         """Mocked readline"""
         assert size < 0, "Readline with size not supported"
         self._set_contents()
 
-        if self.content_index >= len(self.contents):
-            return ""
-
-        line = self.contents[self.content_index]
-        self.content_index += 1
+        end = self.contents.find(b"\n", self.position) + 1
+        if end == 0:
+            end = len(self.contents)
 
-        return line
+        return self.read(max(0, end - self.position))
 
     def tell(self) -> int:
         """Mocked tell"""
-        return self.content_index
+        return self.position
 
     def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
         """Mocked seek"""
         self._set_contents()
 
         if whence == os.SEEK_SET:  # 0
-            self.content_index = offset
+            self.position = offset
         elif whence == os.SEEK_CUR:  # 1
-            self.content_index += offset
+            self.position += offset
         elif whence == os.SEEK_END:  # 2
-            self.content_index = len(self.contents) + offset
+            self.position = len(self.contents) + offset
         else:
             raise ValueError(f"{whence=} is invalid")
 
@@ -206,13 +201,13 @@ class MockedFile(TextIO):
     def __iter__(self) -> Self:
         return self
 
-    def __next__(self) -> str:
+    def __next__(self) -> bytes:
         return self.readline()
 
-    def writelines(self, lines: Iterable[str]) -> None:
+    def writelines(self, lines: Iterable[Any]) -> None:
         raise NotImplementedError
 
-    def readlines(self, hint: int = -1) -> list[str]:
+    def readlines(self, hint: int = -1) -> list[bytes]:
         raise NotImplementedError
 
     def close(self) -> None:
@@ -225,7 +220,7 @@ class MockedFile(TextIO):
         # NOTE: Just a placeholder value
         return MOCKED_FILE_FILENO
 
-    def write(self, s: str) -> int:
+    def write(self, s: Any) -> int:
         raise NotImplementedError
 
     def flush(self) -> None:
@@ -707,3 +707,15 @@ def test_render_stats_reads_the_config_of_each_column(column: str) -> None:
     }
 
     assert changed == {column}, f"Flipping the sort order of {column} changed {changed}"
+
+
+def test_render_stats_stale() -> None:
+    """Stale players are shown with all their stats, and a dimmed username"""
+    player = make_player(username="Player1")
+    stale_player = replace(player, stale=True)
+
+    rendered = render_stats(player, DEFAULT_RATING_CONFIGS)
+    stale_rendered = render_stats(stale_player, DEFAULT_RATING_CONFIGS)
+
+    assert stale_rendered.username == CellValue.monochrome("Player1", GUI_COLORS[0])
+    assert replace(stale_rendered, username=rendered.username) == rendered
@@ -0,0 +1,41 @@
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+
+from prism.overlay.file_utils import FileEvent
+
+pytestmark = pytest.mark.skipif(sys.platform != "linux", reason="Linux-only API")
+
+
+def test_inotify_file_events(tmp_path: Path) -> None:
+    from prism.overlay.platform.linux import InotifyFileEvents
+
+    path = tmp_path / "latest.log"
+    path.write_text("first\n")
+
+    file_events = InotifyFileEvents()
+    file_events.watch(path)
+
+    # Changes to other files in the directory are ignored
+    (tmp_path / "other.log").write_text("other\n")
+    with path.open("a") as f:
+        f.write("second\n")
+    assert file_events.wait() == {FileEvent.MODIFIED}
+
+    # Rotating the logfile
+    path.rename(tmp_path / "old.log")
+    assert FileEvent.REPLACED in file_events.wait()
+
+    # Waiting for the new logfile
+    file_events.watch(path)
+    threading.Timer(0.05, lambda: path.write_text("new\n")).start()
+    assert file_events.wait() == {FileEvent.REPLACED}
+
+    # Deleting the logfile
+    file_events.watch(path)
+    path.unlink()
+    assert FileEvent.REPLACED in file_events.wait()
+
+    file_events.close()
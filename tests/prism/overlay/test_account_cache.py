@@ -0,0 +1,36 @@
+import sqlite3
+from pathlib import Path
+
+from prism.overlay.account_cache import AccountCache
+from prism.overlay.player_store import PlayerStore
+
+
+def test_account_cache() -> None:
+    account_cache = AccountCache()
+
+    assert account_cache.get_uuid("Player1") is None
+
+    account_cache.set_uuid("Player1", "uuid1")
+    assert account_cache.get_uuid("player1") == "uuid1"
+
+    account_cache.uncache_uuid("PLAYER1")
+    assert account_cache.get_uuid("Player1") is None
+
+
+def test_account_cache_with_store(tmp_path: Path) -> None:
+    store = PlayerStore(sqlite3.connect(tmp_path / "players.sqlite"))
+    account_cache = AccountCache(store=store)
+
+    account_cache.set_uuid("Player1", "uuid1")
+    account_cache.set_uuid("Player2", "uuid2")
+    account_cache.uncache_uuid("Player2")
+    store.write_pending()
+
+    # Warm start from the store
+    account_cache = AccountCache(store=store)
+    assert account_cache.get_uuid("Player1") == "uuid1"
+    assert account_cache.get_uuid("Player2") is None
+
+    # Already cached uuids are not stored again
+    account_cache.set_uuid("Player1", "uuid1")
+    assert store._writes.empty()
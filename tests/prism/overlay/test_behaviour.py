@@ -1,5 +1,6 @@
 import io
 import queue
+import threading
 import unittest.mock
 from dataclasses import dataclass, replace
 from typing import cast
@@ -13,6 +14,10 @@ from prism.overlay.behaviour import (
     bedwars_game_ended,
     get_and_cache_player,
     get_cached_player_or_enqueue_request,
+    get_cached_players_or_enqueue_requests,
+    get_request_priority,
+    handle_stats_request,
+    prefetch_players,
     set_nickname,
     should_redraw,
     update_settings,
@@ -21,10 +26,12 @@ from prism.overlay.controller import OverlayController
 from prism.overlay.keybinds import AlphanumericKeyDict
 from prism.overlay.nick_database import NickDatabase
 from prism.overlay.settings import NickValue, Settings, SettingsDict, get_settings
+from prism.overlay.stats_request_queue import RequestPriority
 from prism.player import (
     MISSING_WINSTREAKS,
     Account,
     KnownPlayer,
+    NickedPlayer,
     PendingPlayer,
     Tags,
     Winstreaks,
@@ -36,6 +43,7 @@ from tests.prism.overlay.test_settings import (
 )
 from tests.prism.overlay.utils import (
     CUSTOM_RATING_CONFIG_COLLECTION_DICT,
+    OWN_USERNAME,
     MockedAccountProvider,
     MockedPlayerProvider,
     MockedTagsProvider,
@@ -136,6 +144,27 @@ def test_set_nickname(known_nicks: dict[str, str]) -> None:
     assert controller.redraw_event.is_set()
 
 
+def test_set_nickname_clears_nicked_player() -> None:
+    controller = create_controller(
+        account_provider=MockedAccountProvider(
+            get_account_by_username=lambda username: Account(
+                username=username, uuid=UUID
+            )
+        ),
+        settings=make_settings(
+            write_settings_file_utf8=lambda: no_close(io.StringIO())
+        ),
+    )
+    controller.player_cache.set_cached_player(
+        NICK, NickedPlayer(NICK), genus=controller.player_cache.current_genus
+    )
+
+    set_nickname(nick=NICK, username=USERNAME, controller=controller)
+
+    # The nick is looked up again with the new denick
+    assert controller.player_cache.get_cached_nicked_player(NICK) is None
+
+
 @pytest.mark.parametrize("explicit", (False, True))
 @pytest.mark.parametrize("known_nicks", KNOWN_NICKS)
 def test_unset_nickname(known_nicks: dict[str, str], explicit: bool) -> None:
@@ -367,6 +396,230 @@ def test_get_and_cache_stats_tags_error() -> None:
         completed_queue.get_nowait()
 
 
+def test_get_and_cache_stats_tags_concurrently() -> None:
+    user = test_get_stats.users["NickedPlayer"]
+    assert user.nick is not None  # For typing
+
+    tags_requested = threading.Event()
+    player_requested = threading.Event()
+
+    def get_account_by_username(username: str) -> Account:
+        raise PlayerNotFoundError
+
+    def get_player(uuid: str, user_id: str) -> KnownPlayer:
+        assert user.player is not None
+        player_requested.set()
+
+        # The tags are requested before we get the stats
+        assert tags_requested.wait(timeout=5)
+        return user.player
+
+    def get_tags(uuid: str, user_id: str, urchin_api_key: str | None) -> Tags:
+        tags_requested.set()
+
+        # The tags request runs while the stats are being fetched
+        assert player_requested.wait(timeout=5)
+        return Tags(cheating="none", sniping="none")
+
+    controller = create_controller(
+        account_provider=MockedAccountProvider(
+            get_account_by_username=get_account_by_username
+        ),
+        player_provider=MockedPlayerProvider(get_player=get_player),
+        winstreak_provider=MockedWinstreakProvider(
+            get_estimated_winstreaks_for_uuid=lambda uuid: (MISSING_WINSTREAKS, False)
+        ),
+        tags_provider=MockedTagsProvider(get_tags=get_tags),
+        nick_database=NickDatabase([{user.nick: user.uuid}]),
+    )
+
+    completed_queue = queue.Queue[str]()
+
+    get_and_cache_player(user.nick, completed_queue, controller)
+
+    # One update for the stats, and one for the tags
+    assert completed_queue.qsize() == 2
+
+    cached_player = controller.player_cache.get_cached_player(user.nick)
+    assert isinstance(cached_player, KnownPlayer)
+    assert cached_player.tags == Tags(cheating="none", sniping="none")
+
+
+def test_get_and_cache_stats_winstreaks_early() -> None:
+    user = test_get_stats.users["UnnickedPlayer"]
+    assert user.player is not None and user.player.is_missing_winstreaks
+
+    winstreaks_requested = threading.Event()
+
+    def get_account_by_username(username: str) -> Account:
+        return Account(username=user.username, uuid=user.uuid)
+
+    def get_player(uuid: str, user_id: str) -> KnownPlayer:
+        assert user.player is not None
+
+        # The winstreaks are requested before we get the stats
+        assert winstreaks_requested.wait(timeout=5)
+        return user.player
+
+    def get_estimated_winstreaks(uuid: str) -> tuple[Winstreaks, bool]:
+        assert uuid == user.uuid
+        winstreaks_requested.set()
+        return make_winstreaks(overall=100), True
+
+    controller = create_controller(
+        account_provider=MockedAccountProvider(
+            get_account_by_username=get_account_by_username
+        ),
+        player_provider=MockedPlayerProvider(get_player=get_player),
+        winstreak_provider=MockedWinstreakProvider(
+            get_estimated_winstreaks_for_uuid=get_estimated_winstreaks
+        ),
+        tags_provider=MockedTagsProvider(
+            get_tags=lambda uuid, user_id, urchin_api_key: Tags(
+                cheating="none", sniping="none"
+            )
+        ),
+    )
+
+    # The previous stats of the player are missing the winstreaks
+    controller.player_cache.set_cached_player(
+        user.username, user.player, genus=controller.player_cache.current_genus
+    )
+    controller.player_cache.clear_cache(short_term_only=True)
+
+    completed_queue = queue.Queue[str]()
+
+    get_and_cache_player(user.username, completed_queue, controller)
+
+    # One update for each of the stats, tags, and winstreaks
+    assert completed_queue.qsize() == 3
+
+    cached_player = controller.player_cache.get_cached_player(user.username)
+    assert isinstance(cached_player, KnownPlayer)
+    assert cached_player.stats.winstreak == 100
+    assert cached_player.tags == Tags(cheating="none", sniping="none")
+
+
+@pytest.mark.parametrize("failing_request", ("stats", "tags", "winstreaks"))
+def test_get_and_cache_stats_unexpected_error(failing_request: str) -> None:
+    user = test_get_stats.users["UnnickedPlayer"]
+
+    TAGS = Tags(cheating="none", sniping="high")
+
+    def fail_if(request: str) -> None:
+        if request == failing_request:
+            raise ValueError(f"Unexpected error getting {request}")
+
+    def get_player(uuid: str, user_id: str) -> KnownPlayer:
+        assert user.player is not None
+        fail_if("stats")
+        return user.player
+
+    def get_estimated_winstreaks(uuid: str) -> tuple[Winstreaks, bool]:
+        fail_if("winstreaks")
+        return make_winstreaks(overall=100), True
+
+    def get_tags(uuid: str, user_id: str, urchin_api_key: str | None) -> Tags:
+        fail_if("tags")
+        return TAGS
+
+    controller = create_controller(
+        account_provider=MockedAccountProvider(
+            get_account_by_username=lambda username: Account(
+                username=user.username, uuid=user.uuid
+            )
+        ),
+        player_provider=MockedPlayerProvider(get_player=get_player),
+        winstreak_provider=MockedWinstreakProvider(
+            get_estimated_winstreaks_for_uuid=get_estimated_winstreaks
+        ),
+        tags_provider=MockedTagsProvider(get_tags=get_tags),
+    )
+
+    completed_queue = queue.Queue[str]()
+
+    # The error is raised in the stats thread
+    with pytest.raises(ValueError):
+        get_and_cache_player(user.username, completed_queue, controller)
+
+    cached_player = controller.player_cache.get_cached_player(user.username)
+    if failing_request == "stats":
+        assert cached_player is None
+        assert completed_queue.qsize() == 0
+    else:
+        # The other results are still cached
+        assert isinstance(cached_player, KnownPlayer)
+        assert completed_queue.qsize() == 2
+        assert (cached_player.tags == TAGS) == (failing_request != "tags")
+        assert cached_player.is_missing_winstreaks == (failing_request == "winstreaks")
+
+
+def test_get_and_cache_stats_nicked_after_getting_uuid() -> None:
+    tags_uuids: list[str] = []
+
+    def get_player(uuid: str, user_id: str) -> KnownPlayer:
+        raise PlayerNotFoundError
+
+    def get_tags(uuid: str, user_id: str, urchin_api_key: str | None) -> Tags:
+        tags_uuids.append(uuid)
+        return Tags(cheating="none", sniping="none")
+
+    controller = create_controller(
+        account_provider=MockedAccountProvider(
+            get_account_by_username=lambda username: Account(
+                username=username, uuid="uuid-for-Nick1"
+            )
+        ),
+        player_provider=MockedPlayerProvider(get_player=get_player),
+        tags_provider=MockedTagsProvider(get_tags=get_tags),
+    )
+
+    completed_queue = queue.Queue[str]()
+
+    get_and_cache_player("Nick1", completed_queue, controller)
+
+    # The tags were requested early, but are not cached for the nicked player
+    assert tags_uuids == ["uuid-for-Nick1"]
+    assert completed_queue.qsize() == 1
+    assert controller.player_cache.get_cached_player("Nick1") == NickedPlayer("Nick1")
+
+
+def test_get_and_cache_stats_different_uuid() -> None:
+    user = test_get_stats.users["UnnickedPlayer"]
+    assert user.player is not None
+
+    # The provider returns a player with another uuid than the one we requested
+    player = replace(user.player, uuid="other-uuid").update_winstreaks(
+        overall=10, solo=10, doubles=10, threes=10, fours=10, winstreaks_accurate=True
+    )
+    tags_uuids: list[str] = []
+
+    def get_tags(uuid: str, user_id: str, urchin_api_key: str | None) -> Tags:
+        tags_uuids.append(uuid)
+        return Tags(cheating="none", sniping="none")
+
+    controller = create_controller(
+        account_provider=MockedAccountProvider(
+            get_account_by_username=lambda username: Account(
+                username=user.username, uuid=user.uuid
+            )
+        ),
+        player_provider=MockedPlayerProvider(get_player=lambda uuid, user_id: player),
+        tags_provider=MockedTagsProvider(get_tags=get_tags),
+    )
+
+    completed_queue = queue.Queue[str]()
+
+    get_and_cache_player(user.username, completed_queue, controller)
+
+    # The tags are requested again for the uuid of the player
+    assert sorted(tags_uuids) == sorted((user.uuid, "other-uuid"))
+    assert completed_queue.qsize() == 2
+    assert controller.player_cache.get_cached_player(user.username) == player.set_tags(
+        Tags(cheating="none", sniping="none")
+    )
+
+
 def test_update_settings_nothing() -> None:
     settings_file = no_close(io.StringIO())
     controller = create_controller(
@@ -1199,3 +1452,144 @@ def test_get_cached_player_or_enqueue_request(subtests: pytest.Subtests) -> None
             # Should not be requested
             with pytest.raises(queue.Empty):
                 controller.requested_stats_queue.get_nowait()
+
+    with subtests.test("Stale player"):
+        controller = create_controller()
+        cached_player = make_player(variant="player", username=username)
+        controller.player_cache.set_cached_player(
+            username, cached_player, genus=controller.player_cache.current_genus
+        )
+        controller.player_cache.clear_cache(short_term_only=True)
+        controller.requested_stats_queue.put("OtherPlayer")
+
+        result = get_cached_player_or_enqueue_request(
+            controller, username, allow_stale=True
+        )
+
+        assert result == replace(cached_player, stale=True)
+
+        # Should be refreshed after the regular requests
+        assert controller.requested_stats_queue.get_nowait() == "OtherPlayer"
+        assert controller.requested_stats_queue.get_nowait() == username
+        with pytest.raises(queue.Empty):
+            controller.requested_stats_queue.get_nowait()
+
+
+def test_get_cached_players_or_enqueue_requests() -> None:
+    controller = create_controller()
+    player_cache = controller.player_cache
+    known = make_player(variant="player", username="Known")
+    refreshed = make_player(variant="player", username="Refreshed")
+
+    player_cache.set_cached_player(
+        "Refreshed", refreshed, genus=player_cache.current_genus
+    )
+    player_cache.clear_cache(short_term_only=True)
+    player_cache.set_cached_player("Known", known, genus=player_cache.current_genus)
+
+    result = get_cached_players_or_enqueue_requests(
+        controller, ("Refreshed", "Missing1", "Known", "Missing2"), allow_stale=True
+    )
+
+    assert result == {
+        "Refreshed": replace(refreshed, stale=True),
+        "Missing1": PendingPlayer("Missing1"),
+        "Known": known,
+        "Missing2": PendingPlayer("Missing2"),
+    }
+
+    # Requests first, then the refresh
+    assert [controller.requested_stats_queue.get_nowait() for _ in range(3)] == [
+        "Missing1",
+        "Missing2",
+        "Refreshed",
+    ]
+    with pytest.raises(queue.Empty):
+        controller.requested_stats_queue.get_nowait()
+
+    # Nothing is requested twice
+    get_cached_players_or_enqueue_requests(
+        controller, ("Refreshed", "Missing1"), allow_stale=True
+    )
+    with pytest.raises(queue.Empty):
+        controller.requested_stats_queue.get_nowait()
+
+
+def test_prefetch_players() -> None:
+    controller = create_controller()
+    cached_player = make_player(variant="player", username="Cached")
+    controller.player_cache.set_cached_player(
+        "Cached", cached_player, genus=controller.player_cache.current_genus
+    )
+    # Only in the long term cache
+    controller.player_cache.clear_cache(short_term_only=True)
+    controller.requested_stats_queue.put("LobbyPlayer")
+
+    prefetch_players(controller, ("Player1", "Cached"))
+
+    # Prefetches are requested after the lobby
+    assert controller.requested_stats_queue.get_nowait() == "LobbyPlayer"
+    assert controller.requested_stats_queue.get_nowait() == "Player1"
+    with pytest.raises(queue.Empty):
+        controller.requested_stats_queue.get_nowait()
+
+    assert controller.player_cache.get_cached_player(
+        "Player1", long_term=True
+    ) == PendingPlayer("Player1")
+
+
+def test_handle_stats_request() -> None:
+    controller = create_controller(
+        state=create_state(
+            party_members={OWN_USERNAME, "Teammate"},
+            lobby_players={OWN_USERNAME, "Enemy"},
+        )
+    )
+    for username in ("Enemy", "Teammate", OWN_USERNAME, "Left"):
+        controller.player_cache.get_cached_player_or_set_pending(username)
+
+    fetched: list[str] = []
+
+    def get_and_cache_player(
+        username: str, completed_queue: queue.Queue[str], controller: OverlayController
+    ) -> None:
+        fetched.append(username)
+
+    with unittest.mock.patch(
+        "prism.overlay.behaviour.get_and_cache_player", get_and_cache_player
+    ):
+        for username in ("Enemy", "Teammate", OWN_USERNAME, "Left"):
+            handle_stats_request(controller, username)
+
+    assert fetched == ["Enemy", "Teammate", OWN_USERNAME]
+
+    # Players that left are uncached, so they are requested again if they return
+    assert controller.player_cache.get_cached_player("Left") is None
+
+
+@pytest.mark.parametrize("hide_dead_players", (True, False))
+def test_get_request_priority(hide_dead_players: bool) -> None:
+    controller = create_controller(
+        state=create_state(
+            party_members={OWN_USERNAME, "Teammate", "Prefetch"},
+            lobby_players={OWN_USERNAME, "Teammate", "Enemy", "Dead"},
+            alive_players={OWN_USERNAME, "Teammate", "Enemy"},
+        ),
+        settings=make_settings(hide_dead_players=hide_dead_players),
+    )
+
+    def priority(username: str, refresh: bool = False) -> RequestPriority:
+        return get_request_priority(controller, username, refresh)
+
+    assert priority("Enemy") == RequestPriority.ENEMY
+    assert priority("Enemy", refresh=True) == RequestPriority.REFRESH
+    # Handling requests for players that left only drops them
+    assert priority("Left") == RequestPriority.ENEMY
+    assert priority("Teammate") == RequestPriority.TEAMMATE
+    assert priority(OWN_USERNAME) == RequestPriority.OWN
+    assert priority("Prefetch", refresh=True) == RequestPriority.PREFETCH
+
+    # Dead players are not shown when hiding dead players
+    assert priority("Dead") == (
+        RequestPriority.REFRESH if hide_dead_players else RequestPriority.ENEMY
+    )
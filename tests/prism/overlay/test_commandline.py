@@ -1,3 +1,4 @@
+import argparse
 import logging
 
 import pytest
@@ -13,6 +14,9 @@ def make_options(
     loglevel: int = logging.INFO,
     test_ssl: bool = False,
     test: bool = False,
+    replay: str | None = None,
+    speed: float = 1.0,
+    metrics_interval: float | None = None,
 ) -> Options:
     """Construct an Options instance from its components"""
     return Options(
@@ -21,6 +25,9 @@ def make_options(
         loglevel=loglevel,
         test_ssl=test_ssl,
         test=test,
+        replay_path=resolve_path(replay) if replay is not None else None,
+        replay_speed=speed,
+        metrics_interval=metrics_interval,
     )
 
 
@@ -44,6 +51,13 @@ test_cases: tuple[tuple[str, Options], ...] = (
     ("--test-ssl", make_options(test_ssl=True)),
     # Test
     ("--test", make_options(test=True)),
+    # Replay
+    ("--replay latest.log", make_options(replay="latest.log")),
+    ("--replay latest.log --speed 10", make_options(replay="latest.log", speed=10)),
+    ("--speed 0.5", make_options(speed=0.5)),
+    # Metrics
+    ("--metrics-interval 60", make_options(metrics_interval=60)),
+    # Stats engine
     # Multiple arguments
     (
         "-l somelogfile --settings s.toml",
@@ -80,3 +94,12 @@ def test_get_options(commandline: str, result: Options) -> None:
         )
         == result
     )
+
+
+@pytest.mark.parametrize("speed", ("0", "-1", "fast"))
+def test_get_options_invalid_speed(speed: str) -> None:
+    with pytest.raises(argparse.ArgumentError):
+        get_options(
+            default_settings_path=resolve_path(DEFAULT_SETTINGS),
+            args=["--speed", speed],
+        )
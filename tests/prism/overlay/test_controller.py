@@ -1,3 +1,5 @@
+from collections.abc import Sequence
+
 from prism.errors import APIError, APIKeyError, APIThrottleError, PlayerNotFoundError
 from prism.overlay.controller import ERROR_DURING_PROCESSING
 from prism.player import (
@@ -11,14 +13,29 @@ from prism.player import (
 from prism.ssl_errors import MissingLocalIssuerSSLError
 from tests.prism.overlay.utils import (
     MockedAccountProvider,
+    MockedBatchPlayerProvider,
     MockedPlayerProvider,
     MockedTagsProvider,
     MockedWinstreakProvider,
+    assert_not_called,
     create_controller,
+    make_player,
     make_settings,
 )
 
 
+def test_overlay_controller_seconds_until_unblocked() -> None:
+    controller = create_controller(
+        player_provider=MockedPlayerProvider(
+            assert_not_called, seconds_until_unblocked=2
+        ),
+        winstreak_provider=MockedWinstreakProvider(
+            assert_not_called, seconds_until_unblocked=3
+        ),
+    )
+    assert controller.seconds_until_unblocked == 3
+
+
 def test_overlay_controller_get_uuid() -> None:
     error: Exception | None = None
     returned_uuid: str = ""
@@ -60,6 +77,14 @@ def test_overlay_controller_get_uuid() -> None:
 
     assert not controller.missing_local_issuer_certificate
 
+    # Every request is timed
+    assert controller.get_metrics().latencies["account"].count == 4
+
+    # Successful lookups are cached
+    assert controller.account_cache.get_uuid("UserName") == returned_uuid
+    error = APIError()
+    assert controller.get_uuid("username") == returned_uuid
+
 
 def test_overlay_controller_get_player() -> None:
     error: Exception | None = None
@@ -117,6 +142,30 @@ def test_overlay_controller_get_player() -> None:
     assert controller.get_player("uuid") == returned_player
 
 
+def test_overlay_controller_get_player_batched() -> None:
+    error: Exception | None = None
+    returned_player = make_player(uuid="uuid")
+
+    def mock_get_players(uuids: Sequence[str], user_id: str) -> dict[str, KnownPlayer]:
+        assert user_id == "1234"
+
+        if error:
+            raise error
+
+        return {uuid: returned_player for uuid in uuids if uuid == "uuid"}
+
+    controller = create_controller(
+        settings=make_settings(user_id="1234"),
+        player_provider=MockedBatchPlayerProvider(get_players=mock_get_players),
+    )
+
+    assert controller.get_player("uuid") == returned_player
+    assert controller.get_player("missing") is None
+
+    error = APIError()
+    assert controller.get_player("uuid") is ERROR_DURING_PROCESSING
+
+
 def test_overlay_controller_get_tags() -> None:
     error: Exception | None = None
     returned_tags = Tags(sniping="medium", cheating="none")
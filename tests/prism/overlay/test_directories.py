@@ -27,25 +27,31 @@ def clean_dirs_env(monkeypatch: pytest.MonkeyPatch) -> None:
 
 @pytest.mark.skipif(sys.platform != "linux", reason="Linux-specific paths")
 def test_linux_paths(clean_dirs_env: None) -> None:
+    cache_dir = Path("/home/test/.cache/prism_overlay")
     config_dir = Path("/home/test/.config/prism_overlay")
     assert get_dirs() == PrismDirs(
-        cache_dir=Path("/home/test/.cache/prism_overlay"),
-        log_dir=Path("/home/test/.cache/prism_overlay/log"),
+        cache_dir=cache_dir,
+        log_dir=cache_dir / "log",
         config_dir=config_dir,
         settings_path=config_dir / "settings.toml",
         logfile_cache_path=config_dir / "known_logfiles.toml",
+        log_checkpoint_path=cache_dir / "log_checkpoint.toml",
+        player_store_path=cache_dir / "players.sqlite",
     )
 
 
 @pytest.mark.skipif(sys.platform != "darwin", reason="macOS-specific paths")
 def test_macos_paths(clean_dirs_env: None) -> None:
+    cache_dir = Path("/home/test/Library/Caches/prism_overlay")
     config_dir = Path("/home/test/Library/Application Support/prism_overlay")
     assert get_dirs() == PrismDirs(
-        cache_dir=Path("/home/test/Library/Caches/prism_overlay"),
+        cache_dir=cache_dir,
         log_dir=Path("/home/test/Library/Logs/prism_overlay"),
         config_dir=config_dir,
         settings_path=config_dir / "settings.toml",
         logfile_cache_path=config_dir / "known_logfiles.toml",
+        log_checkpoint_path=cache_dir / "log_checkpoint.toml",
+        player_store_path=cache_dir / "players.sqlite",
     )
 
 
@@ -58,6 +64,8 @@ def test_windows_paths() -> None:
         config_dir=base,
         settings_path=base / "settings.toml",
         logfile_cache_path=base / "known_logfiles.toml",
+        log_checkpoint_path=base / "Cache" / "log_checkpoint.toml",
+        player_store_path=base / "Cache" / "players.sqlite",
     )
 
 
@@ -1,12 +1,23 @@
 import datetime
+import io
 import unittest.mock
-from collections.abc import Sequence
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Literal, cast
 
 import pytest
 
-from prism.overlay.file_utils import watch_file_with_reopen
+from prism.overlay.file_utils import (
+    ChunkedLineReader,
+    FileEvent,
+    FileProgress,
+    ReversedLineReader,
+    watch_file_batches_with_events,
+    watch_file_batches_with_reopen,
+    watch_file_with_reopen,
+    watch_files_batches,
+)
 from tests.mock_utils import (
     EndFileTest,
     Line,
@@ -31,6 +42,7 @@ def get_seen_lines(
     start: datetime.datetime = datetime.datetime(2022, 1, 1, 12),
     reopen_timeout: int = REOPEN_TIMEOUT,
     poll_timeout: int = POLL_TIMEOUT,
+    markers: Sequence[bytes] | None = None,
 ) -> tuple[list[str | None], list[float], MockedPath, MockedFile, MockedTime]:
     mocked_path, mocked_file, mocked_time = create_mocked_file(lines, amt_opens, start)
 
@@ -50,6 +62,7 @@ def get_seen_lines(
                 blocking=blocking,
                 reopen_timeout=reopen_timeout,
                 poll_timeout=poll_timeout,
+                markers=markers,
             ):
                 seen.append(line)
                 timestamps.append(mocked_time.time.monotonic())
@@ -64,16 +77,16 @@ def test_mocked_file() -> None:
     )
 
     with mocked_path.open() as f:
-        assert f.readline() == "0\n"
-        assert f.readline() == ""
-        assert f.readline() == ""
+        assert f.readline() == b"0\n"
+        assert f.readline() == b""
+        assert f.readline() == b""
         mocked_time.time.sleep(1)
-        assert f.readline() == ""
+        assert f.readline() == b""
         mocked_time.time.sleep(1)
-        assert f.readline() == ""
+        assert f.readline() == b""
 
     with mocked_path.open() as f:
-        assert f.readline() == "2\n"
+        assert f.readline() == b"2\n"
 
     mocked_path, mocked_file, mocked_time = create_mocked_file(
         [Line(0, "0"), Line(1, None), Line(2, "2")], amt_opens=2
@@ -82,11 +95,11 @@ def test_mocked_file() -> None:
     mocked_time.time.sleep(2)
 
     with mocked_path.open() as f:
-        assert f.readline() == "2\n"
-        assert f.readline() == ""
+        assert f.readline() == b"2\n"
+        assert f.readline() == b""
 
     with mocked_path.open() as f:
-        assert f.readline() == "2\n"
+        assert f.readline() == b"2\n"
 
 
 def test_simple_reads() -> None:
@@ -108,14 +121,14 @@ def test_simple_reads_with_reopen() -> None:
 
 def test_read_after_clear() -> None:
     seen, timestamps, mocked_path, mocked_file, mocked_time = get_seen_lines(
-        [Line(t, "text") for t in range(5)]
+        [Line(t, "some longer text") for t in range(5)]
         + [Line(5, None)]
         + [Line(t + 5, f"new text{t}") for t in range(4)],
         amt_opens=2,
         start_at=0,
         blocking=True,
     )
-    assert seen == ["text\n"] * 5 + [f"new text{t}\n" for t in range(4)]
+    assert seen == ["some longer text\n"] * 5 + [f"new text{t}\n" for t in range(4)]
     assert timestamps == [0, 1, 2, 3, 4, 14, 14, 14, 14]
     assert [call[0] for call in mocked_path.calls] == [0, 14]
 
@@ -181,8 +194,436 @@ def test_start_at() -> None:
     seen, timestamps, mocked_path, mocked_file, mocked_time = get_seen_lines(
         [Line(0, "Old text")] * 10 + [Line(1, "New text")] * 10,
         amt_opens=1,
-        start_at=10,
+        start_at=len(b"Old text\n") * 10,
         blocking=True,
     )
     assert seen == ["New text\n"] * 10
     assert timestamps == [1] * 10
+
+
+def test_watch_file_batches_with_reopen() -> None:
+    mocked_path, mocked_file, mocked_time = create_mocked_file(
+        [Line(0, "first"), Line(0, "second"), Line(1, "noise"), Line(2, "[CHAT] x")],
+        amt_opens=1,
+    )
+
+    seen: list[tuple[list[str], int]] = []
+    progress = FileProgress()
+    with (
+        unittest.mock.patch("prism.overlay.file_utils.time", mocked_time.time),
+        unittest.mock.patch("prism.overlay.file_utils.datetime", mocked_time.datetime),
+        unittest.mock.patch("prism.overlay.file_utils.date", mocked_time.date),
+        unittest.mock.patch("prism.overlay.file_utils.os", MockedOsModule),
+    ):
+        with pytest.raises(EndFileTest):
+            for batch in watch_file_batches_with_reopen(
+                cast(Path, mocked_path),
+                start_at=0,
+                blocking=True,
+                reopen_timeout=REOPEN_TIMEOUT,
+                poll_timeout=POLL_TIMEOUT,
+                markers=(b"first", b"second", b"[CHAT] "),
+                progress=progress,
+            ):
+                seen.append((batch, progress.position))
+
+    # The lines written at the same time are read in one batch
+    # Reads where all lines were filtered out are not yielded
+    # The progress is at the end of the batch when it is yielded
+    assert seen == [
+        (["first\n", "second\n"], len("first\nsecond\n")),
+        (["[CHAT] x\n"], len("first\nsecond\nnoise\n[CHAT] x\n")),
+    ]
+    assert progress.ino == 0
+
+
+def test_markers() -> None:
+    seen, timestamps, mocked_path, mocked_file, mocked_time = get_seen_lines(
+        [Line(0, "noise"), Line(0, "[CHAT] first"), Line(5, "noise")]
+        + [Line(12, "[CHAT] after")],
+        amt_opens=2,
+        start_at=0,
+        blocking=True,
+        markers=(b"[CHAT] ",),
+    )
+    assert seen == ["[CHAT] first\n", "[CHAT] after\n"]
+    assert timestamps == [0, 12]
+    # Reading noise counts as activity, delaying the reopen
+    assert [call[0] for call in mocked_path.calls] == [0, 22]
+
+
+@pytest.mark.parametrize("block_size", (1, 2, 3, 7, 64 * 1024))
+@pytest.mark.parametrize(
+    "content, lines",
+    (
+        (b"", []),
+        (b"\n", [""]),
+        (b"one line", ["one line"]),
+        (b"one line\n", ["one line"]),
+        (b"first\nsecond\nthird\n", ["third", "second", "first"]),
+        (b"first\n\nthird", ["third", "", "first"]),
+        (b"windows\r\nline endings\r\n", ["line endings", "windows"]),
+        ("å æ ø\n✫ ✪\n".encode(), ["✫ ✪", "å æ ø"]),
+        (b"invalid \xff utf8\n", ["invalid � utf8"]),
+    ),
+)
+def test_reversed_line_reader(
+    block_size: int, content: bytes, lines: list[str]
+) -> None:
+    reader = ReversedLineReader(
+        io.BytesIO(content), end=len(content), block_size=block_size
+    )
+    assert list(reader) == lines
+
+
+@pytest.mark.parametrize("block_size", (1, 2, 5, 64 * 1024))
+def test_reversed_line_reader_filter(block_size: int) -> None:
+    content = b"a marker\nb\nc\nd marker\ne\nmark\nf\n"
+    reader = ReversedLineReader(
+        io.BytesIO(content), end=len(content), block_size=block_size
+    )
+    iterator = iter(reader)
+
+    assert next(iterator) == "f"
+    assert list(reader.filter((b"marker", b"nomatch"))) == ["d marker", "a marker"]
+    assert list(reader) == []
+
+    reader = ReversedLineReader(
+        io.BytesIO(content), end=len(content), block_size=block_size
+    )
+    assert list(reader.filter((b"b",))) == ["b"]
+
+
+def test_reversed_line_reader_end() -> None:
+    content = b"first\nsecond\nthird\n"
+    reader = ReversedLineReader(io.BytesIO(content), end=len(b"first\nsec"))
+    assert list(reader) == ["sec", "first"]
+
+
+class CountingBytesIO(io.BytesIO):
+    """BytesIO that keeps track of the first position read"""
+
+    lowest_read_position: int | None = None
+
+    def read(self, size: int | None = -1, /) -> bytes:
+        position = self.tell()
+        if self.lowest_read_position is None or position < self.lowest_read_position:
+            self.lowest_read_position = position
+        return super().read(size)
+
+
+def test_reversed_line_reader_reads_lazily() -> None:
+    content = b"x" * 1000 + b"\nlast line\n"
+    file = CountingBytesIO(content)
+    reader = ReversedLineReader(file, end=len(content), block_size=16)
+
+    assert next(iter(reader)) == "last line"
+    assert file.lowest_read_position is not None
+    assert file.lowest_read_position >= len(content) - 32
+
+
+@dataclass
+class ScriptedFileEvents:
+    """FileEventSource that performs a file operation for each call to wait"""
+
+    steps: list[tuple[Callable[[], object], frozenset[FileEvent]]]
+    watched: list[Path] = field(default_factory=list)
+
+    def watch(self, path: Path) -> None:
+        self.watched.append(path)
+
+    def wait(self) -> frozenset[FileEvent]:
+        if not self.steps:
+            raise EndFileTest
+
+        action, events = self.steps.pop(0)
+        action()
+        return events
+
+
+def append_to(path: Path, text: str) -> Callable[[], object]:
+    def append() -> None:
+        with path.open("a", encoding="utf8") as f:
+            f.write(text)
+
+    return append
+
+
+def overwrite(path: Path, text: str) -> Callable[[], object]:
+    return lambda: path.write_text(text, encoding="utf8")
+
+
+MODIFIED = frozenset({FileEvent.MODIFIED})
+REPLACED = frozenset({FileEvent.REPLACED})
+
+
+def read_with_events(
+    path: Path,
+    start_at: int,
+    file_events: ScriptedFileEvents,
+    markers: Sequence[bytes] | None = None,
+) -> list[list[str]]:
+    seen: list[list[str]] = []
+    with pytest.raises(EndFileTest):
+        for batch in watch_file_batches_with_events(
+            path, start_at=start_at, file_events=file_events, markers=markers
+        ):
+            seen.append(batch)
+    return seen
+
+
+def test_watch_file_batches_with_events_modified(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    path.write_text("old\nfirst\n", encoding="utf8")
+
+    file_events = ScriptedFileEvents(
+        steps=[
+            (append_to(path, "second\nthird\n"), MODIFIED),
+            (lambda: None, MODIFIED),
+            (append_to(path, "fourth\n"), MODIFIED),
+        ]
+    )
+
+    seen = read_with_events(path, len("old\n"), file_events)
+
+    assert seen == [["first\n"], ["second\n", "third\n"], ["fourth\n"]]
+    assert file_events.watched == [path]
+
+
+def test_watch_file_batches_with_events_markers(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    path.write_text("noise\n[CHAT] first\n", encoding="utf8")
+
+    file_events = ScriptedFileEvents(
+        steps=[
+            (append_to(path, "more noise\n[CHAT] sec"), MODIFIED),
+            (append_to(path, "ond\n"), MODIFIED),
+        ]
+    )
+
+    seen = read_with_events(path, 0, file_events, markers=(b"[CHAT] ",))
+
+    assert seen == [["[CHAT] first\n"], ["[CHAT] second\n"]]
+
+
+def test_watch_file_batches_with_events_progress(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    path.write_text("first\n", encoding="utf8")
+
+    file_events = ScriptedFileEvents(steps=[(append_to(path, "second\nthi"), MODIFIED)])
+
+    progress = FileProgress()
+    seen: list[tuple[list[str], int]] = []
+    with pytest.raises(EndFileTest):
+        for batch in watch_file_batches_with_events(
+            path, start_at=0, file_events=file_events, progress=progress
+        ):
+            seen.append((batch, progress.position))
+
+    # The incomplete line is not included in the progress
+    assert seen == [(["first\n"], 6), (["second\n"], 13)]
+    assert progress.ino == path.stat().st_ino
+
+
+def test_watch_file_batches_with_events_truncated(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    path.write_text("some old text\n", encoding="utf8")
+
+    file_events = ScriptedFileEvents(
+        steps=[
+            (overwrite(path, "new\n"), MODIFIED),
+            (append_to(path, "more\n"), MODIFIED),
+        ]
+    )
+
+    seen = read_with_events(path, 0, file_events)
+
+    assert seen == [["some old text\n"], ["new\n"], ["more\n"]]
+    assert file_events.watched == [path, path]
+
+
+def test_watch_file_batches_with_events_replaced(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    path.write_text("first\n", encoding="utf8")
+
+    file_events = ScriptedFileEvents(
+        steps=[(append_to(path, "second\n"), REPLACED | MODIFIED)]
+    )
+
+    seen = read_with_events(path, 0, file_events)
+
+    assert seen == [["first\n"], ["second\n"]]
+    assert file_events.watched == [path, path]
+
+
+def test_watch_file_batches_with_events_missing_file(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+
+    file_events = ScriptedFileEvents(steps=[(overwrite(path, "first\n"), REPLACED)])
+
+    seen = read_with_events(path, 0, file_events)
+
+    assert seen == [["first\n"]]
+    assert file_events.watched == [path, path]
+
+
+def test_watch_files_batches(tmp_path: Path) -> None:
+    first = tmp_path / "first.log"
+    second = tmp_path / "second.log"
+    missing = tmp_path / "missing.log"
+    first.write_text("[CHAT] old\n", encoding="utf8")
+    second.write_text("", encoding="utf8")
+
+    sleeps: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        if seconds > 0:
+            # None of the files had new lines
+            sleeps.append(seconds)
+            append_to(second, "[CHAT] after sleeping\n")()
+
+    progress = {path: FileProgress() for path in (first, second, missing)}
+    watcher = iter(
+        watch_files_batches(
+            {first: len("[CHAT] old\n"), second: 0, missing: 0},
+            poll_timeout=5,
+            markers=(b"[CHAT] ",),
+            progress=progress,
+        )
+    )
+
+    append_to(first, "[CHAT] a\nnoise\n")()
+    append_to(second, "[CHAT] b\n[CHAT] c\n")()
+
+    with unittest.mock.patch("prism.overlay.file_utils.time.sleep", sleep):
+        assert next(watcher) == (first, ["[CHAT] a\n"])
+        assert progress[first].position == len("[CHAT] old\n[CHAT] a\nnoise\n")
+
+        assert next(watcher) == (second, ["[CHAT] b\n", "[CHAT] c\n"])
+        assert progress[second].position == len("[CHAT] b\n[CHAT] c\n")
+
+        # The missing file is retried later, and we sleep when nothing is written
+        assert next(watcher) == (second, ["[CHAT] after sleeping\n"])
+        assert sleeps == [5]
+
+        append_to(first, "[CHAT] d\n")()
+        assert next(watcher) == (first, ["[CHAT] d\n"])
+
+    assert progress[missing] == FileProgress()
+
+
+def test_watch_files_batches_rotated(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    path.write_text("[CHAT] old\n", encoding="utf8")
+
+    now = 0.0
+
+    def sleep(seconds: float) -> None:
+        nonlocal now
+        now += seconds
+        if now == 10:
+            path.write_text("[CHAT] new\n", encoding="utf8")
+
+    progress = {path: FileProgress()}
+
+    with (
+        unittest.mock.patch("prism.overlay.file_utils.time.monotonic", lambda: now),
+        unittest.mock.patch("prism.overlay.file_utils.time.sleep", sleep),
+    ):
+        watcher = iter(
+            watch_files_batches(
+                {path: len("[CHAT] old\n")},
+                reopen_timeout=4,
+                poll_timeout=1,
+                markers=(b"[CHAT] ",),
+                progress=progress,
+            )
+        )
+
+        append_to(path, "[CHAT] a\n")()
+        assert next(watcher) == (path, ["[CHAT] a\n"])
+        old_ino = progress[path].ino
+
+        # The logfile is rotated, and we reopen it before the new one is created
+        path.rename(tmp_path / "old.log")
+
+        # The new logfile is read from the start once it exists
+        assert next(watcher) == (path, ["[CHAT] new\n"])
+
+    # Reopened at 4s, then retried after backing off for 1s, 2s and 4s
+    assert now == 11
+    assert progress[path].position == len("[CHAT] new\n")
+    assert progress[path].ino != old_ino
+
+
+@pytest.mark.parametrize("chunk_size", (1, 2, 3, 7, 64 * 1024))
+@pytest.mark.parametrize(
+    "content, lines, position",
+    (
+        (b"", None, 0),
+        (b"\n", ["\n"], 1),
+        (b"incomplete", [], 0),
+        (b"one line\nincomplete", ["one line\n"], 9),
+        (b"first\nsecond\n\nfourth\n", ["first\n", "second\n", "\n", "fourth\n"], 21),
+        (b"windows\r\nline endings\r\n", ["windows\n", "line endings\n"], 23),
+        ("å æ ø\n✫ ✪\n".encode(), ["å æ ø\n", "✫ ✪\n"], 17),
+        (b"invalid \xff utf8\n", ["invalid � utf8\n"], 15),
+    ),
+)
+def test_chunked_line_reader(
+    chunk_size: int, content: bytes, lines: list[str] | None, position: int
+) -> None:
+    reader = ChunkedLineReader(io.BytesIO(content), chunk_size=chunk_size)
+
+    seen: list[str] | None = None
+    while (new_lines := reader.read_lines()) is not None:
+        seen = (seen or []) + new_lines
+
+    assert seen == lines
+    assert reader.position == position
+
+
+@pytest.mark.parametrize("chunk_size", (1, 2, 5, 64 * 1024))
+def test_chunked_line_reader_markers(chunk_size: int) -> None:
+    content = b"a marker\nb\nc marker marker\nd\ne mark\nmarker f\r\ng marker"
+    reader = ChunkedLineReader(
+        io.BytesIO(content), markers=(b"marker", b"nomatch"), chunk_size=chunk_size
+    )
+
+    seen: list[str] = []
+    while (new_lines := reader.read_lines()) is not None:
+        seen.extend(new_lines)
+
+    assert seen == ["a marker\n", "c marker marker\n", "marker f\n"]
+    assert reader.position == len(content) - len(b"g marker")
+
+
+def test_chunked_line_reader_read_available_lines() -> None:
+    content = b"first\nsecond\nthird\nincomplete"
+    reader = ChunkedLineReader(io.BytesIO(content), chunk_size=4)
+
+    assert reader.read_available_lines() == ["first\n", "second\n", "third\n"]
+    assert reader.read_available_lines() is None
+    assert reader.position == len(b"first\nsecond\nthird\n")
+
+
+def test_chunked_line_reader_follows_file() -> None:
+    file = io.BytesIO()
+    reader = ChunkedLineReader(file, markers=(b"[CHAT] ",))
+
+    def write(data: bytes) -> None:
+        position = file.tell()
+        file.seek(0, io.SEEK_END)
+        file.write(data)
+        file.seek(position)
+
+    assert reader.read_lines() is None
+
+    write(b"noise\n[CHAT] Hel")
+    assert reader.read_lines() == []
+    assert reader.read_lines() is None
+    assert reader.position == len(b"noise\n")
+
+    write(b"lo\n")
+    assert reader.read_lines() == ["[CHAT] Hello\n"]
+    assert reader.read_lines() is None
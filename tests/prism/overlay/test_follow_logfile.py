@@ -0,0 +1,84 @@
+import os
+from pathlib import Path
+
+from prism.overlay.file_utils import FileProgress
+from prism.overlay.follow_logfile import follow_active_logfile, switch_logfile
+from prism.overlay.process_event import process_logline_batches
+from prism.overlay.state import OverlayState
+from tests.prism.overlay.utils import create_controller, create_state
+
+INFO = "[12:00:00] [Client thread/INFO]: "
+CHAT = f"{INFO}[CHAT] "
+
+
+def append_lines(path: Path, *lines: str) -> None:
+    with path.open("a", encoding="utf8") as f:
+        f.write("".join(f"{line}\n" for line in lines))
+
+
+def test_follow_active_logfile(tmp_path: Path) -> None:
+    lunar = tmp_path / "lunar.log"
+    vanilla = tmp_path / "vanilla.log"
+    lunar.write_text("", encoding="utf8")
+    vanilla.write_text("", encoding="utf8")
+    append_lines(lunar, f"{INFO}Setting user: Me")
+    append_lines(vanilla, f"{INFO}Setting user: Alt", f"{CHAT}ONLINE: Alt, Player1")
+
+    controller = create_controller(state=create_state(own_username="Me"))
+    progress = FileProgress(position=lunar.stat().st_size, path=lunar)
+    follower = iter(
+        follow_active_logfile(
+            controller,
+            {lunar: lunar.stat().st_size, vanilla: vanilla.stat().st_size},
+            active=lunar,
+            progress=progress,
+            poll_timeout=0,
+        )
+    )
+
+    # Lines in the active logfile are passed through
+    append_lines(lunar, f"{CHAT}ONLINE: Me, Player2")
+    process_logline_batches([next(follower)], controller)
+    assert controller.state.own_username == "Me"
+    assert controller.state.lobby_players == {"Me", "Player2"}
+    assert progress == FileProgress(
+        position=lunar.stat().st_size, ino=lunar.stat().st_ino, path=lunar
+    )
+
+    # Chat in another logfile switches to it, restoring its state first
+    controller.redraw_event.clear()
+    append_lines(vanilla, f"{CHAT}ONLINE: Alt, Player3")
+    batch = next(follower)
+    assert batch == [f"{CHAT}ONLINE: Alt, Player3\n"]
+    assert controller.state.own_username == "Alt"
+    assert controller.state.lobby_players == {"Alt", "Player1"}
+    assert controller.redraw_event.is_set()
+    assert progress == FileProgress(
+        position=vanilla.stat().st_size, ino=vanilla.stat().st_ino, path=vanilla
+    )
+
+    process_logline_batches([batch], controller)
+    assert controller.state.lobby_players == {"Alt", "Player3"}
+
+    # A relaunch of the first client replaces its logfile
+    replacement = tmp_path / "lunar.log.new"
+    append_lines(replacement, f"{INFO}Setting user: Me")
+    os.replace(replacement, lunar)
+
+    # Nothing before the batch in the new file
+    batch = next(follower)
+    assert batch == [f"{INFO}Setting user: Me\n"]
+    assert controller.state == OverlayState()
+    assert progress.path == lunar
+
+    process_logline_batches([batch], controller)
+    assert controller.state.own_username == "Me"
+
+
+def test_switch_logfile_missing(tmp_path: Path) -> None:
+    controller = create_controller(state=create_state(own_username="Me"))
+
+    switch_logfile(controller, tmp_path / "missing.log", FileProgress(position=10))
+
+    assert controller.state == OverlayState()
+    assert controller.redraw_event.is_set()
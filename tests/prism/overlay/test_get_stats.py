@@ -172,6 +172,23 @@ def test_fetch_bedwars_stats(
     )
 
 
+def test_fetch_bedwars_stats_on_uuid() -> None:
+    nicked_player = users["NickedPlayer"].player
+    assert nicked_player is not None  # For typing
+
+    controller = make_scenario_controller(users["NickedPlayer"], users["AmazingNick"])
+    uuids: list[str] = []
+
+    player = fetch_bedwars_stats(
+        username="AmazingNick", controller=controller, on_uuid=uuids.append
+    )
+
+    assert player == replace(nicked_player, nick="AmazingNick")
+
+    # Called with the uuid of the account, and then the uuid of the denick
+    assert uuids == [users["AmazingNick"].uuid, users["NickedPlayer"].uuid]
+
+
 def test_fetch_bedwars_stats_wrong_displayname() -> None:
     wrong_user = User(
         uuid="fe3d80923dcf4147a35921f6b9fc460f",
@@ -194,6 +211,9 @@ def test_fetch_bedwars_stats_wrong_displayname() -> None:
 
     assert fetch_bedwars_stats("Summer173", controller) == NickedPlayer("Summer173")
 
+    # The cached uuid for the username is discarded
+    assert controller.account_cache.get_uuid("Summer173") is None
+
 
 def test_fetch_bedwars_stats_weird(ares_playerdata: Mapping[str, object]) -> None:
     ares = User(
@@ -335,3 +355,58 @@ def test_fetch_bedwars_stats_error_during_playerdata() -> None:
     )
 
     assert fetch_bedwars_stats("someone", controller) == UnknownPlayer("someone")
+
+
+def test_get_and_cache_stats_shared_uuid() -> None:
+    user = users["NickedPlayer"]
+    assert user.player is not None
+    assert user.nick is not None
+
+    fetched: list[str] = []
+
+    def get_account_by_username(username: str) -> Account:
+        if username != user.username:
+            raise PlayerNotFoundError("Player not found")
+        return Account(uuid=user.uuid, username=user.username)
+
+    def get_player(uuid: str, user_id: str) -> KnownPlayer:
+        assert user.player is not None
+        fetched.append(uuid)
+        return user.player
+
+    controller = create_controller(
+        account_provider=MockedAccountProvider(
+            get_account_by_username=get_account_by_username
+        ),
+        player_provider=MockedPlayerProvider(get_player=get_player),
+        nick_database=NickDatabase([{user.nick: user.uuid}]),
+    )
+
+    assert get_and_cache_stats(user.username, controller) == user.player
+
+    # The denicked player is already cached under their username
+    assert get_and_cache_stats(user.nick, controller) == replace(
+        user.player, nick=user.nick
+    )
+    assert fetched == [user.uuid]
+
+
+def test_get_and_cache_stats_nicked() -> None:
+    lookups: list[str] = []
+
+    def get_account_by_username(username: str) -> Account:
+        lookups.append(username)
+        raise PlayerNotFoundError("Player not found")
+
+    controller = create_controller(
+        account_provider=MockedAccountProvider(
+            get_account_by_username=get_account_by_username
+        ),
+    )
+
+    assert get_and_cache_stats("SomeNick", controller) == NickedPlayer("SomeNick")
+    controller.player_cache.clear_cache(short_term_only=True)
+
+    # The nick is not looked up again in the next game
+    assert get_and_cache_stats("SomeNick", controller) == NickedPlayer("SomeNick")
+    assert lookups == ["SomeNick"]
@@ -0,0 +1,280 @@
+import unittest.mock
+from collections.abc import Iterable, Sequence
+from pathlib import Path
+
+import pytest
+
+from prism.overlay.file_utils import FileProgress
+from prism.overlay.log_checkpoint import (
+    LogCheckpoint,
+    checkpoint_logline_batches,
+    checkpoint_matches,
+    create_log_checkpoint,
+    hash_last_line,
+    read_log_checkpoint,
+    state_from_dict,
+    state_to_dict,
+    write_log_checkpoint,
+)
+from prism.overlay.state import OverlayState
+from tests.prism.overlay.utils import create_controller, create_state
+
+STATE = create_state(
+    party_members={"Me", "Teammate"},
+    lobby_players={"Me", "Teammate", "Player1"},
+    alive_players={"Me", "Teammate"},
+    in_queue=True,
+    own_username="Me",
+)
+
+
+@pytest.mark.parametrize(
+    "state",
+    (
+        STATE,
+        OverlayState(),
+        create_state(own_username=None, out_of_sync=True),
+    ),
+)
+def test_state_dict_roundtrip(state: OverlayState) -> None:
+    assert state_from_dict(state_to_dict(state)) == state
+
+
+def test_state_dict_drops_last_game_start() -> None:
+    state = create_state(last_game_start=123.0)
+    assert state_from_dict(state_to_dict(state)).last_game_start is None
+
+
+@pytest.mark.parametrize(
+    "source",
+    (
+        {},
+        {**state_to_dict(STATE), "own_username": 1},
+        {**state_to_dict(STATE), "party_members": "Me"},
+        {**state_to_dict(STATE), "lobby_players": ["Me", 1]},
+        {**state_to_dict(STATE), "in_queue": "yes"},
+    ),
+)
+def test_state_from_dict_invalid(source: dict[str, object]) -> None:
+    with pytest.raises(ValueError):
+        state_from_dict(source)
+
+
+def test_hash_last_line(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    path.write_bytes(b"first\nsecond\r\nthird\n")
+
+    with path.open("rb") as f:
+        assert hash_last_line(f, len(b"first\n")) == hash_last_line(f, 6)
+        assert hash_last_line(f, len(b"first\n")) != hash_last_line(f, 14)
+        assert hash_last_line(f, len(b"first\nsecond\r\n")) != hash_last_line(f, 20)
+        assert hash_last_line(f, 0) != hash_last_line(f, 6)
+
+
+def test_write_read_log_checkpoint(tmp_path: Path) -> None:
+    checkpoint_path = tmp_path / "log_checkpoint.toml"
+    checkpoint = LogCheckpoint(
+        logfile_path=tmp_path / "latest.log",
+        ino=1234,
+        position=5678,
+        last_line_hash="abcdef",
+        state=STATE,
+    )
+
+    write_log_checkpoint(checkpoint_path, checkpoint)
+    assert read_log_checkpoint(checkpoint_path) == checkpoint
+
+    # Overwrite the existing checkpoint
+    new_checkpoint = LogCheckpoint(
+        logfile_path=tmp_path / "latest.log",
+        ino=1234,
+        position=6000,
+        last_line_hash="fedcba",
+        state=OverlayState(),
+    )
+    write_log_checkpoint(checkpoint_path, new_checkpoint)
+    assert read_log_checkpoint(checkpoint_path) == new_checkpoint
+    assert list(tmp_path.iterdir()) == [checkpoint_path]
+
+
+@pytest.mark.parametrize(
+    "content",
+    (
+        "invalid toml [[",
+        "",
+        'logfile_path = "a"\nino = 1\nposition = -1\nlast_line_hash = "a"\n[state]\n',
+        'logfile_path = "a"\nino = 1\nposition = 1\nlast_line_hash = "a"\nstate = 1\n',
+        'logfile_path = "a"\nino = 1\nposition = 1\nlast_line_hash = "a"\n[state]\n',
+    ),
+)
+def test_read_log_checkpoint_invalid(tmp_path: Path, content: str) -> None:
+    checkpoint_path = tmp_path / "log_checkpoint.toml"
+    checkpoint_path.write_text(content)
+
+    assert read_log_checkpoint(checkpoint_path) is None
+
+
+def test_read_log_checkpoint_missing(tmp_path: Path) -> None:
+    assert read_log_checkpoint(tmp_path / "log_checkpoint.toml") is None
+
+
+def test_checkpoint_matches(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    path.write_bytes(b"first\nsecond\n")
+
+    checkpoint = create_log_checkpoint(
+        path, FileProgress(position=6, ino=path.stat().st_ino), STATE
+    )
+    assert checkpoint is not None
+    assert checkpoint.state is STATE
+
+    with path.open("ab") as f:
+        f.write(b"third\n")
+
+    with path.open("rb") as f:
+        assert checkpoint_matches(checkpoint, path, f)
+
+        assert not checkpoint_matches(checkpoint, tmp_path / "other.log", f)
+
+    # Same length, but different content
+    path.write_bytes(b"fir5t\nsecond\n")
+    with path.open("rb") as f:
+        assert not checkpoint_matches(checkpoint, path, f)
+
+    # Truncated
+    path.write_bytes(b"first")
+    with path.open("rb") as f:
+        assert not checkpoint_matches(checkpoint, path, f)
+
+    # Replaced
+    other_path = tmp_path / "new.log"
+    other_path.write_bytes(b"first\nsecond\n")
+    other_path.replace(path)
+    with path.open("rb") as f:
+        if path.stat().st_ino != checkpoint.ino:
+            assert not checkpoint_matches(checkpoint, path, f)
+
+
+def test_create_log_checkpoint_file_changed(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    path.write_bytes(b"first\n")
+
+    assert (
+        create_log_checkpoint(
+            path, FileProgress(position=6, ino=path.stat().st_ino + 1), STATE
+        )
+        is None
+    )
+
+    assert (
+        create_log_checkpoint(
+            tmp_path / "missing.log", FileProgress(position=6, ino=1), STATE
+        )
+        is None
+    )
+
+
+def test_checkpoint_logline_batches(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    checkpoint_path = tmp_path / "log_checkpoint.toml"
+    path.write_bytes(b"")
+
+    controller = create_controller(state=OverlayState())
+    progress = FileProgress(position=0, ino=path.stat().st_ino, path=path)
+    time = 0.0
+
+    def batches() -> Iterable[Sequence[str]]:
+        nonlocal time
+        for i in range(4):
+            line = f"line{i}\n"
+            with path.open("a") as f:
+                f.write(line)
+            progress.position += len(line)
+            time += 6
+            yield [line]
+
+    # The state after processing each batch
+    states = iter(("A", "B", "B", "C"))
+
+    seen: list[LogCheckpoint | None] = []
+    with unittest.mock.patch(
+        "prism.overlay.log_checkpoint.time.monotonic", lambda: time
+    ):
+        for batch in checkpoint_logline_batches(
+            batches(),
+            controller,
+            progress=progress,
+            checkpoint_path=checkpoint_path,
+            interval=10,
+        ):
+            seen.append(read_log_checkpoint(checkpoint_path))
+            own_username = next(states)
+            if own_username != controller.state.own_username:
+                controller.state = create_state(own_username=own_username)
+
+    # Not written before the interval has passed
+    assert seen[:2] == [None, None]
+
+    # Written after processing the second batch
+    with path.open("rb") as f:
+        assert seen[2] == LogCheckpoint(
+            logfile_path=path,
+            ino=path.stat().st_ino,
+            position=len("line0\nline1\n"),
+            last_line_hash=hash_last_line(f, len("line0\nline1\n")),
+            state=create_state(own_username="B"),
+        )
+
+    # Not written when the state is unchanged
+    assert seen[3] == seen[2]
+
+    # The last batch is checkpointed when the watcher is resumed
+    checkpoint = read_log_checkpoint(checkpoint_path)
+    assert checkpoint is not None
+    assert checkpoint.state == create_state(own_username="C")
+    assert checkpoint.position == len("line0\nline1\nline2\nline3\n")
+
+
+def test_checkpoint_logline_batches_failures(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    path.write_bytes(b"line\n")
+    checkpoint_path = tmp_path / "missing_dir" / "log_checkpoint.toml"
+
+    controller = create_controller(state=OverlayState())
+    # The file has been replaced since the batch was read
+    progress = FileProgress(position=5, ino=path.stat().st_ino + 1, path=path)
+
+    for i, batch in enumerate(
+        checkpoint_logline_batches(
+            (["line\n"], ["line\n"]),
+            controller,
+            progress=progress,
+            checkpoint_path=checkpoint_path,
+            interval=0,
+        )
+    ):
+        controller.state = create_state(own_username=str(i))
+        if i == 1:
+            # Writing fails due to the missing directory
+            progress.ino = path.stat().st_ino
+
+    assert not checkpoint_path.parent.exists()
+
+
+def test_checkpoint_logline_batches_no_path(tmp_path: Path) -> None:
+    checkpoint_path = tmp_path / "log_checkpoint.toml"
+    controller = create_controller(state=OverlayState())
+
+    # Not checkpointed until we know which file the batches come from
+    for i, batch in enumerate(
+        checkpoint_logline_batches(
+            (["line\n"], ["line\n"]),
+            controller,
+            progress=FileProgress(position=5, ino=1),
+            checkpoint_path=checkpoint_path,
+            interval=0,
+        )
+    ):
+        controller.state = create_state(own_username=str(i))
+
+    assert not checkpoint_path.exists()
@@ -0,0 +1,126 @@
+import threading
+
+from prism.overlay.metrics import (
+    CacheMetrics,
+    CountingTLRUCache,
+    LatencyHistogram,
+    LatencyRecorder,
+    MetricsSnapshot,
+    ThreadCounters,
+    format_metrics,
+)
+
+CACHE_METRICS = CacheMetrics(
+    hits=1,
+    misses=2,
+    stale_hits=3,
+    pending_joins=4,
+    nicked_hits=5,
+    evictions=6,
+    genus_rejected_writes=7,
+    short_term_size=8,
+    long_term_size=9,
+    nicked_size=10,
+)
+
+
+def test_counting_tlru_cache() -> None:
+    now = 0.0
+    cache = CountingTLRUCache[str, int](
+        maxsize=2, ttu=lambda key, value, now: now + value, timer=lambda: now
+    )
+
+    cache["a"] = 10
+    cache["b"] = 1
+    # Evicted due to size
+    cache["c"] = 20
+    assert cache.evictions == 1
+    assert "a" not in cache
+
+    # Evicted due to age, each entry with its own ttl
+    now = 5
+    assert cache.expire() == [("b", 1)]
+    assert cache.evictions == 2
+    assert "c" in cache
+
+
+def test_thread_counters() -> None:
+    counters = ThreadCounters()
+    assert counters["hits"] == 0
+
+    def count() -> None:
+        for _ in range(1000):
+            counters.increment("hits")
+        counters.increment("misses")
+
+    threads = [threading.Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    count()
+    for thread in threads:
+        thread.join()
+
+    # The counts of all the threads are summed
+    assert counters["hits"] == 5000
+    assert counters["misses"] == 5
+    assert counters["evictions"] == 0
+
+
+def test_latency_recorder() -> None:
+    now = 0.0
+    recorder = LatencyRecorder(get_time=lambda: now)
+
+    assert recorder.snapshot() == {}
+
+    recorder.record("player", 0.01)
+    recorder.record("player", 0.05)
+    recorder.record("player", 0.3)
+    recorder.record("player", 100)
+
+    with recorder.time("tags"):
+        now = 2
+
+    try:
+        with recorder.time("tags"):
+            now = 2.5
+            raise ValueError
+    except ValueError:
+        pass
+
+    snapshot = recorder.snapshot()
+    assert snapshot == {
+        "player": LatencyHistogram(
+            bucket_counts=(2, 0, 0, 1, 0, 0, 0, 0, 1), total_seconds=100.36
+        ),
+        "tags": LatencyHistogram(
+            bucket_counts=(0, 0, 0, 1, 0, 1, 0, 0, 0), total_seconds=2.5
+        ),
+    }
+    assert snapshot["player"].count == 4
+    assert snapshot["tags"].mean_seconds == 1.25
+    assert LatencyHistogram((0,) * 9, total_seconds=0).mean_seconds is None
+
+
+def test_format_metrics() -> None:
+    assert format_metrics(MetricsSnapshot(cache=CACHE_METRICS, latencies={})) == (
+        "Cache: hits=1 misses=2 stale_hits=3 pending_joins=4 nicked_hits=5 "
+        "evictions=6 genus_rejected_writes=7 short_term_size=8 long_term_size=9 "
+        "nicked_size=10. Latencies: -"
+    )
+
+    assert format_metrics(
+        MetricsSnapshot(
+            cache=CACHE_METRICS,
+            latencies={
+                "tags": LatencyHistogram(
+                    bucket_counts=(1, 0, 0, 0, 0, 1, 0, 0, 0), total_seconds=2.5
+                ),
+                "account": LatencyHistogram(
+                    bucket_counts=(1, 0, 0, 0, 0, 0, 0, 0, 0), total_seconds=0.02
+                ),
+            },
+        )
+    ).endswith(
+        "Latencies: account: count=1 mean=20ms buckets=[1,0,0,0,0,0,0,0,0]; "
+        "tags: count=2 mean=1250ms buckets=[1,0,0,0,0,1,0,0,0]"
+    )
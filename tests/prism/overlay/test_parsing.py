@@ -9,6 +9,7 @@ from prism.overlay.events import (
     BedwarsFinalKillEvent,
     BedwarsGameStartingSoonEvent,
     BedwarsReconnectEvent,
+    ChatEvent,
     ChatMessageEvent,
     EndBedwarsGameEvent,
     Event,
@@ -28,14 +29,22 @@ from prism.overlay.events import (
     WhisperCommandSetNickEvent,
 )
 from prism.overlay.parsing import (
+    CHAT_PREFIX_REGEX,
     CHAT_PREFIXES,
-    CLIENT_INFO_PREFIXES,
-    get_highest_index,
-    get_lowest_index,
+    CHAT_RULE_INDEX,
+    CHAT_RULES,
+    CLIENT_INFO_PREFIX_REGEX,
+    LOGLINE_MARKERS,
+    ChatParser,
+    ChatRule,
+    ChatRuleIndex,
+    contains_rule,
+    exact_rule,
     parse_logline,
     remove_colors,
     remove_deduplication_suffix,
     remove_ranks,
+    starts_with_rule,
     strip_until,
     valid_username,
     words_match,
@@ -110,42 +119,6 @@ def test_remove_colors(string: str, expected: str) -> None:
     assert remove_colors(string) == expected
 
 
-@pytest.mark.parametrize(
-    "source, substrings, result",
-    (
-        ("a b c d", ("b", "f"), "b"),
-        ("a b c d", ("b", "a"), "a"),
-        ("a b c d", ("e", "f"), None),
-        (
-            "[CHAT1] MaliciousPlayer: [CHAT2] payload",
-            ("[CHAT1] ", "[CHAT2] "),
-            "[CHAT1] ",
-        ),
-        ("a b c d", (), None),
-    ),
-)
-def test_get_lowest_index(source: str, substrings: tuple[str], result: str) -> None:
-    assert get_lowest_index(source, *substrings) == result
-
-
-@pytest.mark.parametrize(
-    "source, substrings, result",
-    (
-        ("a b c d", ("b", "f"), "b"),
-        ("a b c d", ("b", "a"), "b"),
-        ("a b c d", ("e", "f"), None),
-        (
-            "[CLIENT/INFO] [LC] payload",
-            ("[CLIENT/INFO] ", "[CLIENT/INFO] [LC] "),
-            "[CLIENT/INFO] [LC] ",
-        ),
-        ("a b c d", (), None),
-    ),
-)
-def test_get_highest_index(source: str, substrings: tuple[str], result: str) -> None:
-    assert get_highest_index(source, *substrings) == result
-
-
 @pytest.mark.parametrize(
     "line, until, suffix",
     (
@@ -799,6 +772,14 @@ parsing_test_cases: tuple[tuple[str, Event | None], ...] = (
             raw_message="Player1 was buzzed to death by Player2. FINAL KILL!",
         ),
     ),
+    (
+        # Final kill on alpine client with a lowercase chat prefix
+        "[17:26:11] [Client thread/INFO] [alpineclient.lIlllIllIIllIIIIIIIIIlllIIIIIIlIllIlIIIl/]: [chat] Player1 was buzzed to death by Player2. FINAL KILL!",
+        BedwarsFinalKillEvent(
+            dead_player="Player1",
+            raw_message="Player1 was buzzed to death by Player2. FINAL KILL!",
+        ),
+    ),
     (
         "[00:26:36] [Client thread/INFO]: [CHAT] Player1 disconnected.",
         BedwarsDisconnectEvent(username="Player1"),
@@ -848,19 +829,33 @@ parsing_test_cases: tuple[tuple[str, Event | None], ...] = (
             message="[15:03:53] [Client thread/INFO]: [CHAT] ONLINE: Player1",
         ),
     ),
+    (
+        "[17:26:11] [Client thread/INFO] [alpineclient.lIlllIllIIllIIIIIIIIIlllIIIIIIlIllIlIIIl/]: [CHAT] MaliciousPlayer: [15:03:53] [Client thread/INFO]: [CHAT] ONLINE: Player1",
+        ChatMessageEvent(
+            username="MaliciousPlayer",
+            message="[15:03:53] [Client thread/INFO]: [CHAT] ONLINE: Player1",
+        ),
+    ),
+    (
+        "[09:14:43] [Netty Client IO #7/INFO]: [CHAT] MaliciousPlayer: [Client thread/INFO] [Alpine Client/]: [CHAT] ONLINE: Player1",
+        ChatMessageEvent(
+            username="MaliciousPlayer",
+            message="[Client thread/INFO] [Alpine Client/]: [CHAT] ONLINE: Player1",
+        ),
+    ),
 )
 
 
 def make_test_id(test_case: tuple[str, Event | None]) -> str:
     """Make a human-readable id for the test"""
     logline, event = test_case
-    chat_prefix = get_lowest_index(logline, *CHAT_PREFIXES)
-    client_info_prefix = get_lowest_index(logline, *CLIENT_INFO_PREFIXES)
+    chat_prefix = CHAT_PREFIX_REGEX.search(logline)
+    client_info_prefix = CLIENT_INFO_PREFIX_REGEX.search(logline)
 
     if chat_prefix is not None:
-        payload = f"CHAT: {strip_until(logline, until=chat_prefix)}"
+        payload = f"CHAT: {strip_until(logline, until=chat_prefix.group())}"
     elif client_info_prefix is not None:
-        payload = f"INFO: {strip_until(logline, until=client_info_prefix)}"
+        payload = f"INFO: {strip_until(logline, until=client_info_prefix.group())}"
     else:
         payload = f"LOGLINE: {logline}"
 
@@ -879,3 +874,121 @@ def test_parsing(logline: str, event: Event) -> None:
     #       TODO: Add test cases that read from real log files on disk
     for suffix in ("", "\n", "\r\n"):
         assert parse_logline(logline + suffix) == event
+
+
+@pytest.mark.parametrize("logline, event", parsing_test_cases, ids=parsing_test_ids)
+def test_logline_markers(logline: str, event: Event | None) -> None:
+    """Assert that no loglines producing events are skipped by the byte prefilter"""
+    if event is not None:
+        encoded = logline.encode("utf8")
+        assert any(marker in encoded for marker in LOGLINE_MARKERS)
+
+
+@pytest.mark.parametrize(
+    "chat, parsed", (("[CHAT]", True), ("[chat]", True), ("[Chat]", False))
+)
+def test_alpine_chat_prefix_casing(chat: str, parsed: bool) -> None:
+    """Assert that the parser accepts the same casings as the byte prefilter"""
+    logline = (
+        "[17:26:11] [Client thread/INFO] [alpineclient.lIlllIl/]: "
+        f"{chat} Player1 has joined (1/16)!"
+    )
+    encoded = logline.encode("utf8")
+
+    assert any(marker in encoded for marker in LOGLINE_MARKERS) == parsed
+    assert (parse_logline(logline) is not None) == parsed
+
+
+@pytest.mark.parametrize("first", CHAT_PREFIXES)
+@pytest.mark.parametrize("second", CHAT_PREFIXES)
+def test_chat_prefix_regex_lowest_index(first: str, second: str) -> None:
+    """Assert that the first chat prefix in the line is matched"""
+    match = CHAT_PREFIX_REGEX.search(f"[12:00:00] {first}Player1: [12:00:00] {second}")
+    assert match is not None
+    assert match.group() == first
+
+
+def parse_sequentially(rules: Sequence[ChatRule], message: str) -> ChatEvent | None:
+    """Reference implementation of ChatRuleIndex.parse"""
+    for rule in rules:
+        if rule.matches(message):
+            return rule.parse(message)
+    return None
+
+
+CHAT_RULE_TEST_FRAGMENTS = (
+    "ONLINE: ",
+    "You ",
+    "Bed Wars",
+    "  1st Killer",
+    " has joined (1/8)!",
+    " has quit!",
+    " joined the party.",
+    " was removed from your party because they disconnected.",
+    "Kicked ",
+    " because they were offline.",
+    "Party Members (",
+    "Party Leader: ",
+    "Can't find a player by the name of '!",
+    " FINAL KILL!",
+    " disconnected.",
+    " reconnected.",
+    "You were sent to a lobby because someone in your party left",
+    "Player1",
+    ": ",
+    "!",
+)
+
+
+@pytest.mark.parametrize("first", CHAT_RULE_TEST_FRAGMENTS)
+@pytest.mark.parametrize("second", CHAT_RULE_TEST_FRAGMENTS)
+def test_chat_rule_index(first: str, second: str) -> None:
+    """Assert that the index finds the same rule as checking the rules in order"""
+    for message in (first + second, first + "Player1" + second):
+        assert CHAT_RULE_INDEX.parse(message) == parse_sequentially(CHAT_RULES, message)
+
+
+@pytest.mark.parametrize("logline", [logline for logline, _ in parsing_test_cases])
+def test_chat_rule_index_test_cases(logline: str) -> None:
+    match = CHAT_PREFIX_REGEX.search(logline)
+    if match is None:
+        return
+
+    message = remove_colors(
+        remove_deduplication_suffix(logline[match.end() :].rstrip())
+    )
+    assert CHAT_RULE_INDEX.parse(message) == parse_sequentially(CHAT_RULES, message)
+
+
+def test_chat_rule_index_order() -> None:
+    def parse_as(name: str) -> ChatParser:
+        return lambda message: ChatMessageEvent(username=name, message=message)
+
+    rules = (
+        contains_rule(parse_as("contains"), "b"),
+        ChatRule(
+            matches=lambda message: message.endswith("c"),
+            parse=parse_as("suffix"),
+            suffix="c",
+        ),
+        exact_rule(parse_as("exact"), "a b c"),
+        starts_with_rule(parse_as("prefix"), "a ", "x "),
+        ChatRule(matches=lambda message: True, parse=parse_as("always")),
+    )
+    index = ChatRuleIndex(rules)
+
+    def parsed_by(message: str) -> str | None:
+        event = index.parse(message)
+        assert event == parse_sequentially(rules, message)
+        return event.username if isinstance(event, ChatMessageEvent) else None
+
+    assert parsed_by("a b c") == "contains"
+    assert parsed_by("a c") == "suffix"
+    assert parsed_by("a c!") == "prefix"
+    assert parsed_by(" a c!") == "always"
+    assert parsed_by("x a") == "prefix"
+    assert parsed_by("y a") == "always"
+    assert index.candidates("y") == [4]
+    assert index.candidates("a b c") == [0, 1, 2, 3, 4]
+
+    assert ChatRuleIndex(()).parse("a") is None
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections.abc import Mapping, Sequence
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from prism.errors import APIError, PlayerNotFoundError
+from prism.overlay.player_batcher import PlayerBatcher
+from prism.player import KnownPlayer
+from tests.prism.overlay.utils import make_player
+
+
+def wait_for_pending(batcher: PlayerBatcher, amount: int) -> None:
+    """Wait until `amount` requests are waiting for the batch to be sent"""
+    deadline = time.monotonic() + 5
+    while len(batcher._pending) < amount:
+        assert time.monotonic() < deadline, "Timed out waiting for the requests"
+        time.sleep(0.001)
+
+
+def test_player_batcher() -> None:
+    batches: list[tuple[str, ...]] = []
+    lock = threading.Lock()
+
+    def get_players(uuids: Sequence[str]) -> Mapping[str, KnownPlayer]:
+        with lock:
+            batches.append(tuple(uuids))
+        return {uuid: make_player(uuid=uuid) for uuid in uuids if uuid != "missing"}
+
+    batcher = PlayerBatcher(
+        get_players,
+        max_batch_size=3,
+        sleep=lambda seconds: wait_for_pending(batcher, 4),
+    )
+
+    def get_player(uuid: str) -> KnownPlayer | None:
+        try:
+            return batcher.get_player(uuid)
+        except PlayerNotFoundError:
+            return None
+
+    uuids = ("uuid1", "uuid2", "missing", "uuid3")
+    with ThreadPoolExecutor(max_workers=len(uuids)) as executor:
+        results = list(executor.map(get_player, uuids))
+
+    assert results == [
+        make_player(uuid="uuid1"),
+        make_player(uuid="uuid2"),
+        None,
+        make_player(uuid="uuid3"),
+    ]
+
+    # All the requests were sent together, in batches of at most max_batch_size
+    assert sorted(map(len, batches)) == [1, 3]
+    assert sorted(uuid for batch in batches for uuid in batch) == sorted(uuids)
+
+    # Later requests start a new batch
+    batcher = PlayerBatcher(get_players, sleep=lambda seconds: None)
+    assert batcher.get_player("uuid4") == make_player(uuid="uuid4")
+    assert batches[-1] == ("uuid4",)
+
+
+def test_player_batcher_error() -> None:
+    def get_players(uuids: Sequence[str]) -> Mapping[str, KnownPlayer]:
+        raise APIError("Failed getting the batch")
+
+    batcher = PlayerBatcher(
+        get_players, sleep=lambda seconds: wait_for_pending(batcher, 2)
+    )
+
+    def get_player(uuid: str) -> str:
+        with pytest.raises(APIError):
+            batcher.get_player(uuid)
+        return uuid
+
+    # Every request in the batch gets the error
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert list(executor.map(get_player, ("uuid1", "uuid2"))) == ["uuid1", "uuid2"]
+
+    assert batcher._pending == {}
@@ -1,7 +1,29 @@
-from prism.overlay.player_cache import PlayerCache
-from prism.player import NickedPlayer, PendingPlayer
+import sqlite3
+import threading
+import time
+import unittest.mock
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+
+from prism.overlay.metrics import CacheMetrics
+from prism.overlay.player_cache import (
+    MIN_TTL_SECONDS,
+    BulkLookup,
+    PlayerCache,
+    SnapshotTTLCache,
+    adaptive_ttl_seconds,
+)
+from prism.overlay.player_store import PlayerStore
+from prism.player import KnownPlayer, NickedPlayer, PendingPlayer, Player, Tags
 from tests.prism.overlay.utils import make_player
 
+NOW_MS = 1_700_000_000_000
+
+TAGS = Tags(sniping="high", cheating="none")
+TAGS2 = Tags(sniping="none", cheating="medium")
+
 
 def test_cache_manipulation() -> None:
     player_cache = PlayerCache()
@@ -158,3 +180,571 @@ def test_cache_genus() -> None:
 
     assert player_cache.get_cached_player("AmazingNick") is None
     assert player_cache.get_cached_player("OtherNick") is other_nick
+
+
+def test_cache_with_store(tmp_path: Path) -> None:
+    connection = sqlite3.connect(tmp_path / "players.sqlite", check_same_thread=False)
+    store = PlayerStore(connection, get_time_ns=lambda: 1234567890 * 1_000_000)
+    player_cache = PlayerCache(store=store)
+
+    # Only known players are stored
+    player = make_player(username="Player1")
+    player_cache.set_cached_player("Player1", player, genus=0)
+    player_cache.set_cached_player("Nick", NickedPlayer("Nick"), genus=0)
+    player_cache.set_cached_player("Player2", make_player(username="Player2"), genus=0)
+    player_cache.update_cached_player("Player2", lambda p: replace(p, stars=100))
+    player_cache.update_cached_player("Nick", lambda p: p)
+    player_cache.uncache_player("Player1")
+    player_cache.set_cached_player("Player1", player, genus=0)
+    store.write_pending()
+
+    assert store.get_player("Player1") == player
+    assert store.get_player("Nick") is None
+    assert store.get_player("Player2") == make_player(username="Player2", stars=100)
+
+    # A new session only reads the stored players into the long term cache
+    player_cache = PlayerCache(store=store)
+    assert player_cache.get_cached_player("Player1") is None
+    assert player_cache.get_cached_player("Player1", long_term=True) == player
+    # Already loaded
+    with unittest.mock.patch.object(store, "get_player") as patched_get_player:
+        assert player_cache.get_cached_player("Player1", long_term=True) == player
+    patched_get_player.assert_not_called()
+    assert player_cache.get_cached_player_or_set_pending("Player2", long_term=True) == (
+        make_player(username="Player2", stars=100),
+        False,
+    )
+
+    # Short term misses are fetched again
+    pending_player, set_pending = player_cache.get_cached_player_or_set_pending(
+        "Player2"
+    )
+    assert set_pending
+    assert pending_player == PendingPlayer("Player2")
+
+    # Game end doesn't touch the store
+    player_cache.clear_cache(short_term_only=True)
+    assert store.get_player("Player1") == player
+
+    player_cache.uncache_player("Player1")
+    assert player_cache.get_cached_player("Player1", long_term=True) is None
+
+    player_cache.clear_cache()
+    assert player_cache.get_cached_player("Player2", long_term=True) is None
+
+
+def test_cache_with_store_update_by_uuid(tmp_path: Path) -> None:
+    connection = sqlite3.connect(tmp_path / "players.sqlite", check_same_thread=False)
+    store = PlayerStore(connection, get_time_ns=lambda: 1234567890 * 1_000_000)
+    player_cache = PlayerCache(store=store)
+
+    player = make_player(username="Player1", uuid="uuid1", tags=None)
+    player_cache.set_cached_player("Player1", player, genus=0)
+    player_cache.set_cached_player("Nick1", replace(player, nick="Nick1"), genus=0)
+
+    # The update is stored under every alias
+    player_cache.update_cached_player_by_uuid(
+        "uuid1", lambda player: player.set_tags(TAGS)
+    )
+    store.write_pending()
+
+    assert store.get_player("Player1") == player.set_tags(TAGS)
+    assert store.get_player("Nick1") == replace(player, nick="Nick1").set_tags(TAGS)
+
+
+def test_cache_with_store_cleared_during_read(tmp_path: Path) -> None:
+    connection = sqlite3.connect(tmp_path / "players.sqlite", check_same_thread=False)
+    store = PlayerStore(connection, get_time_ns=lambda: 1234567890 * 1_000_000)
+    store.store_player("Player1", make_player(username="Player1"))
+    store.write_pending()
+
+    player_cache = PlayerCache(store=store)
+
+    def get_player(username: str) -> KnownPlayer | None:
+        # The cache is cleared while we read from the store
+        player_cache.clear_cache()
+        return make_player(username="Player1")
+
+    with unittest.mock.patch.object(store, "get_player", get_player):
+        assert player_cache.get_cached_player("Player1", long_term=True) is None
+
+
+def test_cache_uuid_index() -> None:
+    player_cache = PlayerCache()
+    player = make_player(username="Player1", uuid="0123-4567")
+    nicked = replace(player, nick="Nick1")
+
+    assert player_cache.get_cached_player_by_uuid("01234567") is None
+
+    player_cache.set_cached_player("Player1", player, genus=0)
+    player_cache.set_cached_player("Nick1", nicked, genus=0)
+    player_cache.set_cached_player(
+        "Player2", make_player(username="Player2", uuid="89ab"), genus=0
+    )
+
+    # Dashed and undashed uuids are the same, and the alias is dropped
+    assert player_cache.get_cached_player_by_uuid("01234567") == player
+    assert player_cache.get_cached_player_by_uuid("0123-4567") == player
+
+    # All aliases are updated at once
+    player_cache.update_cached_player_by_uuid("01234567", lambda p: p.set_tags(TAGS))
+    assert player_cache.get_cached_player("Player1") == player.set_tags(TAGS)
+    assert player_cache.get_cached_player("Nick1") == nicked.set_tags(TAGS)
+    assert player_cache.get_cached_player("Nick1", long_term=True) == nicked.set_tags(
+        TAGS
+    )
+    assert player_cache.get_cached_player("Player2") == make_player(
+        username="Player2", uuid="89ab"
+    )
+
+    # The nick is assigned to someone else
+    player_cache.set_cached_player("Nick1", NickedPlayer("Nick1"), genus=0)
+    player_cache.update_cached_player_by_uuid("01234567", lambda p: p.set_tags(TAGS2))
+    assert player_cache.get_cached_player("Player1") == player.set_tags(TAGS2)
+    assert player_cache.get_cached_player("Nick1") == NickedPlayer("Nick1")
+
+    # Only in the long term cache
+    player_cache.clear_cache(short_term_only=True)
+    assert player_cache.get_cached_player_by_uuid("01234567") is None
+    player_cache.update_cached_player_by_uuid("01234567", lambda p: p.set_tags(TAGS))
+    assert player_cache.get_cached_player("Player1", long_term=True) == player.set_tags(
+        TAGS2
+    )
+
+    # Not cached anywhere
+    player_cache.uncache_player("Player1")
+    assert player_cache.get_cached_player_by_uuid("01234567") is None
+    assert player_cache._uuid_index == {"89ab": {"player2"}}
+
+    player_cache.clear_cache()
+    assert player_cache._uuid_index == {}
+
+
+def test_cache_fetch_player_by_uuid() -> None:
+    player_cache = PlayerCache()
+    player = make_player(username="Player1", uuid="0123")
+
+    fetched: list[str] = []
+
+    def fetch(uuid: str) -> KnownPlayer | None:
+        fetched.append(uuid)
+        return None
+
+    assert player_cache.fetch_player_by_uuid("0123", fetch) is None
+    assert fetched == ["0123"]
+
+    # Cached under an alias
+    player_cache.set_cached_player("Nick", replace(player, nick="Nick"), genus=0)
+    assert player_cache.fetch_player_by_uuid("0123", fetch) == player
+    assert fetched == ["0123"]
+
+    def fail(uuid: str) -> None:
+        raise ValueError("Fetch failed")
+
+    with pytest.raises(ValueError):
+        player_cache.fetch_player_by_uuid("4567", fail)
+
+    # The failed fetch is not joined
+    assert player_cache.fetch_player_by_uuid("4567", fetch) is None
+    assert fetched == ["0123", "4567"]
+
+
+def test_cache_fetch_player_by_uuid_joined() -> None:
+    player_cache = PlayerCache()
+    player = make_player(username="Player1", uuid="0123")
+
+    fetch_started = threading.Event()
+    finish_fetch = threading.Event()
+    results: list[KnownPlayer | None] = []
+
+    def slow_fetch(uuid: str) -> KnownPlayer:
+        fetch_started.set()
+        assert finish_fetch.wait(timeout=5)
+        return player
+
+    def fetch_in_thread() -> None:
+        results.append(player_cache.fetch_player_by_uuid("0123", slow_fetch))
+
+    def must_not_fetch(uuid: str) -> KnownPlayer:
+        raise AssertionError("The fetch in progress should be joined")
+
+    def join_in_thread() -> None:
+        results.append(player_cache.fetch_player_by_uuid("01-23", must_not_fetch))
+
+    fetcher = threading.Thread(target=fetch_in_thread)
+    fetcher.start()
+    assert fetch_started.wait(timeout=5)
+
+    joining = threading.Event()
+
+    def debug(message: str) -> None:
+        if message.startswith("Joining fetch"):
+            joining.set()
+
+    joiner = threading.Thread(target=join_in_thread)
+    with unittest.mock.patch("prism.overlay.player_cache.logger.debug", debug):
+        joiner.start()
+        assert joining.wait(timeout=5)
+
+    finish_fetch.set()
+    fetcher.join(timeout=5)
+    joiner.join(timeout=5)
+
+    assert results == [player, player]
+    assert player_cache._fetches == {}
+
+
+def test_cache_stale_while_revalidate() -> None:
+    player_cache = PlayerCache()
+    player = make_player(username="Player1", uuid="0123")
+
+    # Not cached anywhere -> pending as usual
+    pending_player, needs_fetch = player_cache.get_cached_player_or_set_pending(
+        "Player2", allow_stale=True
+    )
+    assert pending_player == PendingPlayer("Player2")
+    assert needs_fetch
+
+    player_cache.set_cached_player("Player1", player, genus=0)
+    player_cache.clear_cache(short_term_only=True)
+
+    # Short term miss served by the long term cache
+    stale_player, needs_fetch = player_cache.get_cached_player_or_set_pending(
+        "Player1", allow_stale=True
+    )
+    assert stale_player == replace(player, stale=True)
+    assert needs_fetch
+
+    # Only one refetch is requested
+    assert player_cache.get_cached_player_or_set_pending(
+        "Player1", allow_stale=True
+    ) == (stale_player, False)
+    assert player_cache.get_cached_player("Player1", long_term=True) == player
+
+    # Stale players are not shared by uuid
+    assert player_cache.get_cached_player_by_uuid("0123") is None
+
+    # The refetch replaces the stale player
+    player_cache.set_cached_player("Player1", player, genus=1)
+    assert player_cache.get_cached_player("Player1") == player
+
+    # Without allow_stale the player is set to pending
+    player_cache.clear_cache(short_term_only=True)
+    assert player_cache.get_cached_player_or_set_pending("Player1") == (
+        PendingPlayer("Player1"),
+        True,
+    )
+
+
+def test_get_cached_players_or_set_pending() -> None:
+    player_cache = PlayerCache()
+    known = make_player(username="Known")
+    refreshed = make_player(username="Refreshed")
+
+    player_cache.set_cached_player("Refreshed", refreshed, genus=0)
+    player_cache.clear_cache(short_term_only=True)
+    player_cache.set_cached_player("Known", known, genus=1)
+    player_cache.get_cached_player_or_set_pending("Pending")
+
+    lookup = player_cache.get_cached_players_or_set_pending(
+        ("Known", "Pending", "Missing", "Refreshed"), allow_stale=True
+    )
+    assert lookup == BulkLookup(
+        players={
+            "Known": known,
+            "Pending": PendingPlayer("Pending"),
+            "Missing": PendingPlayer("Missing"),
+            "Refreshed": replace(refreshed, stale=True),
+        },
+        set_pending=("Missing",),
+        stale=("Refreshed",),
+    )
+
+    # Nothing left to fetch
+    lookup = player_cache.get_cached_players_or_set_pending(
+        ("Known", "Missing", "Refreshed"), allow_stale=True
+    )
+    assert lookup.set_pending == lookup.stale == ()
+
+    assert player_cache.get_cached_players(("Known", "Refreshed", "Other")) == {
+        "Known": known,
+        "Refreshed": replace(refreshed, stale=True),
+    }
+    assert player_cache.get_cached_players(
+        ("Known", "Refreshed", "Other"), long_term=True
+    ) == {"Known": known, "Refreshed": refreshed}
+
+
+def test_get_cached_players_with_store(tmp_path: Path) -> None:
+    connection = sqlite3.connect(tmp_path / "players.sqlite", check_same_thread=False)
+    store = PlayerStore(connection, get_time_ns=lambda: 1234567890 * 1_000_000)
+    player = make_player(username="Player1")
+    PlayerCache(store=store).set_cached_player("Player1", player, genus=0)
+    store.write_pending()
+
+    player_cache = PlayerCache(store=store)
+    assert player_cache.get_cached_players(("Player1", "Player2")) == {}
+    assert player_cache.get_cached_players(("Player1", "Player2"), long_term=True) == {
+        "Player1": player
+    }
+
+    # A new cache reading the stored player in bulk
+    lookup = PlayerCache(store=store).get_cached_players_or_set_pending(
+        ("Player1", "Player2"), long_term=True
+    )
+    assert lookup.players == {"Player1": player, "Player2": PendingPlayer("Player2")}
+    assert lookup.set_pending == ("Player2",)
+
+
+def test_uncache_player_short_term_only() -> None:
+    player_cache = PlayerCache()
+    player = make_player(username="Player1")
+
+    player_cache.set_cached_player("Player1", player, genus=0)
+    player_cache.uncache_player("Player1", short_term_only=True)
+
+    assert player_cache.get_cached_player("Player1") is None
+    assert player_cache.get_cached_player("Player1", long_term=True) == player
+
+
+def test_cache_nicked_players() -> None:
+    player_cache = PlayerCache()
+
+    assert player_cache.get_cached_nicked_player("Nick1") is None
+
+    player_cache.set_cached_player("Nick1", NickedPlayer("Nick1"), genus=0)
+    player_cache.set_cached_player("Nick2", NickedPlayer("Nick2"), genus=0)
+
+    # Kept across games
+    player_cache.clear_cache(short_term_only=True)
+    assert player_cache.get_cached_player("Nick1") is None
+    assert player_cache.get_cached_nicked_player("nick1") == NickedPlayer("Nick1")
+
+    # Not nicked anymore
+    player_cache.set_cached_player("Nick1", make_player(username="Nick1"), genus=1)
+    assert player_cache.get_cached_nicked_player("Nick1") is None
+
+    # Denicked
+    player_cache.uncache_player("Nick2", short_term_only=True)
+    assert player_cache.get_cached_nicked_player("Nick2") == NickedPlayer("Nick2")
+    player_cache.uncache_player("Nick2")
+    assert player_cache.get_cached_nicked_player("Nick2") is None
+
+    player_cache.set_cached_player("Nick3", NickedPlayer("Nick3"), genus=1)
+    player_cache.clear_cache()
+    assert player_cache.get_cached_nicked_player("Nick3") is None
+
+
+def test_cache_nicked_players_expire() -> None:
+    now = 0.0
+    player_cache = PlayerCache()
+    player_cache._nicked_cache = SnapshotTTLCache[NickedPlayer](
+        maxsize=256, ttl=30 * 60, timer=lambda: now
+    )
+
+    player_cache.set_cached_player("Nick1", NickedPlayer("Nick1"), genus=0)
+
+    # Looking up the nick writes the player from the nicked cache back
+    for minutes in (10, 20, 29):
+        now = minutes * 60
+        nicked_player = player_cache.get_cached_nicked_player("Nick1")
+        assert nicked_player == NickedPlayer("Nick1")
+        player_cache.set_cached_player("Nick1", nicked_player, genus=0)
+
+    # The lookups do not extend the ttl
+    now = 31 * 60
+    assert player_cache.get_cached_nicked_player("Nick1") is None
+
+    # Finding the player to be nicked again caches them again
+    player_cache.set_cached_player("Nick1", NickedPlayer("Nick1"), genus=0)
+    assert player_cache.get_cached_nicked_player("Nick1") == NickedPlayer("Nick1")
+
+
+def test_cache_metrics() -> None:
+    player_cache = PlayerCache()
+    player = make_player(username="Player1", uuid="0123")
+
+    player_cache.get_cached_player_or_set_pending("Player1")
+    player_cache.get_cached_player_or_set_pending("Player1")
+    player_cache.set_cached_player("Player1", player, genus=0)
+    player_cache.get_cached_player_or_set_pending("Player1")
+    player_cache.set_cached_player("Nick1", NickedPlayer("Nick1"), genus=0)
+    player_cache.get_cached_nicked_player("Nick1")
+
+    player_cache.clear_cache(short_term_only=True)
+    player_cache.set_cached_player("Player2", make_player(username="Player2"), genus=0)
+    player_cache.get_cached_player_or_set_pending("Player1", allow_stale=True)
+
+    assert player_cache.get_metrics() == CacheMetrics(
+        hits=2,
+        misses=1,
+        stale_hits=1,
+        pending_joins=1,
+        nicked_hits=1,
+        evictions=0,
+        genus_rejected_writes=1,
+        short_term_size=1,
+        long_term_size=2,
+        nicked_size=1,
+    )
+
+
+def test_snapshot_ttl_cache() -> None:
+    now = 0.0
+    cache = SnapshotTTLCache[int](maxsize=2, ttl=10, timer=lambda: now)
+
+    cache["a"] = 1
+    cache["b"] = 2
+    assert cache.peek("a") == 1
+
+    # Evicted due to size
+    cache["c"] = 3
+    assert cache.peek("a") is None
+    assert cache.peek("c") == 3
+
+    del cache["b"]
+    assert cache.peek("b") is None
+    assert cache._entries.keys() == {"c"}
+
+    # Expired entries are not returned, and are dropped when the cache expires
+    now = 10
+    assert cache.peek("c") is None
+    cache.expire()
+    assert cache._entries == {}
+
+    cache["d"] = 4
+    cache.clear()
+    assert cache.peek("d") is None
+    assert cache._entries == {}
+
+
+def test_snapshot_ttl_cache_get_ttl() -> None:
+    now = 0.0
+    cache = SnapshotTTLCache[int](
+        maxsize=4, ttl=10, timer=lambda: now, get_ttl=lambda value, ttl: ttl * value
+    )
+
+    cache["a"] = 1
+    cache["b"] = 3
+
+    now = 10
+    assert cache.peek("a") is None
+    assert cache.peek("b") == 3
+    assert cache.expire() == [("a", 1)]
+
+    now = 30
+    assert cache.peek("b") is None
+    assert cache.expire() == [("b", 3)]
+
+
+@pytest.mark.parametrize(
+    "player, ttl_seconds",
+    (
+        (PendingPlayer("Player1"), 600),
+        (NickedPlayer("Player1"), 600),
+        # No login information
+        (make_player(dataReceivedAtMs=NOW_MS), 600),
+        # Offline, or online status hidden
+        (
+            make_player(
+                lastLoginMs=NOW_MS - 7200_000,
+                lastLogoutMs=NOW_MS - 3600_000,
+                dataReceivedAtMs=NOW_MS,
+            ),
+            2400,
+        ),
+        # Active session
+        (
+            make_player(
+                lastLoginMs=NOW_MS - 3600_000,
+                lastLogoutMs=NOW_MS - 7200_000,
+                dataReceivedAtMs=NOW_MS,
+            ),
+            300,
+        ),
+        # The age of the stats counts towards the ttl
+        (
+            make_player(
+                lastLoginMs=NOW_MS - 7200_000,
+                lastLogoutMs=NOW_MS - 3600_000,
+                dataReceivedAtMs=NOW_MS - 400_000,
+            ),
+            2000,
+        ),
+        (make_player(dataReceivedAtMs=NOW_MS - 3600_000), MIN_TTL_SECONDS),
+        (make_player(dataReceivedAtMs=NOW_MS + 10_000), 600),
+        # Stale players are being refreshed
+        (
+            replace(
+                make_player(
+                    lastLoginMs=NOW_MS - 7200_000,
+                    lastLogoutMs=NOW_MS - 3600_000,
+                    dataReceivedAtMs=NOW_MS - 3600_000,
+                ),
+                stale=True,
+            ),
+            600,
+        ),
+    ),
+)
+def test_adaptive_ttl_seconds(player: Player, ttl_seconds: float) -> None:
+    assert adaptive_ttl_seconds(player, 600, now_ms=NOW_MS) == ttl_seconds
+
+
+def test_cache_adaptive_ttl() -> None:
+    player_cache = PlayerCache(get_time_ns=lambda: NOW_MS * 1_000_000)
+
+    active_player = make_player(
+        username="Active",
+        lastLoginMs=NOW_MS - 3600_000,
+        lastLogoutMs=NOW_MS - 7200_000,
+        dataReceivedAtMs=NOW_MS,
+    )
+    offline_player = make_player(
+        username="Offline",
+        lastLoginMs=NOW_MS - 7200_000,
+        lastLogoutMs=NOW_MS - 3600_000,
+        dataReceivedAtMs=NOW_MS,
+    )
+    for player in (active_player, offline_player):
+        player_cache.set_cached_player(player.username, player, genus=0)
+
+    def ttls(cache: SnapshotTTLCache[Player]) -> dict[str, float]:
+        now = time.monotonic()
+        return {key: expires - now for key, (_, expires) in cache._entries.items()}
+
+    assert ttls(player_cache._cache) == {
+        "active": pytest.approx(5 * 60, abs=1),
+        "offline": pytest.approx(40 * 60, abs=1),
+    }
+    assert ttls(player_cache._long_term_cache) == {
+        "active": pytest.approx(30 * 60, abs=1),
+        "offline": pytest.approx(4 * 60 * 60, abs=1),
+    }
+
+
+def test_cache_hits_are_lock_free() -> None:
+    player_cache = PlayerCache()
+    player = make_player(username="Player1")
+    player_cache.set_cached_player("Player1", player, genus=0)
+    player_cache.set_cached_player("Nick1", NickedPlayer("Nick1"), genus=0)
+
+    # Fail if any of the reads take the mutex
+    with unittest.mock.patch.object(player_cache, "_mutex", None):
+        assert player_cache.get_cached_player_or_set_pending("player1") == (
+            player,
+            False,
+        )
+        assert player_cache.get_cached_player_or_set_pending(
+            "Player1", long_term=True
+        ) == (player, False)
+        assert player_cache.get_cached_player("Player1") == player
+        assert player_cache.get_cached_player("Player2", long_term=True) is None
+        assert player_cache.get_cached_nicked_player("Nick1") == NickedPlayer("Nick1")
+        assert player_cache.get_cached_players_or_set_pending(
+            ("Player1", "Nick1"), allow_stale=True
+        ) == BulkLookup(
+            players={"Player1": player, "Nick1": NickedPlayer("Nick1")},
+            set_pending=(),
+            stale=(),
+        )
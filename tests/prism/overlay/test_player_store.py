@@ -0,0 +1,255 @@
+import sqlite3
+import threading
+from pathlib import Path
+
+import pytest
+
+from prism.overlay.player_store import (
+    PlayerStore,
+    player_from_json,
+    player_to_json,
+)
+from prism.player import KnownPlayer, Tags
+from tests.prism.overlay.utils import make_player
+
+NOW_MS = 1234567890 + 10 * 60 * 1000
+
+
+def create_store(
+    path: Path, now_ms: int = NOW_MS, ttl_seconds: float = 60 * 60
+) -> PlayerStore:
+    return PlayerStore(
+        sqlite3.connect(path, check_same_thread=False),
+        ttl_seconds=ttl_seconds,
+        get_time_ns=lambda: now_ms * 1_000_000,
+    )
+
+
+@pytest.mark.parametrize(
+    "player",
+    (
+        make_player(username="Player1", nick="Nick1", lastLoginMs=10, winstreak=3),
+        make_player(username="Player2", tags=None),
+        make_player(username="Player3", tags=Tags(sniping="high", cheating="medium")),
+    ),
+)
+def test_player_json_roundtrip(player: KnownPlayer) -> None:
+    assert player_from_json(player_to_json(player)) == player
+
+
+@pytest.mark.parametrize(
+    "source",
+    (
+        "not json",
+        "[]",
+        "{}",
+        '{"stats": {}, "tags": null}',
+        player_to_json(make_player()).replace('"stars"', '"unknown_field"'),
+    ),
+)
+def test_player_from_json_invalid(source: str) -> None:
+    with pytest.raises(ValueError):
+        player_from_json(source)
+
+
+def test_player_store(tmp_path: Path) -> None:
+    path = tmp_path / "players.sqlite"
+    store = create_store(path)
+
+    player = make_player(username="Player1")
+    assert store.get_player("Player1") is None
+
+    store.store_player("Player1", player)
+    store.store_player("SomeNick", make_player(username="Player2", nick="SomeNick"))
+    store.store_player("Player3", make_player(username="Player3"))
+    store.write_pending()
+    # Nothing to write
+    store.write_pending()
+
+    assert store.get_player("player1") == player
+    assert store.get_player("somenick") == make_player(
+        username="Player2", nick="SomeNick"
+    )
+
+    store.remove_player("Player3")
+    assert store.get_player("Player3") is None
+    store.write_pending(block=True)
+
+    # The store persists across restarts
+    store = create_store(path)
+    assert store.get_player("Player1") == player
+    assert store.get_player("Player3") is None
+
+    store.clear()
+    assert store.get_player("Player1") is None
+    store.store_player("Player4", make_player(username="Player4"))
+    store.write_pending()
+
+    store = create_store(path)
+    assert store.get_player("Player1") is None
+    assert store.get_player("Player4") == make_player(username="Player4")
+
+
+def test_player_store_expiry(tmp_path: Path) -> None:
+    path = tmp_path / "players.sqlite"
+    store = create_store(path, ttl_seconds=60)
+
+    store.store_player("Player1", make_player(username="Player1"))
+    store.store_player(
+        "Player2",
+        make_player(username="Player2", dataReceivedAtMs=NOW_MS - 30 * 1000),
+    )
+    store.write_pending()
+
+    # Old entries are not returned
+    assert store.get_player("Player1") is None
+    assert store.get_player("Player2") is not None
+
+    # And are deleted on open
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT COUNT(*) FROM players").fetchone()[0] == 2
+    create_store(path, ttl_seconds=60)
+    assert connection.execute("SELECT COUNT(*) FROM players").fetchone()[0] == 1
+
+
+def test_player_store_activity_expiry(tmp_path: Path) -> None:
+    store = create_store(tmp_path / "players.sqlite", ttl_seconds=60 * 60)
+
+    two_hours_ago = NOW_MS - 2 * 60 * 60 * 1000
+    offline_player = make_player(
+        username="Offline",
+        lastLoginMs=two_hours_ago - 2000,
+        lastLogoutMs=two_hours_ago - 1000,
+        dataReceivedAtMs=two_hours_ago,
+    )
+    store.store_player("Offline", offline_player)
+    store.store_player(
+        "Unknown", make_player(username="Unknown", dataReceivedAtMs=two_hours_ago)
+    )
+
+    forty_minutes_ago = NOW_MS - 40 * 60 * 1000
+    store.store_player(
+        "Online",
+        make_player(
+            username="Online",
+            lastLoginMs=forty_minutes_ago - 1000,
+            lastLogoutMs=forty_minutes_ago - 2000,
+            dataReceivedAtMs=forty_minutes_ago,
+        ),
+    )
+    store.write_pending()
+
+    # Players are kept as long as in the long term PlayerCache
+    assert store.get_player("Offline") == offline_player
+    assert store.get_player("Unknown") is None
+    assert store.get_player("Online") is None
+
+
+def test_player_store_read_during_write(tmp_path: Path) -> None:
+    path = tmp_path / "players.sqlite"
+    connection = sqlite3.connect(path, check_same_thread=False)
+    store = PlayerStore(
+        connection,
+        read_connection=sqlite3.connect(path, check_same_thread=False),
+        get_time_ns=lambda: NOW_MS * 1_000_000,
+    )
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    player = make_player(username="Player1")
+    store.store_player("Player1", player)
+    store.write_pending()
+
+    read_players: list[KnownPlayer | None] = []
+
+    def read() -> None:
+        read_players.append(store.get_player("Player1"))
+
+    # A write is being committed
+    with store._lock, connection:
+        connection.execute(
+            "UPDATE players SET player = ?",
+            (player_to_json(make_player(username="Player1", stars=100)),),
+        )
+
+        # Reads are not blocked by it, and see the last commit
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+        reader.join(timeout=5)
+        assert read_players == [player]
+
+    assert store.get_player("Player1") == make_player(username="Player1", stars=100)
+
+
+def test_player_store_invalid(tmp_path: Path) -> None:
+    path = tmp_path / "players.sqlite"
+    store = create_store(path)
+    store.store_player("Player1", make_player(username="Player1"))
+    store.write_pending()
+
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("UPDATE players SET player = 'invalid'")
+    assert store.get_player("Player1") is None
+
+    # Stores from other versions are discarded
+    with connection:
+        connection.execute("PRAGMA user_version=1000")
+    store = create_store(path)
+    assert connection.execute("SELECT COUNT(*) FROM players").fetchone()[0] == 0
+
+
+def test_player_store_errors(tmp_path: Path) -> None:
+    path = tmp_path / "players.sqlite"
+    store = create_store(path)
+    store.store_player("Player1", make_player(username="Player1"))
+
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("DROP TABLE players")
+
+    # Failures are logged
+    store.write_pending()
+    assert store.get_player("Player1") is None
+
+
+def test_player_store_accounts_errors(tmp_path: Path) -> None:
+    path = tmp_path / "players.sqlite"
+    store = create_store(path)
+    store.store_uuid("Player1", "uuid1")
+    store.write_pending()
+
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute("DROP TABLE accounts")
+
+    # Failures are logged
+    assert store.get_uuid("Player1") is None
+
+
+def test_player_store_accounts(tmp_path: Path) -> None:
+    path = tmp_path / "players.sqlite"
+    store = create_store(path)
+
+    assert store.get_uuid("Player1") is None
+
+    store.store_uuid("Player1", "uuid1")
+    store.store_uuid("Player2", "uuid2")
+    store.write_pending()
+    assert store.get_uuid("player1") == "uuid1"
+
+    store.remove_uuid("Player2")
+    assert store.get_uuid("Player2") is None
+
+    # Clearing the players keeps the uuids
+    store.clear()
+    store.write_pending()
+
+    store = create_store(path)
+    assert store.get_uuid("Player1") == "uuid1"
+    assert store.get_uuid("Player2") is None
+
+    # Old uuids are not returned, and are deleted on open
+    store = create_store(path, now_ms=NOW_MS + 8 * 24 * 60 * 60 * 1000)
+    assert store.get_uuid("Player1") is None
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT COUNT(*) FROM accounts").fetchone()[0] == 0
@@ -1,3 +1,5 @@
+import io
+import queue
 import unittest.mock
 from collections.abc import Iterable
 from typing import Final
@@ -28,16 +30,28 @@ from prism.overlay.events import (
     StartBedwarsGameEvent,
     WhisperCommandSetNickEvent,
 )
+from prism.overlay.file_utils import ReversedLineReader
+from prism.overlay.nick_database import NickDatabase
+from prism.overlay.parsing import parse_logline
 from prism.overlay.process_event import (
+    PARTY_EVENT_MARKERS,
+    PARTY_EVENT_TYPES,
+    PERSISTENT_EVENT_MARKERS,
+    PERSISTENT_EVENT_TYPES,
     fast_forward_state,
+    fast_forward_state_reversed,
     process_event,
+    process_logline_batches,
     process_loglines,
 )
+from prism.player import PendingPlayer
+from tests.prism.overlay.test_parsing import parsing_test_cases, parsing_test_ids
 from tests.prism.overlay.utils import (
     OWN_USERNAME,
     assert_controllers_equal,
     create_controller,
     create_state,
+    make_player,
     make_settings,
 )
 
@@ -775,6 +789,27 @@ def test_process_event_bedwars_game_ended() -> None:
     assert will_redraw
 
 
+def test_process_event_lobby_swap_drops_requests() -> None:
+    controller = create_controller(
+        state=create_state(
+            party_members={OWN_USERNAME, "Teammate"},
+            lobby_players={OWN_USERNAME, "Teammate", "Enemy"},
+        )
+    )
+    for username in ("Enemy", "Teammate", OWN_USERNAME):
+        controller.player_cache.get_cached_player_or_set_pending(username)
+    controller.requested_stats_queue.put_many(("Enemy", "Teammate", OWN_USERNAME))
+
+    new_state, will_redraw = process_event(controller, LobbySwapEvent())
+
+    # Requests for the players in the old lobby are dropped and uncached
+    assert controller.requested_stats_queue.unfinished_tasks == 2
+    assert controller.player_cache.get_cached_player("Enemy") is None
+    assert controller.player_cache.get_cached_player("Teammate") == PendingPlayer(
+        "Teammate"
+    )
+
+
 CHAT = "[Info: 2021-11-29 22:17:40.417869567: GameCallbacks.cpp(162)] Game/net.minecraft.client.gui.GuiNewChat (Client thread) Info [CHAT] "  # noqa: E501
 INFO = "[Info: 2021-11-29 23:26:26.372869411: GameCallbacks.cpp(162)] Game/net.minecraft.client.Minecraft (Client thread) Info "  # noqa: E501
 
@@ -1347,6 +1382,138 @@ def test_fast_forward_state(
     assert_controllers_equal(new_controller, target_controller)
 
 
+def make_reader(loglines: Iterable[str], block_size: int = 64) -> ReversedLineReader:
+    content = "".join(f"{line}\n" for line in loglines).encode("utf8")
+    return ReversedLineReader(
+        io.BytesIO(content), end=len(content), block_size=block_size
+    )
+
+
+@pytest.mark.parametrize(
+    "initial_controller, loglines, target_controller", FAST_FORWARD_STATE_CASES
+)
+def test_fast_forward_state_reversed(
+    initial_controller: OverlayController,
+    loglines: Iterable[str],
+    target_controller: OverlayController,
+) -> None:
+    fast_forward_state_reversed(initial_controller, make_reader(loglines))
+
+    new_controller = initial_controller
+    assert_controllers_equal(new_controller, target_controller)
+
+
+def test_fast_forward_state_reversed_stops_early() -> None:
+    controller = create_controller(
+        state=create_state(own_username=None),
+        settings=make_settings(
+            known_nicks={"Nick1": {"uuid": "uuid1", "comment": "Player1"}}
+        ),
+        nick_database=NickDatabase([{"Nick1": "uuid1"}]),
+    )
+    loglines = (
+        f"{INFO}Setting user: OldAccount",
+        f"{CHAT}You have joined [MVP++] OldLeader's party!",
+        f"{INFO}Setting user: Me",
+        f"{CHAT}You'll be partying with: Player1",
+        f"{CHAT}Player2 has joined (1/16)!",
+        # Removes the denick for Nick1 - persists across resets
+        f"{CHAT}Can't find a player by the name of '!Nick1='",
+        f"{CHAT}[MVP+] Player1: You are now nicked as Nick2!",
+        f"{CHAT}You have joined [MVP++] Leader's party!",
+        f"{CHAT}Player3 has joined (1/16)!",
+        f"{CHAT}Sending you to mini123!",
+        f"{CHAT}Party Members (2)",
+        f"{CHAT}Party Leader: [MVP++] Leader ●",
+        f"{CHAT}Party Members: Me ● [VIP+] Teammate ●",
+        f"{CHAT}Teammate has joined (1/16)!",
+    )
+
+    fast_forward_state_reversed(controller, make_reader(loglines, block_size=8))
+
+    assert controller.state == create_state(
+        own_username="Me",
+        party_members={"Me", "Leader", "Teammate"},
+        lobby_players={"Me", "Leader", "Teammate"},
+        in_queue=True,
+    )
+    assert controller.settings.known_nicks == {}
+    assert controller.nick_database.default_database == {}
+
+    # Same result as processing the entire file
+    full_controller = create_controller(
+        state=create_state(own_username=None),
+        settings=make_settings(
+            known_nicks={"Nick1": {"uuid": "uuid1", "comment": "Player1"}}
+        ),
+        nick_database=NickDatabase([{"Nick1": "uuid1"}]),
+    )
+    fast_forward_state(full_controller, loglines)
+    assert_controllers_equal(controller, full_controller)
+
+
+def make_partyless_session(game_count: int) -> tuple[str, ...]:
+    """Loglines of a session with `game_count` games and no party events after it"""
+    return (
+        f"{INFO}Setting user: Me",
+        f"{CHAT}You'll be partying with: Teammate",
+        *(
+            line
+            for i in range(game_count)
+            for line in (
+                f"{CHAT}Sending you to mini{i}!",
+                f"{CHAT}Me has joined (1/16)!",
+                f"{CHAT}Player{i} has joined (2/16)!",
+                f"{CHAT}[MVP+] Player{i}: gl",
+                f"{CHAT}The game starts in 1 second!",
+            )
+        ),
+        f"{CHAT}Sending you to mini!",
+        f"{CHAT}Me has joined (1/16)!",
+    )
+
+
+def test_fast_forward_state_reversed_parses_a_bounded_amount_of_lines() -> None:
+    """Only the lines after the last lobby swap are parsed, and a few before it"""
+    parse_counts: list[int] = []
+
+    for game_count in (10, 1000):
+        loglines = make_partyless_session(game_count)
+        controller = create_controller(state=create_state(own_username=None))
+
+        with unittest.mock.patch(
+            "prism.overlay.process_event.parse_logline", wraps=parse_logline
+        ) as parse_logline_mock:
+            fast_forward_state_reversed(controller, make_reader(loglines))
+
+        parse_counts.append(parse_logline_mock.call_count)
+
+        assert controller.state == create_state(
+            own_username="Me",
+            party_members={"Me", "Teammate"},
+            lobby_players={"Me", "Teammate"},
+            in_queue=True,
+        )
+
+        # Same result as processing the entire file
+        full_controller = create_controller(state=create_state(own_username=None))
+        fast_forward_state(full_controller, loglines)
+        assert_controllers_equal(controller, full_controller)
+
+    # The lobby swap and join, the party join and setting the user
+    assert parse_counts == [4, 4]
+
+
+@pytest.mark.parametrize("logline, event", parsing_test_cases, ids=parsing_test_ids)
+def test_reversed_event_markers(logline: str, event: Event | None) -> None:
+    """Assert that no party or persistent events are skipped in the early logfile"""
+    encoded = logline.encode("utf8")
+    if event is not None and event.event_type in PARTY_EVENT_TYPES:
+        assert any(marker in encoded for marker in PARTY_EVENT_MARKERS)
+    if event is not None and event.event_type in PERSISTENT_EVENT_TYPES:
+        assert any(marker in encoded for marker in PERSISTENT_EVENT_MARKERS)
+
+
 @pytest.mark.parametrize(
     "loglines, resulting_controller",
     (
@@ -1378,3 +1545,92 @@ def test_process_loglines(
 
     process_loglines(loglines, controller)
     assert_controllers_equal(controller, resulting_controller)
+
+
+def test_process_logline_batches() -> None:
+    batches: tuple[list[str], ...] = (
+        [
+            f"{INFO}Setting user: Me",
+            f"{CHAT}You'll be partying with: Player1",
+            f"{CHAT}Player2 has joined (1/16)!",
+            f"{CHAT}Player3 has joined (2/16)!",
+        ],
+        [],
+        [f"{CHAT}You have 1 unclaimed leveling reward!"],
+        [f"{CHAT}Player3 has quit!", f"{CHAT}Player4 has joined (3/16)!"],
+        [f"{CHAT}ONLINE: Me, Player1, Player4", f"{CHAT}Player5 has joined (4/16)!"],
+    )
+
+    controller = create_controller(state=create_state(own_username=None))
+    with unittest.mock.patch.object(
+        controller.redraw_event, "set", wraps=controller.redraw_event.set
+    ) as redraw_set:
+        process_logline_batches(batches, controller)
+
+    # One redraw per batch that changed the overlay
+    assert redraw_set.call_count == 2
+
+    # Same result as processing the lines one by one
+    line_controller = create_controller(state=create_state(own_username=None))
+    process_loglines((line for batch in batches for line in batch), line_controller)
+    assert_controllers_equal(controller, line_controller)
+
+
+def test_process_logline_batches_no_redraw() -> None:
+    controller = create_controller()
+    state = controller.state
+
+    process_logline_batches(
+        ([f"{CHAT}You have 1 unclaimed leveling reward!", "Not a chat line"],),
+        controller,
+    )
+
+    assert controller.state is state
+    assert not controller.redraw_event.is_set()
+
+
+def test_process_logline_batches_prefetches_party_members() -> None:
+    controller = create_controller()
+    cached_player = make_player(username="Player2")
+    controller.player_cache.set_cached_player(
+        "Player2", cached_player, genus=controller.player_cache.current_genus
+    )
+
+    process_logline_batches(
+        (
+            [f"{CHAT}You'll be partying with: Player1, [MVP+] Player2"],
+            [
+                f"{CHAT}Party Members (4)",
+                f"{CHAT}Party Leader: [MVP++] Player1 ●",
+                f"{CHAT}Party Members: Player2 ● Player3 ● {OWN_USERNAME} ●",
+            ],
+        ),
+        controller,
+    )
+
+    # Only the new party members that are not cached are prefetched
+    assert controller.requested_stats_queue.get_nowait() == "Player1"
+    assert controller.requested_stats_queue.get_nowait() == "Player3"
+    with pytest.raises(queue.Empty):
+        controller.requested_stats_queue.get_nowait()
+
+    assert controller.player_cache.get_cached_player(
+        "Player1", long_term=True
+    ) == PendingPlayer("Player1")
+    assert controller.player_cache.get_cached_player("Player2") == cached_player
+
+
+def test_process_event_passed_state() -> None:
+    """Events are applied to the passed state instead of controller.state"""
+    controller = create_controller(state=create_state(own_username=None))
+    state = create_state(own_username="Me")
+
+    new_state, redraw = process_event(
+        controller, LobbyJoinEvent("Player1", player_count=2, player_cap=16), state
+    )
+
+    assert redraw
+    assert new_state == create_state(
+        own_username="Me", lobby_players={"Me"}, in_queue=True
+    )
+    assert controller.state == create_state(own_username=None)
@@ -0,0 +1,211 @@
+import pytest
+
+from prism.overlay.placeholder import PlaceholderWinstreakProvider
+from prism.overlay.process_event import process_logline_batches
+from prism.overlay.replay import (
+    LatencySummary,
+    RecordingEvent,
+    ReplayRecorder,
+    StubStatsProvider,
+    create_replay_controller,
+    group_by_timestamp,
+    parse_log_timestamp,
+    replay_batches,
+)
+from prism.player import PendingPlayer, Tags
+from tests.prism.overlay.utils import make_player
+
+
+@pytest.mark.parametrize(
+    "line, timestamp",
+    (
+        ("[18:47:15] [Client thread/INFO]: [CHAT] Player1 has quit!", 67635),
+        ("[00:00:01] [Render thread/INFO]: Setting user: Player1", 1),
+        (
+            "[Info: 2021-11-29 22:17:40.417692543: GameCallbacks.cpp(162)] Game/net"
+            ".minecraft.client.gui.GuiNewChat (Client thread) Info [CHAT] Party",
+            80260.417692543,
+        ),
+        (
+            "[2024-01-27 18:54:46.175] [info]  [18:54:46] [Client thread/INFO]: "
+            "Setting user: Player1",
+            68086.175,
+        ),
+        # The chat message is not searched
+        ("[Client thread/INFO]: [CHAT] [MVP+] Player1: meet at 12:34:56", None),
+        ("Player1 has quit!", None),
+    ),
+)
+def test_parse_log_timestamp(line: str, timestamp: float | None) -> None:
+    assert parse_log_timestamp(line) == pytest.approx(timestamp)
+
+
+def test_group_by_timestamp() -> None:
+    lines = (
+        "Launching the game",
+        "[23:59:59] a",
+        "[23:59:59] b",
+        "    continued",
+        "[00:00:00] c",
+        "[00:00:02] d",
+        "[00:00:02] e",
+        "[00:00:01] f",
+    )
+
+    assert list(group_by_timestamp(lines)) == [
+        (None, ["Launching the game"]),
+        (86399, ["[23:59:59] a", "[23:59:59] b", "    continued"]),
+        (86400, ["[00:00:00] c"]),
+        (86402, ["[00:00:02] d", "[00:00:02] e"]),
+        # Small steps back in time are kept
+        (86401, ["[00:00:01] f"]),
+    ]
+
+    assert list(group_by_timestamp(())) == []
+
+
+def test_latency_summary() -> None:
+    assert LatencySummary.from_latencies([]) is None
+
+    assert LatencySummary.from_latencies([0.5]) == LatencySummary(
+        count=1, mean=0.5, p50=0.5, p90=0.5, p99=0.5, max=0.5
+    )
+
+    summary = LatencySummary.from_latencies([i / 1000 for i in range(101)])
+    assert summary is not None
+    assert summary.count == 101
+    assert summary.mean == pytest.approx(0.05)
+    assert summary.p50 == pytest.approx(0.05)
+    assert summary.p90 == pytest.approx(0.09)
+    assert summary.p99 == pytest.approx(0.099)
+    assert summary.max == 0.1
+    assert summary.format() == (
+        "n=101 mean=50.0ms p50=50.0ms p90=90.0ms p99=99.0ms max=100.0ms"
+    )
+
+
+def test_replay_recorder() -> None:
+    recorder = ReplayRecorder()
+    assert recorder.report() == (
+        "Replayed 0 batches of loglines\n"
+        "logline -> redraw: no samples\n"
+        "player -> stats shown: no samples"
+    )
+
+    # Redraws not caused by a batch are not measured
+    recorder.redraw_requested()
+
+    # Batch 0 requests a redraw twice
+    recorder.batch_emitted(1.0)
+    recorder.redraw_requested()
+    recorder.redraw_requested()
+    recorder.batch_processed()
+
+    # Batch 1 does not request a redraw
+    recorder.batch_emitted(1.5)
+    recorder.batch_processed()
+
+    # Batch 2 requests a redraw
+    recorder.batch_emitted(2.0)
+    recorder.redraw_requested()
+    recorder.batch_processed()
+
+    recorder.redrawn(
+        [PendingPlayer("Player1"), make_player(username="Player2")], now=2.5
+    )
+    assert recorder.state_latencies == [1.5, 0.5]
+    # Player2 was cached, and shown at the same time as they joined
+    assert recorder.stats_latencies == [1.5]
+
+    # Stats arrive for Player1
+    recorder.redrawn(
+        [make_player(username="Player1"), make_player(username="Player2")], now=3.0
+    )
+    assert recorder.state_latencies == [1.5, 0.5]
+    assert recorder.stats_latencies == [1.5, 2.0]
+
+    # Player1 leaves and comes back
+    recorder.redrawn([make_player(username="Player2")], now=4.0)
+    recorder.batch_emitted(5.0)
+    recorder.redraw_requested()
+    recorder.batch_processed()
+    recorder.redrawn(
+        [make_player(username="Player1"), make_player(username="Player2")], now=5.25
+    )
+
+    assert recorder.state_latencies == [1.5, 0.5, 0.25]
+    assert recorder.stats_latencies == [1.5, 2.0, 0.25]
+    assert recorder.batches == 4
+    assert recorder.report().splitlines()[0] == "Replayed 4 batches of loglines"
+    assert recorder.report().splitlines()[1].startswith("logline -> redraw: n=3 ")
+
+
+def test_replay_batches() -> None:
+    recorder = ReplayRecorder()
+    time = 100.0
+    sleeps: list[float] = []
+
+    def sleep(seconds: float) -> None:
+        nonlocal time
+        sleeps.append(seconds)
+        time += seconds
+
+    groups = [
+        (None, ["launch"]),
+        (10.0, ["a", "b"]),
+        (12.0, ["c"]),
+        (16.0, ["d"]),
+    ]
+
+    batches = replay_batches(
+        groups, speed=2, recorder=recorder, clock=lambda: time, sleep=sleep
+    )
+    seen = []
+    for batch in batches:
+        seen.append(batch)
+        if batch == ["c"]:
+            # Processing takes longer than the time until the next batch
+            time += 5
+
+    assert seen == [["launch"], ["a", "b"], ["c"], ["d"]]
+    assert sleeps == [1.0]
+    assert recorder.done
+    assert recorder.batches == 4
+
+
+def test_replay_controller() -> None:
+    recorder = ReplayRecorder()
+    controller = create_replay_controller(recorder)
+
+    assert isinstance(controller.redraw_event, RecordingEvent)
+    assert isinstance(controller._winstreak_provider, PlaceholderWinstreakProvider)
+    assert controller.ready
+
+    batches = replay_batches(
+        [(1.0, ["[00:00:01] [Client thread/INFO]: [CHAT] Player1 has joined (1/16)!"])],
+        speed=1,
+        recorder=recorder,
+    )
+    process_logline_batches(batches, controller)
+
+    assert controller.redraw_event.is_set()
+    recorder.redrawn([PendingPlayer("Player1")], now=recorder._emitted[0] + 1)
+    assert recorder.state_latencies == [1]
+
+
+def test_stub_stats_provider() -> None:
+    provider = StubStatsProvider()
+
+    account = provider.get_account_by_username("Player1", user_id="")
+    assert account.username == "Player1"
+    assert account.uuid == provider.get_account_by_username("player1", user_id="").uuid
+
+    player = provider.get_player(account.uuid, user_id="")
+    assert player.uuid == account.uuid
+    assert player.username == "player1"
+
+    assert provider.get_player("unknown", user_id="").username == "unknown"
+    assert provider.get_tags(account.uuid, user_id="", urchin_api_key=None) == Tags(
+        sniping="none", cheating="none"
+    )
+    assert provider.seconds_until_unblocked == 0
@@ -0,0 +1,110 @@
+import queue
+
+import pytest
+
+from prism.overlay.stats_request_queue import RequestPriority, StatsRequestQueue
+
+
+def test_stats_request_queue() -> None:
+    requests = StatsRequestQueue()
+
+    requests.put_refresh("Refreshed1")
+    requests.put("Player1")
+    requests.put_refresh("Refreshed2")
+    requests.put("Player2")
+
+    assert requests.qsize() == 4
+    assert requests.unfinished_tasks == 4
+
+    # Regular requests are served first, both in FIFO order
+    assert [requests.get_nowait() for _ in range(4)] == [
+        "Player1",
+        "Player2",
+        "Refreshed1",
+        "Refreshed2",
+    ]
+
+    with pytest.raises(queue.Empty):
+        requests.get_nowait()
+
+    for _ in range(4):
+        requests.task_done()
+
+    assert requests.unfinished_tasks == 0
+
+
+def test_stats_request_queue_put_many() -> None:
+    requests = StatsRequestQueue()
+
+    requests.put_many(("Refreshed1", "Refreshed2"), refresh=True)
+    requests.put_many(())
+    requests.put_many(["Player1", "Player2"])
+
+    assert requests.unfinished_tasks == 4
+    assert [requests.get_nowait() for _ in range(4)] == [
+        "Player1",
+        "Player2",
+        "Refreshed1",
+        "Refreshed2",
+    ]
+
+
+def test_stats_request_queue_priority() -> None:
+    priorities = {
+        "Prefetch": RequestPriority.PREFETCH,
+        "Own": RequestPriority.OWN,
+        "Teammate": RequestPriority.TEAMMATE,
+        "Enemy1": RequestPriority.ENEMY,
+        "Enemy2": RequestPriority.ENEMY,
+    }
+    requests = StatsRequestQueue(
+        get_priority=lambda username, refresh: priorities[username]
+    )
+
+    requests.put_many(("Prefetch", "Own", "Enemy1", "Teammate", "Enemy2"))
+
+    assert requests.get_nowait() == "Enemy1"
+
+    # Requests that became less urgent are moved back when they reach the front
+    priorities["Enemy2"] = RequestPriority.PREFETCH
+
+    assert [requests.get_nowait() for _ in range(4)] == [
+        "Teammate",
+        "Own",
+        "Prefetch",
+        "Enemy2",
+    ]
+
+
+def test_stats_request_queue_drop() -> None:
+    requests = StatsRequestQueue()
+
+    requests.put_many(("Player1", "Left1", "Player2"))
+    requests.put_refresh("Left2")
+
+    assert requests.drop(lambda username: username.startswith("Left")) == [
+        "Left1",
+        "Left2",
+    ]
+    assert requests.drop(lambda username: False) == []
+
+    assert requests.qsize() == 2
+    assert requests.unfinished_tasks == 2
+
+    assert [requests.get_nowait() for _ in range(2)] == ["Player1", "Player2"]
+    requests.task_done()
+    requests.task_done()
+
+    # Dropping every waiting request finishes the queue
+    requests.put("Left3")
+    assert requests.drop(lambda username: True) == ["Left3"]
+    assert requests.unfinished_tasks == 0
+    requests.join()
+
+    # Dropped requests are skipped when handing out the requests
+    requests.put_many(("Left4", "Player3"))
+    assert requests.drop(lambda username: username.startswith("Left")) == ["Left4"]
+    assert requests.qsize() == 1
+    assert requests.get_nowait() == "Player3"
+    with pytest.raises(queue.Empty):
+        requests.get_nowait()
@@ -1,3 +1,5 @@
+import os
+import time
 import unittest.mock
 from collections.abc import Mapping
 from dataclasses import replace
@@ -14,6 +16,7 @@ from prism.overlay.user_interaction.logfile_utils import (
     create_active_logfiles,
     file_exists,
     get_logfile,
+    get_logfiles_to_follow,
     get_timestamp,
     read_logfile_cache,
     refresh_active_logfiles,
@@ -496,3 +499,43 @@ def test_get_logfile(
     else:
         assert new_cache.last_used_index is not None
         assert logfile_path == new_cache.known_logfiles[new_cache.last_used_index]
+
+
+def test_get_logfiles_to_follow(tmp_path: Path) -> None:
+    now = time.time()
+    paths: list[Path] = []
+    for name, age in (("old", 3600), ("recent", 30), ("newest", 1)):
+        path = tmp_path / f"{name}.log"
+        path.write_text("", encoding="utf8")
+        os.utime(path, (now - age, now - age))
+        paths.append(path.resolve())
+    old, recent, newest = paths
+
+    cache_path = tmp_path / "logfile_cache.toml"
+
+    def get_followed(
+        known_logfiles: tuple[Path, ...],
+        last_used_index: int | None,
+        suggested_logfiles: tuple[Path, ...] = (),
+    ) -> tuple[Path, ...]:
+        write_logfile_cache(
+            cache_path,
+            LogfileCache(
+                known_logfiles=known_logfiles, last_used_index=last_used_index
+            ),
+        )
+        with unittest.mock.patch(
+            "prism.overlay.user_interaction.logfile_utils.suggest_logfiles",
+            lambda: suggested_logfiles,
+        ):
+            return get_logfiles_to_follow(cache_path)
+
+    # Several recent logfiles -> follow the recent ones, most recent first
+    assert get_followed((old, recent, newest), 0) == (newest, recent)
+    assert get_followed((old, recent), 0, (newest,)) == (newest, recent)
+
+    # Only one recent logfile -> autoselect or prompt
+    assert get_followed((old, newest), 0) == ()
+
+    # Never selected a logfile -> prompt
+    assert get_followed((old, recent, newest), None) == ()
@@ -1,6 +1,6 @@
 import io
 import queue
-from collections.abc import Callable, Iterable, Set
+from collections.abc import Callable, Iterable, Mapping, Sequence, Set
 from pathlib import Path, PurePath
 from typing import Any, Literal, TextIO, TypeVar, cast, overload
 
@@ -352,6 +352,29 @@ class MockedPlayerProvider:
         return self._seconds_until_unblocked
 
 
+class MockedBatchPlayerProvider(MockedPlayerProvider):
+    def __init__(
+        self,
+        get_players: Callable[
+            [Sequence[str], str],
+            Mapping[str, KnownPlayer],
+        ],
+        seconds_until_unblocked: float = 0.0,
+    ) -> None:
+        super().__init__(
+            get_player=assert_not_called,
+            seconds_until_unblocked=seconds_until_unblocked,
+        )
+        self._get_players = get_players
+
+    def get_players(
+        self,
+        uuids: Sequence[str],
+        user_id: str,
+    ) -> Mapping[str, KnownPlayer]:
+        return self._get_players(uuids, user_id)
+
+
 class MockedWinstreakProvider:
     def __init__(
         self,
@@ -0,0 +1,94 @@
+from pathlib import Path
+
+import pytest
+
+from benchmarks.corpora import CLIENT_FORMATS, read_corpus, render_corpus
+from benchmarks.suite import (
+    BENCHMARKS,
+    BenchmarkResult,
+    compare_results,
+    make_run,
+    parse_events,
+    run_benchmark,
+)
+from prism.overlay.events import InitializeAsEvent
+
+VANILLA_EVENTS = parse_events(render_corpus("vanilla", 2))
+
+
+@pytest.mark.parametrize("client", CLIENT_FORMATS)
+def test_corpora_parse_the_same(client: str) -> None:
+    """Every client corpus contains the same events, only the prefixes differ"""
+    lines = render_corpus(client, 2)
+    assert parse_events(lines) == VANILLA_EVENTS
+
+
+def test_corpus_content() -> None:
+    assert VANILLA_EVENTS[0] == InitializeAsEvent("Player0")
+    assert {type(event).__name__ for event in VANILLA_EVENTS} >= {
+        "BedwarsFinalKillEvent",
+        "EndBedwarsGameEvent",
+        "LobbyJoinEvent",
+        "LobbyListEvent",
+        "PartyMembershipListEvent",
+        "StartBedwarsGameEvent",
+    }
+
+
+def test_render_corpus_deterministic() -> None:
+    assert render_corpus("lunar", 3) == render_corpus("lunar", 3)
+    assert render_corpus("lunar", 3) != render_corpus("lunar", 3, seed=1)
+
+
+def test_read_corpus(tmp_path: Path) -> None:
+    path = tmp_path / "latest.log"
+    lines = render_corpus("alpine", 1)
+    path.write_text("".join(lines), encoding="utf8")
+
+    assert read_corpus(path) == lines
+
+
+@pytest.mark.parametrize("benchmark", BENCHMARKS)
+def test_run_benchmark(benchmark: str) -> None:
+    lines = render_corpus("fabric_1_21", 1)
+    result = run_benchmark(benchmark, "fabric_1_21", lines, repeat=1)
+
+    assert result.benchmark == benchmark
+    assert result.corpus == "fabric_1_21"
+    assert result.lines == len(lines)
+    assert result.events == len(parse_events(lines))
+    assert result.seconds > 0
+    assert result.lines_per_second == result.lines / result.seconds
+    assert result.peak_alloc_bytes >= 0
+
+
+def test_make_run_unknown() -> None:
+    with pytest.raises(ValueError):
+        make_run("unknown", [], [])
+
+
+def test_compare_results() -> None:
+    def result(benchmark: str, corpus: str, speed: float) -> BenchmarkResult:
+        return BenchmarkResult(
+            benchmark=benchmark,
+            corpus=corpus,
+            lines=100,
+            events=50,
+            seconds=1.0,
+            lines_per_second=speed,
+            events_per_second=speed / 2,
+            peak_alloc_bytes=0,
+            retained_alloc_bytes=0,
+        )
+
+    baseline = [
+        result("parse_logline", "vanilla", 100).to_dict(),
+        result("parse_logline", "lunar", 0).to_dict(),
+    ]
+    results = [
+        result("parse_logline", "vanilla", 150),
+        result("parse_logline", "lunar", 150),
+        result("process_event", "vanilla", 150),
+    ]
+
+    assert compare_results(baseline, results) == [("parse_logline", "vanilla", 1.5)]